@@ -1,10 +1,16 @@
 import openai
 from django.conf import settings
 from .models import KnowledgeCard
+from .answer_cache import AnswerCache
+from .topic_router import KeywordRouter
+from .arithmetic import evaluate_expression, ExpressionError
+from .ollama_pool import OllamaPool
+import logging
 import requests
 import re
-import ast
-import operator
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from urllib.parse import quote
 
 try:
@@ -14,6 +20,9 @@ except ImportError:
     OLLAMA_AVAILABLE = False
 
 
+logger = logging.getLogger(__name__)
+
+
 class AIAssistant:
     """Класс для работы с AI-ассистентом"""
     
@@ -30,6 +39,28 @@ class AIAssistant:
         self.ollama_enabled = OLLAMA_AVAILABLE and hasattr(settings, 'OLLAMA_ENABLED') and settings.OLLAMA_ENABLED
         
         self.enabled = self.openai_enabled or self.deepseek_enabled or self.ollama_enabled
+
+        # Кэш ответов на повторяющиеся и почти одинаковые вопросы
+        self.answer_cache = AnswerCache(
+            max_size=getattr(settings, 'AI_ANSWER_CACHE_SIZE', 1000),
+            ttl=getattr(settings, 'AI_ANSWER_CACHE_TTL', 24 * 60 * 60),
+            threshold=getattr(settings, 'AI_ANSWER_CACHE_THRESHOLD', 0.8),
+        )
+
+        # Офлайн-темы для быстрых ответов без обращения к провайдерам
+        self.topic_router = KeywordRouter.from_file(getattr(settings, 'AI_FALLBACK_TOPICS_FILE', None))
+
+        # Пул потоков для параллельного опроса провайдеров
+        self.racing_enabled = getattr(settings, 'AI_PROVIDER_RACING', True)
+        self.provider_deadline = getattr(settings, 'AI_PROVIDER_DEADLINE', 8.0)
+        self._executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'AI_PROVIDER_WORKERS', 8),
+            thread_name_prefix='ai-provider',
+        )
+
+        # Пул запросов к Ollama создаётся при первом обращении
+        self._ollama_pool = None
+        self._ollama_pool_lock = threading.Lock()
     
     def generate_response(self, question, context_cards=None):
         """Генерация ответа на вопрос студента"""
@@ -41,13 +72,24 @@ class AIAssistant:
             if math_result is not None:
                 return math_result
 
+            cached_response = self.answer_cache.get(question)
+            if cached_response is not None:
+                return cached_response
+
             # Формируем контекст из карточек знаний
             context = self._build_context(context_cards)
             
-            # Используем Wikipedia для получения структурированных ответов
-            print("Using Wikipedia API") # Отладка
-            response = self._get_wikipedia_response(question)
-            print("Wikipedia response:", response) # Отладка
+            if self.racing_enabled:
+                # Опрашиваем все доступные провайдеры параллельно
+                response = self._race_providers(question, context)
+            else:
+                # Используем Wikipedia для получения структурированных ответов
+                response = self._query_wikipedia(question)
+
+            # В кэш попадают только настоящие ответы провайдеров, а не заглушки
+            if not self._is_acceptable_answer(response):
+                return self._simple_fallback(question)
+            self.answer_cache.set(question, response)
             return response
                 
         except Exception as e:
@@ -55,31 +97,167 @@ class AIAssistant:
             return self._simple_fallback(question)
         
         return self._simple_fallback(question)
-    
-    def _get_wikipedia_response(self, question):
-        """Получение структурированного ответа из Wikipedia"""
+
+    def _get_providers(self):
+        """Список доступных провайдеров в порядке приоритета"""
+        providers = []
+        if self.openai_enabled:
+            providers.append(('openai', self._get_openai_response))
+        if self.deepseek_enabled:
+            providers.append(('deepseek', self._get_deepseek_response))
+        if self.ollama_enabled:
+            providers.append(('ollama', self._get_ollama_response))
+        providers.append(('wikipedia', self._query_wikipedia))
+        return providers
+
+    def _race_providers(self, question, context=""):
+        """Параллельный запрос ко всем провайдерам: первый приемлемый ответ до дедлайна или None"""
+        deadline = time.monotonic() + self.provider_deadline
+        futures = {
+            self._executor.submit(provider, question, context, deadline): name
+            for name, provider in self._get_providers()
+        }
+        pending = set(futures)
+
         try:
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning("AI providers: deadline exceeded")
+                    break
+
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        answer = future.result()
+                    except Exception as e:
+                        logger.error("AI provider %s error: %s", futures[future], e)
+                        continue
+                    if self._is_acceptable_answer(answer):
+                        return answer
+        finally:
+            # Отменяем запросы, которые ещё не начали выполняться;
+            # уже запущенные завершатся не позже дедлайна по своим таймаутам
+            for future in pending:
+                future.cancel()
+
+        return None
+
+    def _time_left(self, deadline):
+        """Секунды до дедлайна; без дедлайна - полный лимит провайдера"""
+        if deadline is None:
+            return self.provider_deadline
+        return deadline - time.monotonic()
+
+    def _is_acceptable_answer(self, answer):
+        """Проверка, что ответ провайдера можно показать студенту"""
+        return isinstance(answer, str) and len(answer.strip()) >= 20
+
+    def _system_prompt(self, context=""):
+        """Системный промпт для языковых моделей"""
+        prompt = (
+            "Ты AI-ассистент для студентов. Отвечай на русском языке, кратко и по делу. "
+            "Структурируй ответ разделами: 📚 Тема, 📚 КОНСПЕКТ, 🔑 КЛЮЧЕВЫЕ СЛОВА, "
+            "📝 КРАТКО, 💡 ПРИМЕРЫ, 🧠 ЗАПОМНИТЬ."
+        )
+        if context:
+            prompt += f"\n\nИспользуй материалы карточек знаний:\n{context}"
+        return prompt
+
+    def _get_openai_response(self, question, context="", deadline=None):
+        """Ответ от OpenAI"""
+        timeout = self._time_left(deadline)
+        if timeout <= 0:
+            return None
+        client = openai.OpenAI(api_key=settings.OPENAI_API_KEY, timeout=timeout)
+        completion = client.chat.completions.create(
+            model=settings.OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": self._system_prompt(context)},
+                {"role": "user", "content": question},
+            ],
+        )
+        return completion.choices[0].message.content
+
+    def _get_deepseek_response(self, question, context="", deadline=None):
+        """Ответ от DeepSeek (OpenAI-совместимый API)"""
+        timeout = self._time_left(deadline)
+        if timeout <= 0:
+            return None
+        client = openai.OpenAI(
+            api_key=settings.DEEPSEEK_API_KEY,
+            base_url=settings.DEEPSEEK_BASE_URL,
+            timeout=timeout,
+        )
+        completion = client.chat.completions.create(
+            model=settings.DEEPSEEK_MODEL,
+            messages=[
+                {"role": "system", "content": self._system_prompt(context)},
+                {"role": "user", "content": question},
+            ],
+        )
+        return completion.choices[0].message.content
+
+    def _get_ollama_pool(self):
+        """Общий пул запросов к Ollama (создаётся лениво)"""
+        if self._ollama_pool is None:
+            with self._ollama_pool_lock:
+                if self._ollama_pool is None:
+                    self._ollama_pool = OllamaPool(
+                        host=settings.OLLAMA_HOST,
+                        model=settings.OLLAMA_MODEL,
+                        max_concurrency=getattr(settings, 'OLLAMA_MAX_CONCURRENCY', 2),
+                        queue_size=getattr(settings, 'OLLAMA_QUEUE_SIZE', 32),
+                        keep_alive=getattr(settings, 'OLLAMA_KEEP_ALIVE', '30m'),
+                        keepalive_interval=getattr(settings, 'OLLAMA_KEEPALIVE_INTERVAL', 300),
+                    )
+        return self._ollama_pool
+
+    def _get_ollama_response(self, question, context="", deadline=None):
+        """Ответ от локальной модели Ollama"""
+        timeout = self._time_left(deadline)
+        if timeout <= 0:
+            return None
+        return self._get_ollama_pool().chat(
+            [
+                {"role": "system", "content": self._system_prompt(context)},
+                {"role": "user", "content": question},
+            ],
+            timeout=timeout,
+        )
+
+    def _query_wikipedia(self, question, context="", deadline=None):
+        """Запрос к Wikipedia: отформатированный ответ или None, если статья не найдена"""
+        if deadline is None:
+            deadline = time.monotonic() + self.provider_deadline
+        try:
+            timeout = self._time_left(deadline)
+            if timeout <= 0:
+                return None
             topic = self._extract_wikipedia_topic(question)
 
             # Ищем статью в Wikipedia
             encoded_title = quote(topic.replace(" ", "_"), safe="")
             search_url = f"https://ru.wikipedia.org/api/rest_v1/page/summary/{encoded_title}"
-            response = requests.get(search_url, timeout=10, headers=self._wikipedia_headers())
+            response = requests.get(search_url, timeout=timeout, headers=self._wikipedia_headers())
             
             if response.status_code == 200:
                 data = response.json()
                 return self._format_wikipedia_response(data, topic)
             else:
                 # Если не найдено, пробуем поиск
-                return self._search_wikipedia(topic)
+                return self._search_wikipedia(topic, deadline)
                 
         except Exception as e:
             print(f"Wikipedia Error: {e}")
-            return self._simple_fallback(question)
+            return None
     
-    def _search_wikipedia(self, question):
+    def _search_wikipedia(self, question, deadline):
         """Поиск в Wikipedia"""
         try:
+            timeout = self._time_left(deadline)
+            if timeout <= 0:
+                return None
             params = {
                 "action": "query",
                 "list": "search",
@@ -91,32 +269,35 @@ class AIAssistant:
             response = requests.get(
                 "https://ru.wikipedia.org/w/api.php",
                 params=params,
-                timeout=8,
+                timeout=timeout,
                 headers=self._wikipedia_headers(),
             )
             if response.status_code != 200:
-                return self._simple_fallback(question)
+                return None
 
             data = response.json() or {}
             search_results = (((data.get("query") or {}).get("search")) or [])
             if not search_results:
-                return self._simple_fallback(question)
+                return None
 
             title = (search_results[0].get("title") or "").strip()
             if not title:
-                return self._simple_fallback(question)
+                return None
 
             encoded_title = quote(title.replace(" ", "_"), safe="")
             summary_url = f"https://ru.wikipedia.org/api/rest_v1/page/summary/{encoded_title}"
-            summary_response = requests.get(summary_url, timeout=8, headers=self._wikipedia_headers())
+            timeout = self._time_left(deadline)
+            if timeout <= 0:
+                return None
+            summary_response = requests.get(summary_url, timeout=timeout, headers=self._wikipedia_headers())
             if summary_response.status_code != 200:
-                return self._simple_fallback(question)
+                return None
 
             return self._format_wikipedia_response(summary_response.json(), title)
             
         except Exception as e:
             print(f"Wikipedia Search Error: {e}")
-            return self._simple_fallback(question)
+            return None
 
     def _extract_wikipedia_topic(self, question):
         text = (question or "").strip()
@@ -203,80 +384,13 @@ class AIAssistant:
         if math_result is not None:
             return math_result
         
-        # Brawl Stars и игры
-        if any(word in question_lower for word in ["бравл старс", "brawl stars", "игра", "игры"]):
-            return """📚 Тема: Brawl Stars - это популярная мобильная многопользовательская игра
-
-📚 КОНСПЕКТ:
-Brawl Stars - это бесплатная мобильная игра в жанре MOBA (многопользовательская онлайновая боевая арена), разработанная компанией Supercell. Игра была выпущена в 2018 году и быстро стала популярной во всем мире. Игроки сражаются в командах в различных режимах на аренах, используя уникальных персонажей с разными способностями.
+        # Офлайн-темы: один проход автомата по тексту вопроса
+        answer = self.topic_router.answer(question_lower)
+        if answer is not None:
+            return answer
 
-🔑 КЛЮЧЕВЫЕ СЛОВА:
-- Brawl Stars: мобильная MOBA-игра от Supercell
-- Бравлер: уникальный персонаж с особыми способностями
-- Арена: игровое поле для сражений
-- Кубки: система рейтинга и прогресса
-- Гемма: игровая валюта для покупки бравлеров
-
-📝 КРАТКО:
-Brawl Stars - это командная мобильная игра, где игроки выбирают персонажей и сражаются на различных аренах в разных игровых режимах.
-
-💡 ПРИМЕРЫ:
-1. "Захват кристаллов" - команда собирает и защищает кристаллы
-2. "Столкновение" - уничтожение вражеского командного центра
-3. "Ограбление" - защита сейфа от врагов
-4. "Боунти" - сбор звезд за победы над противниками
-
-🎯 ПРИМЕНЕНИЕ:
-- Развлечения: отдых и соревновательный азарт
-- Социализация: игра с друзьями и общение
-- Стратегическое мышление: планирование тактики
-- Развитие реакций: улучшение скорости принятия решений
-
-🧠 ЗАПОМНИТЬ:
-Каждый бравлер имеет уникальные способности. Изучите сильные и слабые стороны персонажей для эффективной игры.
-
-📖 ДОПОЛНИТЕЛЬНО:
-- Изучите всех бравлеров и их способности
-- Научитесь работать в команде
-- Изучите тактику для разных режимов игры
-
-🔗 СВЯЗАННЫЕ ТЕМЫ:
-- Киберспорт и соревновательные игры
-- Мобильный гейминг
-- Стратегические игры
-- Командное взаимодействие"""
-        
-        # Валюта
-        elif any(word in question_lower for word in ["валюта", "деньги", "курс", "доллар", "евро"]):
-            return """Валюта - это денежная единица страны, используемая для покупки товаров и услуг. Курс валют показывает, сколько одной валюты можно купить за другую. Например, 1 доллар США стоит около 90 рублей. Валютные курсы постоянно меняются из-за экономических факторов."""
-        
-        # Приветствие
-        elif any(word in question_lower for word in ["привет", "здравствуй", "хай"]):
-            return """Здравствуйте! Я ваш AI-ассистент для учебы. Я помогу вам разобраться в любых учебных вопросах по математике, физике, химии, программированию и другим предметам. Задавайте ваши вопросы!"""
-        
-        # Математика
-        elif any(word in question_lower for word in ["производная", "интеграл", "математика", "число"]):
-            return """Математика - это наука о числах, величинах, формах и их отношениях. Производная показывает скорость изменения функции, а интеграл помогает находить площади и объемы. Математика используется в физике, экономике, инженерии и многих других областях."""
-        
-        # Физика
-        elif any(word in question_lower for word in ["физика", "ньютон", "сила", "движение"]):
-            return """Физика - это наука о природе и ее законах. Законы Ньютона описывают движение тел: первое тело сохраняет состояние покоя, второе F=ma, третье действие равно противодействию. Физика изучает механику, термодинамику, электромагнетизм и квантовые явления."""
-        
-        # Программирование
-        elif any(word in question_lower for word in ["программирование", "код", "программа"]):
-            return """Программирование - это написание инструкций для компьютера. Программы создаются на языках программирования (Python, JavaScript, C++) и используются для создания сайтов, приложений, игр и систем искусственного интеллекта."""
-        
-        # Химия
-        elif any(word in question_lower for word in ["химия", "химический", "молекула", "атом"]):
-            return """Химия - это наука о веществах и их превращениях. Атомы - это строительные блоки материи, а молекулы состоят из атомов. Химические реакции изменяют состав веществ, создавая новые соединения с новыми свойствами."""
-        
-        # Биология
-        elif any(word in question_lower for word in ["биология", "живой", "организм", "клетка"]):
-            return """Биология - это наука о живых организмах. Клетка - это основная единица жизни. Биология изучает строение, функции, развитие и взаимодействие живых организмов, от бактерий до растений и животных."""
-        
         # Общий ответ
-        else:
-            return "Я не нашёл точный ответ по вашему запросу. Уточните вопрос (тема/предмет/что именно нужно получить: определение, пример, решение задачи)."
+        return "Я не нашёл точный ответ по вашему запросу. Уточните вопрос (тема/предмет/что именно нужно получить: определение, пример, решение задачи)."
 
     def _try_solve_arithmetic(self, question):
         raw = (question or "").strip()
@@ -285,63 +399,21 @@ Brawl Stars - это командная мобильная игра, где иг
 
         raw = raw.replace("×", "*").replace("÷", "/")
 
-        expr_match = re.search(r"[0-9][0-9\s\+\-\*\/\(\)\.,]*[0-9]", raw)
-        if not expr_match:
-            expr_match = re.search(r"[0-9](?:\s*[\+\-\*\/]\s*[0-9])+", raw)
+        expr_match = re.search(r"[\(\-]*[0-9][0-9\s\+\-\*\/\%\(\)\.,]*[0-9\)]", raw)
         if not expr_match:
             return None
 
-        expr = expr_match.group(0).strip()
-
-        if not re.fullmatch(r"[0-9\s\+\-\*\/\(\)\.,]+", expr):
-            return None
+        expr = expr_match.group(0).strip().replace(",", ".")
 
-        if not any(ch.isdigit() for ch in expr):
-            return None
-
-        expr = expr.replace(",", ".")
-
-        try:
-            node = ast.parse(expr, mode="eval")
-        except Exception:
+        # Одиночное число (например, год в вопросе) - это не пример
+        if not re.search(r"[\+\-\*\/\%]", expr.lstrip("+-( ")):
             return None
 
-        ops = {
-            ast.Add: operator.add,
-            ast.Sub: operator.sub,
-            ast.Mult: operator.mul,
-            ast.Div: operator.truediv,
-        }
-
-        def _eval(n):
-            if isinstance(n, ast.Expression):
-                return _eval(n.body)
-
-            if isinstance(n, ast.Constant) and isinstance(n.value, (int, float)):
-                return n.value
-
-            if isinstance(n, ast.Num):
-                return n.n
-
-            if isinstance(n, ast.UnaryOp) and isinstance(n.op, (ast.UAdd, ast.USub)):
-                val = _eval(n.operand)
-                return val if isinstance(n.op, ast.UAdd) else -val
-
-            if isinstance(n, ast.BinOp) and type(n.op) in ops:
-                left = _eval(n.left)
-                right = _eval(n.right)
-                return ops[type(n.op)](left, right)
-
-            raise ValueError("Unsupported expression")
-
         try:
-            result = _eval(node)
-        except Exception:
+            result = evaluate_expression(expr)
+        except ExpressionError:
             return None
 
-        if isinstance(result, float) and result.is_integer():
-            result = int(result)
-
         return f"{expr} = {result}"
     
     def _build_context(self, context_cards):
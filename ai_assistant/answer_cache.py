@@ -0,0 +1,183 @@
+"""
+Кэш ответов AI-ассистента с поиском почти одинаковых вопросов.
+
+Вопрос нормализуется (нижний регистр, без стоп-слов и знаков препинания),
+разбивается на символьные шинглы и сворачивается в MinHash-подпись.
+Похожие вопросы находятся через LSH-корзины по полосам подписи, поэтому
+поиск не зависит от количества закэшированных ответов.
+"""
+import re
+import threading
+import time
+import zlib
+import random
+from collections import OrderedDict
+
+
+STOP_WORDS = frozenset([
+    # Русские
+    'а', 'и', 'в', 'во', 'на', 'по', 'о', 'об', 'от', 'до', 'за', 'из', 'к', 'ко',
+    'с', 'со', 'у', 'же', 'ли', 'бы', 'но', 'да', 'то', 'это', 'этот',
+    'эта', 'эти', 'как', 'так', 'что', 'чем', 'кто', 'где', 'когда', 'какой',
+    'какая', 'какие', 'такое', 'такой', 'такая', 'такие', 'значит', 'мне', 'меня',
+    'мы', 'вы', 'ты', 'он', 'она', 'они', 'его', 'ее', 'её', 'их', 'пожалуйста',
+    'расскажи', 'расскажите', 'объясни', 'объясните', 'скажи', 'скажите', 'про',
+    'можно', 'нужно', 'есть', 'был', 'была', 'было', 'были',
+    # Английские
+    'a', 'an', 'the', 'is', 'are', 'was', 'were', 'what', 'who', 'how', 'of',
+    'to', 'in', 'on', 'for', 'and', 'or', 'please', 'tell', 'me', 'about',
+])
+
+# Отрицание меняет смысл вопроса, поэтому эти слова должны совпадать точно, как числа
+NEGATION_WORDS = frozenset(['не', 'ни', 'нет', 'not', 'no'])
+
+_TOKEN_RE = re.compile(r"[0-9a-zа-яё]+")
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def normalize_question(question):
+    """Нормализованная форма вопроса: токены без стоп-слов через пробел"""
+    text = (question or '').lower().replace('ё', 'е')
+    tokens = [t for t in _TOKEN_RE.findall(text) if t not in STOP_WORDS]
+    return ' '.join(tokens)
+
+
+def _exact_tokens(normalized):
+    """Токены, которые у похожих вопросов должны совпадать точно"""
+    return tuple(t for t in normalized.split() if t.isdigit() or t in NEGATION_WORDS)
+
+
+def _shingles(text, size):
+    """Символьные шинглы нормализованного текста"""
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class AnswerCache:
+    """Кэш ответов с TTL, вытеснением по LRU и поиском дубликатов через MinHash/LSH"""
+
+    def __init__(self, max_size=1000, ttl=24 * 60 * 60, num_perm=32, bands=8,
+                 shingle_size=3, threshold=0.8):
+        if num_perm % bands:
+            raise ValueError('num_perm должно делиться на bands')
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+
+        rnd = random.Random(0x5EED)
+        self._perms = [
+            (rnd.randrange(1, _MERSENNE_PRIME), rnd.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+
+        # key -> (signature, numbers, answer, expires_at)
+        self._entries = OrderedDict()
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def signature(self, normalized):
+        """MinHash-подпись нормализованного вопроса"""
+        hashes = [zlib.crc32(s.encode('utf-8')) for s in _shingles(normalized, self.shingle_size)]
+        if not hashes:
+            return ()
+        return tuple(
+            min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+            for a, b in self._perms
+        )
+
+    def _band_keys(self, sig):
+        return [(i, sig[i * self.rows:(i + 1) * self.rows]) for i in range(self.bands)]
+
+    def _similarity(self, sig_a, sig_b):
+        same = sum(1 for x, y in zip(sig_a, sig_b) if x == y)
+        return same / self.num_perm
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for band_key in self._band_keys(entry[0]):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def get(self, question):
+        """Ответ на тот же или почти такой же вопрос, либо None"""
+        key = normalize_question(question)
+        if not key:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[3] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[2]
+                self._remove(key)
+
+            sig = self.signature(key)
+            # Числа и отрицания должны совпадать точно: "2 закон ньютона" и "3 закон ньютона",
+            # как и "кит рыба" и "не кит рыба", - разные вопросы
+            numbers = _exact_tokens(key)
+
+            candidates = set()
+            for band_key in self._band_keys(sig):
+                candidates.update(self._buckets.get(band_key, ()))
+
+            best_key, best_score = None, 0.0
+            for candidate in candidates:
+                c_sig, c_numbers, _, expires_at = self._entries[candidate]
+                if expires_at <= now or c_numbers != numbers:
+                    continue
+                score = self._similarity(sig, c_sig)
+                if score > best_score:
+                    best_key, best_score = candidate, score
+
+            if best_key is not None and best_score >= self.threshold:
+                self._entries.move_to_end(best_key)
+                self.hits += 1
+                return self._entries[best_key][2]
+
+            self.misses += 1
+            return None
+
+    def set(self, question, answer):
+        """Сохранить ответ на вопрос"""
+        key = normalize_question(question)
+        if not key or not answer:
+            return
+
+        sig = self.signature(key)
+        numbers = _exact_tokens(key)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (sig, numbers, answer, time.monotonic() + self.ttl)
+            for band_key in self._band_keys(sig):
+                self._buckets.setdefault(band_key, set()).add(key)
+
+            while len(self._entries) > self.max_size:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+
+    def clear(self):
+        """Очистить кэш"""
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,112 @@
+"""
+Безопасный вычислитель арифметических выражений.
+
+Используется AI-чатом и математической игрой. Выражение разбирается через
+ast, проверяется по белому списку узлов и ограничениям на размер и величину
+чисел; результаты кэшируются по нормализованной строке выражения.
+"""
+import ast
+import math
+import operator
+import re
+from functools import lru_cache
+
+
+MAX_EXPRESSION_LENGTH = 200
+MAX_NODES = 64
+MAX_MAGNITUDE = 10 ** 15
+MAX_EXPONENT = 64
+
+ALLOWED_CHARS_RE = re.compile(r"[0-9\s\+\-\*\/\%\(\)\.]+")
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+
+UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+
+class ExpressionError(ValueError):
+    """Выражение не может быть безопасно вычислено"""
+
+
+def normalize_expression(expr):
+    """Приведение выражения к каноническому виду (ключ кэша)"""
+    expr = (expr or '').replace('×', '*').replace('÷', '/').replace(',', '.')
+    return ''.join(expr.split())
+
+
+def _check_magnitude(value):
+    if isinstance(value, complex) or not math.isfinite(value) or abs(value) > MAX_MAGNITUDE:
+        raise ExpressionError('too_large')
+    return value
+
+
+def _power(base, exponent):
+    """Возведение в степень с проверкой результата до вычисления"""
+    if abs(exponent) > MAX_EXPONENT:
+        raise ExpressionError('exponent_too_large')
+    if base == 0 and exponent < 0:
+        raise ExpressionError('division_by_zero')
+    if abs(base) > 1 and exponent > 0 and exponent * math.log10(abs(base)) > math.log10(MAX_MAGNITUDE):
+        raise ExpressionError('too_large')
+    return operator.pow(base, exponent)
+
+
+def _eval(node):
+    if isinstance(node, ast.Expression):
+        return _eval(node.body)
+
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return _check_magnitude(node.value)
+
+    if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+        return UNARY_OPERATORS[type(node.op)](_eval(node.operand))
+
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+        left = _eval(node.left)
+        right = _eval(node.right)
+        if isinstance(node.op, ast.Pow):
+            return _check_magnitude(_power(left, right))
+        try:
+            return _check_magnitude(BINARY_OPERATORS[type(node.op)](left, right))
+        except ZeroDivisionError:
+            raise ExpressionError('division_by_zero')
+
+    raise ExpressionError('unsupported')
+
+
+@lru_cache(maxsize=1024)
+def _evaluate_normalized(expr):
+    if not expr:
+        raise ExpressionError('empty')
+    if len(expr) > MAX_EXPRESSION_LENGTH:
+        raise ExpressionError('too_long')
+    if not ALLOWED_CHARS_RE.fullmatch(expr):
+        raise ExpressionError('bad_chars')
+
+    try:
+        tree = ast.parse(expr, mode='eval')
+    except SyntaxError:
+        raise ExpressionError('syntax')
+
+    if sum(1 for _ in ast.walk(tree)) > MAX_NODES:
+        raise ExpressionError('too_complex')
+
+    result = _eval(tree)
+    if isinstance(result, float) and result.is_integer():
+        result = int(result)
+    return result
+
+
+def evaluate_expression(expr):
+    """Вычислить выражение; при ошибке бросает ExpressionError"""
+    return _evaluate_normalized(normalize_expression(expr))
@@ -0,0 +1,80 @@
+# Generated by Django 6.0.2 on 2026-10-19 17:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def fill_leaderboard(apps, schema_editor):
+    """Заполнение таблицы рейтинга по существующим профилям"""
+    UserProfile = apps.get_model('ai_assistant', 'UserProfile')
+    SubjectScore = apps.get_model('ai_assistant', 'SubjectScore')
+    ChessStats = apps.get_model('ai_assistant', 'ChessStats')
+    Rank = apps.get_model('ai_assistant', 'Rank')
+    LeaderboardEntry = apps.get_model('ai_assistant', 'LeaderboardEntry')
+
+    ranks = list(Rank.objects.order_by('-min_points'))
+    chess_by_user = {stats.user_id: stats for stats in ChessStats.objects.all()}
+    totals_by_profile = {
+        row['user_profile_id']: row
+        for row in SubjectScore.objects.values('user_profile_id').annotate(
+            correct=Sum('correct_answers'),
+            wrong=Sum('wrong_answers'),
+        )
+    }
+
+    entries = []
+    for profile in UserProfile.objects.all():
+        totals = totals_by_profile.get(profile.id, {})
+        correct = totals.get('correct') or 0
+        wrong = totals.get('wrong') or 0
+        chess = chess_by_user.get(profile.user_id)
+        rank = next(
+            (r for r in ranks if r.min_points <= profile.points and (r.max_points is None or r.max_points >= profile.points)),
+            None
+        )
+        entries.append(LeaderboardEntry(
+            user_profile_id=profile.id,
+            total_points=profile.points,
+            chess_points=chess.chess_points if chess else 0,
+            chess_wins=chess.games_won if chess else 0,
+            chess_games=chess.games_played if chess else 0,
+            correct_answers=correct,
+            wrong_answers=wrong,
+            accuracy=int((correct / (correct + wrong)) * 100) if (correct + wrong) > 0 else 0,
+            rank=rank,
+        ))
+
+    LeaderboardEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_assistant', '0016_notecompletion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('user_profile', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='leaderboard_entry', serialize=False, to='ai_assistant.userprofile', verbose_name='Профиль')),
+                ('total_points', models.IntegerField(default=0, verbose_name='Всего очков')),
+                ('chess_points', models.IntegerField(default=0, verbose_name='Очков в шахматах')),
+                ('chess_wins', models.IntegerField(default=0, verbose_name='Побед в шахматах')),
+                ('chess_games', models.IntegerField(default=0, verbose_name='Партий в шахматах')),
+                ('correct_answers', models.IntegerField(default=0, verbose_name='Правильные ответы')),
+                ('wrong_answers', models.IntegerField(default=0, verbose_name='Неправильные ответы')),
+                ('accuracy', models.IntegerField(default=0, verbose_name='Точность (%)')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('rank', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='ai_assistant.rank', verbose_name='Ранг')),
+            ],
+            options={
+                'verbose_name': 'Строка рейтинга',
+                'verbose_name_plural': 'Рейтинг лидеров',
+                'ordering': ['-total_points', 'user_profile'],
+                'indexes': [models.Index(fields=['-total_points', 'user_profile'], name='leaderboard_points_idx')],
+            },
+        ),
+        migrations.RunPython(fill_leaderboard, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-19 17:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_assistant', '0017_leaderboardentry'),
+        ('schedule', '0004_schedulenote'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subjectscore',
+            index=models.Index(fields=['subject', '-points', 'id'], name='subject_score_points_idx'),
+        ),
+    ]
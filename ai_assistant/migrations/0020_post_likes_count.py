@@ -0,0 +1,30 @@
+# Generated by Django 6.0.2 on 2026-10-19 17:36
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_likes_count(apps, schema_editor):
+    """Заполнение счётчика лайков по существующим лайкам"""
+    Post = apps.get_model('ai_assistant', 'Post')
+    PostLike = apps.get_model('ai_assistant', 'PostLike')
+
+    likes = PostLike.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(n=Count('id')).values('n')
+    Post.objects.update(likes_count=Coalesce(Subquery(likes), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_assistant', '0019_post_feed_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='likes_count',
+            field=models.IntegerField(default=0, verbose_name='Количество лайков'),
+        ),
+        migrations.RunPython(fill_likes_count, migrations.RunPython.noop),
+    ]
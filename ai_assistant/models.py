@@ -1,7 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from schedule.models import Subject, PersonalScheduleItem
-from django.db.models.signals import post_save
+from django.db.models import Sum
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
 
@@ -31,6 +33,11 @@ class TaskCompletion(models.Model):
         elif self.class_schedule:
             return f"{self.user.username} - {self.class_schedule.subject.name}: {'✓' if self.is_completed else '○'}"
         return f"{self.user.username} - Неизвестная задача: {'✓' if self.is_completed else '○'}"
+
+    @staticmethod
+    def stats_cache_key(user_id):
+        """Ключ кэша статистики выполнения задач пользователя"""
+        return f"task_stats:{user_id}"
     
     def save(self, *args, **kwargs):
         if self.is_completed and not self.completed_at:
@@ -243,6 +250,32 @@ class StudyProgress(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.knowledge_card.title}"
 
+    @staticmethod
+    def summary_cache_key(user_id):
+        """Ключ кэша сводки прогресса пользователя"""
+        return f"study_progress:summary:{user_id}"
+
+    @classmethod
+    def get_summary(cls, user):
+        """Количество карточек пользователя по уровням освоения (кэшируется)"""
+        key = cls.summary_cache_key(user.id)
+        summary = cache.get(key)
+        if summary is None:
+            counts = dict(
+                cls.objects.filter(user=user)
+                .values_list('mastery_level')
+                .annotate(n=models.Count('id'))
+                .order_by()
+            )
+            summary = {
+                'in_progress': counts.get(2, 0),
+                'learned': counts.get(3, 0),
+                'mastered': counts.get(4, 0),
+                'total': sum(counts.values()),
+            }
+            cache.set(key, summary, 3600)
+        return summary
+
 
 class QuestionCategory(models.Model):
     """Категории вопросов для AI-ассистента"""
@@ -291,15 +324,18 @@ class Rank(models.Model):
     @staticmethod
     def get_rank_by_points(points):
         """Получить ранг по количеству очков"""
+        from .rank_service import rank_table
         try:
-            return Rank.objects.filter(
-                min_points__lte=points
-            ).exclude(
-                max_points__isnull=False,
-                max_points__lt=points
-            ).order_by('-min_points').first()
+            # Таблица рангов в памяти процесса, без запроса к базе
+            return rank_table.get_rank_by_points(points)
         except:
-            return Rank.objects.filter(level=1).first()
+            return rank_table.get_rank_by_level(1)
+
+    @staticmethod
+    def get_next_rank(rank):
+        """Получить следующий по уровню ранг"""
+        from .rank_service import rank_table
+        return rank_table.get_next_rank(rank)
 
 
 class UserProfile(models.Model):
@@ -347,7 +383,7 @@ class UserProfile(models.Model):
         if not current_rank:
             return 0
         
-        next_rank = Rank.objects.filter(level__gt=current_rank.level).order_by('level').first()
+        next_rank = Rank.get_next_rank(current_rank)
         if next_rank:
             return max(0, next_rank.min_points - self.points)
         return 0
@@ -358,8 +394,7 @@ class UserProfile(models.Model):
         if not current_rank:
             return None
         
-        next_rank = Rank.objects.filter(level__gt=current_rank.level).order_by('level').first()
-        return next_rank
+        return Rank.get_next_rank(current_rank)
     
     def get_rank_class(self):
         """Получить CSS класс для рамки аватара"""
@@ -409,13 +444,20 @@ class UserProfile(models.Model):
     
     def get_leaderboard_position(self):
         """Получить позицию в таблице лидеров"""
+        # Запоминаем позицию на время жизни объекта (в пределах запроса)
+        memo = self.__dict__.get('_leaderboard_position')
+        if memo is not None and memo[0] == self.points:
+            return memo[1]
+
         try:
-            from django.db.models import Count
-            # Считаем позицию пользователя по очкам
-            higher_scores = UserProfile.objects.filter(points__gt=self.points).count()
-            return higher_scores + 1
+            from .rank_service import rank_service
+            # Позиция из сервиса мест (Redis или дерево Фенвика) вместо COUNT по всей таблице
+            position = rank_service.position(self.points, self.id)
         except:
             return None
+
+        self._leaderboard_position = (self.points, position)
+        return position
     
     @property
     def is_top_player(self):
@@ -446,9 +488,17 @@ class SubjectScore(models.Model):
         verbose_name = "Рейтинг по предмету"
         verbose_name_plural = "Рейтинги по предметам"
         ordering = ['-points']
+        indexes = [
+            models.Index(fields=['subject', '-points', 'id'], name='subject_score_points_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user_profile.user.username} - {self.subject.name} ({self.points} очков)"
+
+    @staticmethod
+    def top_cache_key(subject_id):
+        """Ключ кэша первой страницы рейтинга по предмету"""
+        return f"leaderboard:subject:{subject_id}"
     
     def get_accuracy_percentage(self):
         """Получить процент точности по предмету"""
@@ -495,6 +545,34 @@ class TaskTracker(models.Model):
     
     def __str__(self):
         return f"{self.user.username} - {self.title}"
+
+    @staticmethod
+    def stats_cache_key(user_id):
+        """Ключ кэша статистики задач пользователя"""
+        return f"task_tracker:stats:{user_id}"
+
+    @classmethod
+    def get_stats(cls, user):
+        """Статистика задач пользователя по категориям одним запросом (кэшируется)"""
+        key = cls.stats_cache_key(user.id)
+        stats = cache.get(key)
+        if stats is None:
+            done = models.Q(is_completed=True)
+            rows = cls.objects.filter(user=user).values('category').annotate(
+                total=models.Count('id'),
+                completed=models.Count('id', filter=done),
+                points=Sum('points', filter=done),
+            ).order_by()
+            stats = {
+                row['category']: {
+                    'total': row['total'],
+                    'completed': row['completed'],
+                    'points': row['points'] or 0,
+                }
+                for row in rows
+            }
+            cache.set(key, stats, 3600)
+        return stats
     
     def save(self, *args, **kwargs):
         # Если задача выполнена и не была выполнена ранее
@@ -523,12 +601,49 @@ class TaskTracker(models.Model):
         super().save(*args, **kwargs)
 
 
+@receiver(post_save, sender=TaskCompletion)
+@receiver(post_delete, sender=TaskCompletion)
+@receiver(post_save, sender=PersonalScheduleItem)
+@receiver(post_delete, sender=PersonalScheduleItem)
+def _invalidate_task_completion_stats(sender, instance, **kwargs):
+    cache.delete(TaskCompletion.stats_cache_key(instance.user_id))
+
+
+@receiver(post_save, sender=TaskTracker)
+@receiver(post_delete, sender=TaskTracker)
+def _invalidate_task_stats(sender, instance, **kwargs):
+    cache.delete(TaskTracker.stats_cache_key(instance.user_id))
+
+
 @receiver(post_save, sender=User)
 def _create_user_profile(sender, instance, created, **kwargs):
     if created:
         UserProfile.objects.create(user=instance)
 
 
+@receiver(post_init, sender=UserProfile)
+def _remember_profile_points(sender, instance, **kwargs):
+    # None, если очки не загружены (.only()/.defer())
+    instance._saved_points = instance.__dict__.get('points')
+
+
+@receiver(post_save, sender=UserProfile)
+def _update_rank_service_on_save(sender, instance, created, update_fields=None, **kwargs):
+    from .rank_service import rank_service
+    points = instance.__dict__.get('points')
+    if points is None or (update_fields is not None and 'points' not in update_fields):
+        return  # очки этим сохранением не записывались
+    if created or points != instance._saved_points:
+        rank_service.set_points(instance.id, points)
+    instance._saved_points = points
+
+
+@receiver(post_delete, sender=UserProfile)
+def _update_rank_service_on_delete(sender, instance, **kwargs):
+    from .rank_service import rank_service
+    rank_service.set_points(instance.id, None)
+
+
 class ChessGame(models.Model):
     """Шахматная партия"""
     RESULT_CHOICES = [
@@ -570,6 +685,11 @@ class ChessGame(models.Model):
     
     def __str__(self):
         return f"Шахматы: {self.user.username} vs {self.get_bot_difficulty_display()} ({self.get_result_display()})"
+
+    @staticmethod
+    def stats_cache_key(user_id):
+        """Ключ кэша статистики партий пользователя по сложностям"""
+        return f"chess:difficulty_stats:{user_id}"
     
     def calculate_points(self):
         """Рассчитывает очки за партию"""
@@ -700,6 +820,132 @@ class ChessStats(models.Model):
             pass
 
 
+class LeaderboardEntry(models.Model):
+    """Строка общего рейтинга, пересчитываемая при изменении очков"""
+    user_profile = models.OneToOneField(
+        UserProfile,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='leaderboard_entry',
+        verbose_name="Профиль"
+    )
+    total_points = models.IntegerField(default=0, verbose_name="Всего очков")
+    chess_points = models.IntegerField(default=0, verbose_name="Очков в шахматах")
+    chess_wins = models.IntegerField(default=0, verbose_name="Побед в шахматах")
+    chess_games = models.IntegerField(default=0, verbose_name="Партий в шахматах")
+    correct_answers = models.IntegerField(default=0, verbose_name="Правильные ответы")
+    wrong_answers = models.IntegerField(default=0, verbose_name="Неправильные ответы")
+    accuracy = models.IntegerField(default=0, verbose_name="Точность (%)")
+    rank = models.ForeignKey(Rank, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Ранг")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Строка рейтинга"
+        verbose_name_plural = "Рейтинг лидеров"
+        ordering = ['-total_points', 'user_profile']
+        indexes = [
+            models.Index(fields=['-total_points', 'user_profile'], name='leaderboard_points_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_profile.user.username}: {self.total_points}"
+
+    def get_position(self):
+        """Место в общем рейтинге (при равенстве очков выше тот, кто раньше зарегистрировался)"""
+        try:
+            from .rank_service import rank_service
+            # То же место, что и в профиле (UserProfile.get_leaderboard_position)
+            return rank_service.position(self.total_points, self.user_profile_id)
+        except:
+            ahead = LeaderboardEntry.objects.filter(
+                models.Q(total_points__gt=self.total_points) |
+                models.Q(total_points=self.total_points, user_profile_id__lt=self.user_profile_id)
+            ).count()
+            return ahead + 1
+
+    @classmethod
+    def refresh_for_profile(cls, profile):
+        """Пересчитать строку рейтинга для профиля"""
+        totals = SubjectScore.objects.filter(user_profile=profile).aggregate(
+            correct=Sum('correct_answers'),
+            wrong=Sum('wrong_answers'),
+        )
+        correct = totals['correct'] or 0
+        wrong = totals['wrong'] or 0
+        accuracy = int((correct / (correct + wrong)) * 100) if (correct + wrong) > 0 else 0
+
+        chess_stats = ChessStats.objects.filter(user_id=profile.user_id).first()
+
+        # Очки за шахматные партии уже начислены в profile.points (см. ChessGame.save)
+        entry, _ = cls.objects.update_or_create(
+            user_profile=profile,
+            defaults={
+                'total_points': profile.points,
+                'chess_points': chess_stats.chess_points if chess_stats else 0,
+                'chess_wins': chess_stats.games_won if chess_stats else 0,
+                'chess_games': chess_stats.games_played if chess_stats else 0,
+                'correct_answers': correct,
+                'wrong_answers': wrong,
+                'accuracy': accuracy,
+                'rank': Rank.get_rank_by_points(profile.points),
+            }
+        )
+        return entry
+
+    @classmethod
+    def refresh_ranks(cls):
+        """Пересчитать ранги всех строк после изменения таблицы рангов"""
+        cls.objects.update(rank=None)
+        for rank in Rank.objects.order_by('min_points'):
+            entries = cls.objects.filter(total_points__gte=rank.min_points)
+            if rank.max_points is not None:
+                entries = entries.filter(total_points__lte=rank.max_points)
+            entries.update(rank=rank)
+
+
+@receiver(post_save, sender=StudyProgress)
+@receiver(post_delete, sender=StudyProgress)
+def _invalidate_study_summary(sender, instance, **kwargs):
+    cache.delete(StudyProgress.summary_cache_key(instance.user_id))
+
+
+@receiver(post_save, sender=ChessGame)
+@receiver(post_delete, sender=ChessGame)
+def _invalidate_chess_game_stats(sender, instance, **kwargs):
+    cache.delete(ChessGame.stats_cache_key(instance.user_id))
+
+
+@receiver(post_save, sender=UserProfile)
+def _refresh_leaderboard_on_profile(sender, instance, **kwargs):
+    LeaderboardEntry.refresh_for_profile(instance)
+
+
+@receiver(post_save, sender=SubjectScore)
+def _refresh_leaderboard_on_subject_score(sender, instance, **kwargs):
+    LeaderboardEntry.refresh_for_profile(instance.user_profile)
+    cache.delete(SubjectScore.top_cache_key(instance.subject_id))
+
+
+@receiver(post_delete, sender=SubjectScore)
+def _invalidate_subject_leaderboard(sender, instance, **kwargs):
+    cache.delete(SubjectScore.top_cache_key(instance.subject_id))
+
+
+@receiver(post_save, sender=ChessStats)
+def _refresh_leaderboard_on_chess_stats(sender, instance, **kwargs):
+    profile = UserProfile.objects.filter(user_id=instance.user_id).first()
+    if profile:
+        LeaderboardEntry.refresh_for_profile(profile)
+
+
+@receiver(post_save, sender=Rank)
+@receiver(post_delete, sender=Rank)
+def _refresh_leaderboard_ranks(sender, **kwargs):
+    from .rank_service import rank_table
+    rank_table.invalidate()
+    LeaderboardEntry.refresh_ranks()
+
+
 class Post(models.Model):
     """Посты пользователей"""
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts')
@@ -718,17 +964,21 @@ class Post(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
     is_active = models.BooleanField(default=True, verbose_name="Активен")
+    likes_count = models.IntegerField(default=0, verbose_name="Количество лайков")
     
     class Meta:
         verbose_name = "Пост"
         verbose_name_plural = "Посты"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='post_feed_idx'),
+        ]
     
     def __str__(self):
         return f"Пост от {self.author.username} ({self.created_at.strftime('%d.%m.%Y %H:%M')})"
     
     def get_likes_count(self):
-        return self.likes.count()
+        return self.likes_count
     
     def get_comments_count(self):
         return self.comments.count()
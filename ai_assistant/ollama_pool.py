@@ -0,0 +1,172 @@
+"""
+Пул запросов к локальному Ollama-серверу.
+
+Запросы ставятся в ограниченную очередь и обрабатываются фиксированным
+числом рабочих потоков, которые используют общий пул HTTP-соединений.
+Одинаковые запросы, пришедшие одновременно, объединяются в один. Запрос,
+который все ожидающие уже бросили по таймауту, в Ollama не отправляется. Фоновый
+поток периодически пингует сервер с keep_alive, чтобы модель оставалась
+загруженной в память и не было задержек холодного старта.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaOverloaded(Exception):
+    """Очередь запросов к Ollama переполнена"""
+
+
+class _Job:
+    """Запрос в очереди: результат и момент, после которого его никто не ждёт"""
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.future = Future()
+        self.expires_at = 0.0
+
+    def extend(self, timeout):
+        """Учесть ещё одного ожидающего с таймаутом timeout (None - без ограничения)"""
+        if timeout is None:
+            self.expires_at = None
+        elif self.expires_at is not None:
+            self.expires_at = max(self.expires_at, time.monotonic() + timeout)
+
+    def expired(self):
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+
+class OllamaPool:
+    """Ограниченный пул запросов к Ollama с очередью и прогревом модели"""
+
+    def __init__(self, host, model, max_concurrency=2, queue_size=32,
+                 keep_alive='30m', keepalive_interval=300, request_timeout=60):
+        self.host = host.rstrip('/')
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.keep_alive = keep_alive
+        self.keepalive_interval = keepalive_interval
+        self.request_timeout = request_timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+        self._workers = [
+            threading.Thread(target=self._worker, name=f'ollama-worker-{i}', daemon=True)
+            for i in range(max_concurrency)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+        self._keepalive_thread = None
+        if keepalive_interval:
+            self._keepalive_thread = threading.Thread(
+                target=self._keepalive_loop, name='ollama-keepalive', daemon=True
+            )
+            self._keepalive_thread.start()
+
+    def submit(self, messages, timeout=None):
+        """Поставить запрос в очередь; возвращает Future с текстом ответа.
+
+        timeout - сколько секунд вызывающий готов ждать: если к моменту
+        обработки результат уже никому не нужен, запрос отменяется.
+        """
+        key = tuple((m['role'], m['content']) for m in messages)
+
+        with self._lock:
+            job = self._in_flight.get(key)
+            if job is not None:
+                # Такой же запрос уже выполняется - ждём его результат
+                job.extend(timeout)
+                return job.future
+
+            job = _Job(messages)
+            job.extend(timeout)
+            try:
+                self._queue.put_nowait((key, job))
+            except queue.Full:
+                raise OllamaOverloaded('Очередь запросов к Ollama переполнена')
+            self._in_flight[key] = job
+
+        return job.future
+
+    def chat(self, messages, timeout=None):
+        """Синхронный запрос к модели через очередь"""
+        return self.submit(messages, timeout=timeout).result(timeout=timeout)
+
+    def warm_up(self):
+        """Загрузить модель в память без генерации ответа"""
+        try:
+            self.session.post(
+                f'{self.host}/api/generate',
+                json={'model': self.model, 'keep_alive': self.keep_alive},
+                timeout=self.request_timeout,
+            )
+            return True
+        except requests.RequestException as e:
+            logger.warning("Ollama warm-up error: %s", e)
+            return False
+
+    def shutdown(self):
+        """Остановить рабочие потоки"""
+        self._stopped.set()
+        for _ in self._workers:
+            self._queue.put((None, None))
+        self.session.close()
+
+    def _request(self, messages):
+        response = self.session.post(
+            f'{self.host}/api/chat',
+            json={
+                'model': self.model,
+                'messages': messages,
+                'stream': False,
+                'keep_alive': self.keep_alive,
+            },
+            timeout=self.request_timeout,
+        )
+        response.raise_for_status()
+        return response.json()['message']['content']
+
+    def _worker(self):
+        while True:
+            key, job = self._queue.get()
+            if job is None:
+                return
+
+            try:
+                with self._lock:
+                    # Все ожидающие ушли по таймауту - не тратим время модели
+                    if job.expired():
+                        job.future.cancel()
+                        self._in_flight.pop(key, None)
+                if job.future.set_running_or_notify_cancel():
+                    try:
+                        job.future.set_result(self._request(job.messages))
+                    except Exception as e:
+                        job.future.set_exception(e)
+            finally:
+                with self._lock:
+                    if self._in_flight.get(key) is job:
+                        del self._in_flight[key]
+                self._queue.task_done()
+
+    def _keepalive_loop(self):
+        self.warm_up()
+        while not self._stopped.wait(self.keepalive_interval):
+            self.warm_up()
@@ -0,0 +1,380 @@
+"""
+Сервисы рангов и мест в рейтинге по очкам профиля.
+
+Таблица рангов (Rank) небольшая и меняется редко, поэтому она целиком
+держится в памяти процесса и ищется через bisect.
+
+Место в общем рейтинге одно для профиля и страницы рейтинга: больше очков
+выше, при равенстве очков выше профиль с меньшим id. Если указан
+CACHE_REDIS_URL, места хранятся в сортированном множестве Redis, общем для
+всех процессов: место - это ZRANK, а изменение очков - один ZADD после
+фиксации транзакции. Без Redis используется дерево Фенвика по корзинам
+очков фиксированной ширины в памяти процесса; оно подходит для одного
+процесса и страховочно перестраивается полным проходом по профилям раз в
+REBUILD_INTERVAL секунд.
+"""
+import threading
+import time
+import logging
+from bisect import bisect_left, bisect_right, insort
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+logger = logging.getLogger(__name__)
+
+REBUILD_INTERVAL = 300  # секунды, страховочная полная перестройка дерева в памяти
+MAX_BUCKETS = 1 << 16  # корзин очков в дереве; при большем разбросе корзины шире
+
+RANKS_ZSET_KEY = 'leaderboard:ranks'
+RANKS_READY_KEY = 'leaderboard:ranks:ready'
+RANKS_LOCK_KEY = 'leaderboard:ranks:lock'
+RANKS_LOCK_TTL = 60  # секунды на полную загрузку множества
+
+RANK_TABLE_VERSION_KEY = 'ranks:table_version'
+RANK_TABLE_CHECK_INTERVAL = 5  # секунды между проверками версии в общем кэше
+
+
+class RankTable:
+    """Таблица рангов в памяти процесса"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ranks = None
+        self._min_points = []
+        self._by_level = []
+        self._version = None
+        self._checked_at = 0.0
+
+    def _load(self):
+        from .models import Rank
+
+        version = cache.get(RANK_TABLE_VERSION_KEY, 0)
+        ranks = list(Rank.objects.order_by('min_points', 'level'))
+        with self._lock:
+            self._ranks = ranks
+            self._min_points = [rank.min_points for rank in ranks]
+            self._by_level = sorted(ranks, key=lambda rank: rank.level)
+            self._version = version
+            self._checked_at = time.monotonic()
+
+    def _ensure_loaded(self):
+        if self._ranks is None or self._version is None:
+            self._load()
+        elif time.monotonic() - self._checked_at > RANK_TABLE_CHECK_INTERVAL:
+            if cache.get(RANK_TABLE_VERSION_KEY, 0) != self._version:
+                self._load()
+            else:
+                self._checked_at = time.monotonic()
+
+    def get_rank_by_points(self, points):
+        """Ранг с наибольшим порогом, не превышающим points"""
+        self._ensure_loaded()
+        ranks = self._ranks
+        index = bisect_right(self._min_points, points) - 1
+        while index >= 0:
+            rank = ranks[index]
+            if rank.max_points is None or rank.max_points >= points:
+                return rank
+            index -= 1
+        return None
+
+    def get_rank_by_level(self, level):
+        """Ранг по уровню"""
+        self._ensure_loaded()
+        for rank in self._by_level:
+            if rank.level == level:
+                return rank
+        return None
+
+    def get_next_rank(self, rank):
+        """Следующий по уровню ранг"""
+        self._ensure_loaded()
+        for candidate in self._by_level:
+            if candidate.level > rank.level:
+                return candidate
+        return None
+
+    def invalidate(self):
+        """Сбросить таблицу во всех процессах"""
+        try:
+            cache.incr(RANK_TABLE_VERSION_KEY)
+        except ValueError:
+            cache.set(RANK_TABLE_VERSION_KEY, 1, None)
+        with self._lock:
+            self._version = None
+
+
+class FenwickTree:
+    """Дерево Фенвика для префиксных сумм"""
+
+    def __init__(self, size):
+        self.size = size
+        self.tree = [0] * (size + 1)
+
+    @classmethod
+    def from_counts(cls, counts):
+        """Построение за O(n) по списку значений"""
+        tree = cls(len(counts))
+        for i, value in enumerate(counts, 1):
+            tree.tree[i] += value
+            parent = i + (i & -i)
+            if parent <= tree.size:
+                tree.tree[parent] += tree.tree[i]
+        return tree
+
+    def add(self, index, delta):
+        """Прибавить delta к элементу с индексом index (с нуля)"""
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix_sum(self, count):
+        """Сумма первых count элементов"""
+        total = 0
+        i = count
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+
+def _count_position(points, profile_id=None):
+    """Место по COUNT в базе, если быстрый сервис недоступен"""
+    from django.db.models import Q
+    from .models import UserProfile
+
+    ahead = Q(points__gt=points)
+    if profile_id is not None:
+        ahead |= Q(points=points, id__lt=profile_id)
+    return UserProfile.objects.filter(ahead).count() + 1
+
+
+class RankService:
+    """Место в рейтинге по дереву Фенвика в памяти процесса.
+
+    Дерево считает профили в корзинах очков фиксированной ширины, а внутри
+    корзины хранятся отсортированные значения очков, поэтому новое значение
+    не требует пересборки координат. Диапазон корзин берётся с запасом и
+    расширяется вдвое, только когда очки выходят за его границы.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._points = None  # id профиля -> очки; None - дерево ещё не построено
+        self._ids = {}  # очки -> отсортированные id профилей
+        self._bucket_values = {}  # корзина -> отсортированные значения очков
+        self._low = 0
+        self._width = 1
+        self._tree = FenwickTree(0)
+        self._total = 0
+        self._built_at = 0.0
+
+    def _bucket(self, points):
+        return (points - self._low) // self._width
+
+    def _reset(self, points_by_id, low, high):
+        """Разложить профили по корзинам, покрывающим [low, high] с запасом"""
+        width = 1
+        while (high - low) // width + 1 > MAX_BUCKETS // 2:
+            width *= 2
+        self._width = width
+        self._low = low - low % width
+        size = min(MAX_BUCKETS, 2 * ((high - self._low) // width + 1))
+
+        self._points = points_by_id
+        self._ids = {}
+        self._bucket_values = {}
+        counts = [0] * size
+        for profile_id, points in points_by_id.items():
+            self._ids.setdefault(points, []).append(profile_id)
+            counts[self._bucket(points)] += 1
+        for points, ids in self._ids.items():
+            ids.sort()
+            self._bucket_values.setdefault(self._bucket(points), []).append(points)
+        for values in self._bucket_values.values():
+            values.sort()
+        self._tree = FenwickTree.from_counts(counts)
+        self._total = len(points_by_id)
+
+    def rebuild(self):
+        """Перестроить дерево по данным из базы (полный проход по профилям)"""
+        from .models import UserProfile
+
+        points_by_id = dict(UserProfile.objects.values_list('id', 'points'))
+        values = points_by_id.values()
+        with self._lock:
+            self._reset(points_by_id, min(values, default=0), max(values, default=0))
+            self._built_at = time.monotonic()
+
+    def position(self, points, profile_id=None):
+        """Место профиля: 1 + профили с большим счётом + профили с тем же счётом и меньшим id"""
+        if self._points is None or time.monotonic() - self._built_at > REBUILD_INTERVAL:
+            self.rebuild()
+
+        with self._lock:
+            bucket = self._bucket(points)
+            if bucket < 0:
+                higher = self._total
+            elif bucket >= self._tree.size:
+                higher = 0
+            else:
+                values = self._bucket_values.get(bucket, ())
+                higher = self._total - self._tree.prefix_sum(bucket + 1) + sum(
+                    len(self._ids[value]) for value in values[bisect_right(values, points):]
+                )
+            ties_before = 0
+            if profile_id is not None:
+                ties_before = bisect_left(self._ids.get(points, ()), profile_id)
+            return higher + ties_before + 1
+
+    def set_points(self, profile_id, points):
+        """Учесть очки профиля после фиксации транзакции (None - профиль удалён)"""
+        transaction.on_commit(lambda: self._set(profile_id, points))
+
+    def _set(self, profile_id, points):
+        with self._lock:
+            if self._points is None:
+                return  # дерево построится при первом чтении
+            old_points = self._points.pop(profile_id, None)
+            if old_points is not None:
+                self._remove(old_points, profile_id)
+            if points is None:
+                return
+
+            bucket = self._bucket(points)
+            if bucket < 0 or bucket >= self._tree.size:
+                high = self._low + self._width * self._tree.size - 1
+                self._reset(self._points, min(self._low, points), max(high, points))
+            self._points[profile_id] = points
+            self._add(points, profile_id)
+
+    def _add(self, points, profile_id):
+        bucket = self._bucket(points)
+        ids = self._ids.get(points)
+        if ids is None:
+            ids = self._ids[points] = []
+            insort(self._bucket_values.setdefault(bucket, []), points)
+        insort(ids, profile_id)
+        self._tree.add(bucket, 1)
+        self._total += 1
+
+    def _remove(self, points, profile_id):
+        bucket = self._bucket(points)
+        ids = self._ids[points]
+        del ids[bisect_left(ids, profile_id)]
+        if not ids:
+            del self._ids[points]
+            values = self._bucket_values[bucket]
+            del values[bisect_left(values, points)]
+            if not values:
+                del self._bucket_values[bucket]
+        self._tree.add(bucket, -1)
+        self._total -= 1
+
+
+class RedisRankService:
+    """Место в рейтинге по сортированному множеству Redis, общему для всех процессов.
+
+    Очки хранятся со знаком минус, а участник - id профиля, дополненный
+    нулями: при равных очках Redis упорядочивает участников как строки, так что
+    ZRANK сразу даёт место с тем же правилом равенства, что и база.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self._client = None
+
+    def _redis(self):
+        if self._client is None:
+            import redis
+            self._client = redis.Redis.from_url(self.url)
+        return self._client
+
+    @staticmethod
+    def _member(profile_id):
+        return f"{profile_id:020d}"
+
+    def rebuild(self):
+        """Загрузить множество из базы; False, если загрузку уже выполняет другой процесс"""
+        from .models import UserProfile
+
+        client = self._redis()
+        if not client.set(RANKS_LOCK_KEY, 1, nx=True, ex=RANKS_LOCK_TTL):
+            return False
+        try:
+            tmp_key = f"{RANKS_ZSET_KEY}:tmp"
+            client.delete(tmp_key)
+            batch = {}
+            rows = UserProfile.objects.values_list('id', 'points').iterator(chunk_size=2000)
+            for profile_id, points in rows:
+                batch[self._member(profile_id)] = -points
+                if len(batch) >= 1000:
+                    client.zadd(tmp_key, batch)
+                    batch = {}
+            if batch:
+                client.zadd(tmp_key, batch)
+
+            pipe = client.pipeline()
+            if client.exists(tmp_key):
+                pipe.rename(tmp_key, RANKS_ZSET_KEY)
+            else:
+                pipe.delete(RANKS_ZSET_KEY)
+            pipe.set(RANKS_READY_KEY, 1)
+            pipe.execute()
+            return True
+        finally:
+            client.delete(RANKS_LOCK_KEY)
+
+    def position(self, points, profile_id=None):
+        """Место профиля за один запрос к Redis (COUNT в базе, пока множество не загружено)"""
+        client = self._redis()
+        pipe = client.pipeline()
+        pipe.exists(RANKS_READY_KEY)
+        if profile_id is not None:
+            pipe.zrank(RANKS_ZSET_KEY, self._member(profile_id))
+        else:
+            pipe.zcount(RANKS_ZSET_KEY, '-inf', f"({-points}")
+        ready, rank = pipe.execute()
+
+        if not ready:
+            if self.rebuild():
+                return self.position(points, profile_id)
+            return _count_position(points, profile_id)
+        if rank is None:
+            # Профиль ещё не попал в множество (транзакция не зафиксирована)
+            return _count_position(points, profile_id)
+        return rank + 1
+
+    def set_points(self, profile_id, points):
+        """Учесть очки профиля после фиксации транзакции (None - профиль удалён)"""
+        transaction.on_commit(lambda: self._set(profile_id, points))
+
+    def _set(self, profile_id, points):
+        try:
+            client = self._redis()
+            if points is None:
+                client.zrem(RANKS_ZSET_KEY, self._member(profile_id))
+            else:
+                client.zadd(RANKS_ZSET_KEY, {self._member(profile_id): -points})
+        except Exception as e:
+            logger.error("Rank service update error: %s", e)
+            try:
+                # Множество разошлось с базой - перезагрузим его при следующем чтении
+                self._redis().delete(RANKS_READY_KEY)
+            except Exception:
+                pass
+
+
+def _create_rank_service():
+    redis_url = getattr(settings, 'CACHE_REDIS_URL', '')
+    if redis_url:
+        return RedisRankService(redis_url)
+    return RankService()
+
+
+rank_table = RankTable()
+rank_service = _create_rank_service()
@@ -1,3 +1,605 @@
-from django.test import TestCase
+import json
+import random
+import threading
+import time as time_module
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from schedule.models import (
+    StudentGroup, Student, Teacher, Subject, ClassSchedule,
+    PersonalScheduleItem, ScheduleNote,
+)
+from . import answer_cache
+from . import views
+from .ai_service import ai_assistant
+from .answer_cache import AnswerCache
+from .arithmetic import ExpressionError, MAX_EXPRESSION_LENGTH, evaluate_expression
+from .models import LeaderboardEntry, NoteCompletion, Post, SubjectScore, TaskCompletion, UserProfile
+from .ollama_pool import OllamaOverloaded, OllamaPool
+from .rank_service import RankService, RedisRankService, rank_service
+from .topic_router import KeywordRouter
+
+
+class ScheduleViewQueryCountTests(TestCase):
+    """Число запросов schedule_view не зависит от количества пар, задач и заметок"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='pass')
+        self.group = StudentGroup.objects.create(name='ИВТ-21', course=2)
+        self.student = Student.objects.create(user=self.user, group=self.group)
+        teacher = Teacher.objects.create(first_name='Иван', last_name='Петров')
+        self.subject = Subject.objects.create(name='Математика', teacher=teacher)
+        self.client.login(username='student', password='pass')
+        cache.clear()
+
+    def _add_week(self, per_day):
+        # Кэш расписания сбрасывается после фиксации транзакции
+        with self.captureOnCommitCallbacks(execute=True):
+            self._create_week(per_day)
+
+    def _create_week(self, per_day):
+        for day in range(1, 8):
+            for i in range(per_day):
+                schedule = ClassSchedule.objects.create(
+                    subject=self.subject, group=self.group, day_of_week=day,
+                    start_time=time(9 + i), end_time=time(10 + i), room='101',
+                )
+                item = PersonalScheduleItem.objects.create(
+                    user=self.user, title=f'Задача {day}-{i}', day_of_week=day,
+                    start_time=time(18 + i % 4), end_time=time(19 + i % 4),
+                )
+                group_note = ScheduleNote.objects.create(
+                    user=self.user, class_schedule=schedule, title='Заметка к паре',
+                )
+                ScheduleNote.objects.create(
+                    user=self.user, personal_item=item, title='Заметка к задаче',
+                )
+                NoteCompletion.objects.create(user=self.user, schedule_note=group_note, is_completed=True)
+                TaskCompletion.objects.create(user=self.user, schedule_item=item, is_completed=True)
+
+    def _count_queries(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('schedule'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_query_count_is_constant(self):
+        self._add_week(per_day=1)
+        small_count, _ = self._count_queries()
+
+        self._add_week(per_day=3)
+        large_count, response = self._count_queries()
+
+        self.assertEqual(small_count, large_count)
+
+        monday = response.context['week_data'][0]
+        self.assertEqual(len(monday['group_schedules']), 4)
+        self.assertEqual(len(monday['personal_schedules']), 4)
+        self.assertTrue(all(row['is_completed'] for row in monday['personal_schedules']))
+        self.assertTrue(all(n['is_completed'] for row in monday['group_schedules'] for n in row['notes']))
+
+    def test_schedule_view_query_budget(self):
+        self._add_week(per_day=2)
+        # сессия, пользователь, студент, группа, пары группы, личные задачи,
+        # заметки со статусом, выполненные задачи, профиль (context processor)
+        with self.assertNumQueries(9):
+            self.client.get(reverse('schedule'))
+
+
+class AnswerCacheTests(SimpleTestCase):
+    """Кэш ответов: точные и почти одинаковые вопросы, TTL и вытеснение"""
+
+    ANSWER = 'Закон всемирного тяготения: F = G * m1 * m2 / r^2'
+
+    def test_exact_hit(self):
+        cache = AnswerCache()
+        cache.set('Закон всемирного тяготения Ньютона', self.ANSWER)
+        self.assertEqual(cache.get('закон всемирного тяготения ньютона?'), self.ANSWER)
+
+    def test_near_duplicate_hit(self):
+        cache = AnswerCache()
+        cache.set('Что такое закон всемирного тяготения Ньютона?', self.ANSWER)
+        self.assertEqual(cache.get('закон всемирного тяготения ньютон'), self.ANSWER)
+
+    def test_dissimilar_question_misses(self):
+        cache = AnswerCache()
+        cache.set('Что такое закон всемирного тяготения Ньютона?', self.ANSWER)
+        self.assertIsNone(cache.get('Что такое фотосинтез?'))
+        self.assertIsNone(cache.get('2 закон Ньютона'))
+
+    def test_negated_question_is_different(self):
+        cache = AnswerCache()
+        cache.set('Не является ли кит рыбой?', 'ответ на отрицание')
+        self.assertIsNone(cache.get('Является ли кит рыбой?'))
+        self.assertEqual(cache.get('не является ли кит рыбой'), 'ответ на отрицание')
+
+        cache.set('Является ли кит рыбой?', 'ответ')
+        self.assertEqual(cache.get('является ли кит рыбой'), 'ответ')
+        self.assertEqual(cache.get('Не является ли кит рыбой?'), 'ответ на отрицание')
+
+    def test_entry_expires_after_ttl(self):
+        cache = AnswerCache(ttl=60)
+        with mock.patch.object(answer_cache.time, 'monotonic', return_value=1000.0):
+            cache.set('закон всемирного тяготения', self.ANSWER)
+        with mock.patch.object(answer_cache.time, 'monotonic', return_value=1059.0):
+            self.assertEqual(cache.get('закон всемирного тяготения'), self.ANSWER)
+        with mock.patch.object(answer_cache.time, 'monotonic', return_value=1061.0):
+            self.assertIsNone(cache.get('закон всемирного тяготения'))
+            self.assertIsNone(cache.get('закон всемирного тяготения ньютона'))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = AnswerCache(max_size=2)
+        cache.set('фотосинтез растений', 'ответ 1')
+        cache.set('закон ома', 'ответ 2')
+        cache.get('фотосинтез растений')
+        cache.set('теорема пифагора', 'ответ 3')
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('закон ома'))
+        self.assertEqual(cache.get('фотосинтез растений'), 'ответ 1')
+        self.assertEqual(cache.get('теорема пифагора'), 'ответ 3')
+
+    def test_fallback_is_not_cached(self):
+        question = 'Как устроен квантовый компьютер?'
+        ai_assistant.answer_cache.clear()
+        with mock.patch.object(ai_assistant, 'enabled', True), \
+                mock.patch.object(ai_assistant, 'racing_enabled', True), \
+                mock.patch.object(ai_assistant, '_race_providers', return_value=None):
+            response = ai_assistant.generate_response(question)
+
+        self.assertEqual(response, ai_assistant._simple_fallback(question))
+        self.assertIsNone(ai_assistant.answer_cache.get(question))
+
+
+class ProviderDeadlineTests(SimpleTestCase):
+    """Таймауты запросов к провайдерам выводятся из дедлайна гонки"""
+
+    def test_wikipedia_timeouts_fit_into_remaining_deadline(self):
+        not_found = mock.Mock(status_code=404)
+        with mock.patch('ai_assistant.ai_service.requests.get', return_value=not_found) as get:
+            result = ai_assistant._query_wikipedia('Что такое атом?', deadline=time_module.monotonic() + 2)
+
+        self.assertIsNone(result)
+        self.assertEqual(get.call_count, 2)
+        for call in get.call_args_list:
+            self.assertLessEqual(call.kwargs['timeout'], 2)
+
+    def test_expired_deadline_skips_request(self):
+        with mock.patch('ai_assistant.ai_service.requests.get') as get:
+            result = ai_assistant._query_wikipedia('Что такое атом?', deadline=time_module.monotonic() - 1)
+
+        self.assertIsNone(result)
+        get.assert_not_called()
+
+
+class ArithmeticTests(SimpleTestCase):
+    """Вычислитель выражений: корректные ответы и каждое ограничение"""
+
+    def assertRejected(self, expr, reason):
+        with self.assertRaises(ExpressionError) as ctx:
+            evaluate_expression(expr)
+        self.assertEqual(str(ctx.exception), reason)
+
+    def test_valid_expressions(self):
+        self.assertEqual(evaluate_expression('2 + 2 * 2'), 6)
+        self.assertEqual(evaluate_expression('(2 + 2) * 2'), 8)
+        self.assertEqual(evaluate_expression('7 / 2'), 3.5)
+        self.assertEqual(evaluate_expression('6 / 3'), 2)
+        self.assertEqual(evaluate_expression('3 × 4 ÷ 2'), 6)
+        self.assertEqual(evaluate_expression('1,5 * 2'), 3)
+        self.assertEqual(evaluate_expression('-7 % 3'), 2)
+        self.assertEqual(evaluate_expression('2 ** 10'), 1024)
+        self.assertEqual(evaluate_expression('2 ** -1'), 0.5)
+
+    def test_exponent_cap(self):
+        self.assertEqual(evaluate_expression('1 ** 64'), 1)
+        self.assertRejected('1 ** 65', 'exponent_too_large')
+        self.assertRejected('9 ** 9 ** 9', 'exponent_too_large')
+
+    def test_magnitude_cap(self):
+        self.assertEqual(evaluate_expression('10 ** 15'), 10 ** 15)
+        self.assertRejected('10 ** 16', 'too_large')
+        self.assertRejected('10000000000000000', 'too_large')
+        self.assertRejected('99999999 * 99999999', 'too_large')
+        self.assertRejected('(-8) ** 0.5', 'too_large')
+
+    def test_size_caps(self):
+        self.assertRejected('1+' * (MAX_EXPRESSION_LENGTH // 2) + '1', 'too_long')
+        self.assertRejected('+'.join(['1'] * 40), 'too_complex')
+
+    def test_division_by_zero(self):
+        self.assertRejected('1 / 0', 'division_by_zero')
+        self.assertRejected('5 % 0', 'division_by_zero')
+        self.assertRejected('0 ** -1', 'division_by_zero')
+
+    def test_unsupported_input(self):
+        self.assertRejected('', 'empty')
+        self.assertRejected('__import__("os")', 'bad_chars')
+        self.assertRejected('2 +', 'syntax')
+        self.assertRejected('2 // 3', 'unsupported')
+
+    def test_rejected_result_is_not_cached_as_valid(self):
+        for _ in range(2):
+            self.assertRejected('10 ** 16', 'too_large')
+        self.assertEqual(evaluate_expression('10 ** 15'), 10 ** 15)
+        self.assertRejected('10**16', 'too_large')
+
+
+class KeywordRouterTests(SimpleTestCase):
+    """Офлайн-темы: совпадение по целым словам с окончаниями"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.router = KeywordRouter([
+            {'keywords': ['привет', 'хай'], 'answer': 'greeting'},
+            {'keywords': ['производная', 'число'], 'answer': 'math'},
+            {'keywords': ['программирование', 'код'], 'answer': 'code'},
+            {'keywords': ['химия', 'химический', 'атом'], 'answer': 'chemistry'},
+            {'keywords': ['биология', 'живой', 'организм'], 'answer': 'biology'},
+        ])
+
+    def test_inflected_forms_match(self):
+        self.assertEqual(self.router.answer('Как найти производной функции?'), 'math')
+        self.assertEqual(self.router.answer('Химическая реакция'), 'chemistry')
+        self.assertEqual(self.router.answer('Из чего состоят атомы'), 'chemistry')
+        self.assertEqual(self.router.answer('живые организмы'), 'biology')
+
+    def test_priority_follows_topic_order(self):
+        self.assertEqual(self.router.answer('Привет! Что такое производная?'), 'greeting')
+        self.assertEqual(self.router.answer('число атомов'), 'math')
+
+    def test_keyword_inside_other_word_does_not_match(self):
+        self.assertIsNone(self.router.answer('Что такое живопись?'))
+        self.assertIsNone(self.router.answer('Уголовный кодекс'))
+        self.assertIsNone(self.router.answer('Атомный ледокол'))
+        self.assertIsNone(self.router.answer('Что такое хайп'))
+        self.assertIsNone(self.router.answer('Расскажи про эпохи'))
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """Фейковый Ollama: /api/chat отвечает последним сообщением, когда тест откроет release"""
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length))
+
+        if self.path == '/api/chat':
+            self.server.requests.append(payload)
+            self.server.started.set()
+            self.server.release.wait(5)
+            body = {'message': {'role': 'assistant', 'content': 'Ответ: ' + payload['messages'][-1]['content']}}
+        else:
+            body = {}
+
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class OllamaPoolTests(SimpleTestCase):
+    """Пул запросов к Ollama на локальном фейковом сервере"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeOllamaHandler)
+        self.server.requests = []
+        self.server.started = threading.Event()
+        self.server.release = threading.Event()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.pool = OllamaPool(
+            host=f'http://127.0.0.1:{self.server.server_port}',
+            model='test', max_concurrency=1, queue_size=1, keepalive_interval=0,
+        )
+
+    def tearDown(self):
+        self.server.release.set()
+        self.pool.shutdown()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _messages(self, text):
+        return [{'role': 'user', 'content': text}]
+
+    def test_identical_requests_are_coalesced(self):
+        first = self.pool.submit(self._messages('закон Ома'))
+        second = self.pool.submit(self._messages('закон Ома'))
+        self.assertIs(first, second)
+
+        self.server.release.set()
+        self.assertEqual(first.result(timeout=5), 'Ответ: закон Ома')
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_full_queue_rejects_request(self):
+        running = self.pool.submit(self._messages('первый'))
+        self.assertTrue(self.server.started.wait(5))
+        self.pool.submit(self._messages('второй'))
+
+        with self.assertRaises(OllamaOverloaded):
+            self.pool.submit(self._messages('третий'))
+
+        self.server.release.set()
+        self.assertEqual(running.result(timeout=5), 'Ответ: первый')
+
+    def test_timed_out_request_is_not_sent(self):
+        running = self.pool.submit(self._messages('первый'))
+        self.assertTrue(self.server.started.wait(5))
+
+        with self.assertRaises(FutureTimeoutError):
+            self.pool.chat(self._messages('второй'), timeout=0.1)
+
+        self.server.release.set()
+        running.result(timeout=5)
+        self.pool._queue.join()
+        self.assertEqual([r['messages'][-1]['content'] for r in self.server.requests], ['первый'])
+
+
+class LeaderboardPositionTests(TestCase):
+    """Место в профиле совпадает с местом на странице рейтинга"""
+
+    def test_profile_and_leaderboard_agree_on_ties(self):
+        for i, points in enumerate([30, 10, 30, 20, 30]):
+            user = User.objects.create_user(username=f'player{i}', password='pass')
+            UserProfile.objects.filter(user=user).update(points=points)
+        rank_service.rebuild()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            # Профиль загружен без очков: прежнее значение неизвестно
+            profile = UserProfile.objects.only('id').get(user__username='player4')
+            profile.points = 40
+            profile.save()
+
+        ordered = list(UserProfile.objects.order_by('-points', 'id'))
+        for place, profile in enumerate(ordered, 1):
+            entry = LeaderboardEntry.refresh_for_profile(profile)
+            self.assertEqual(profile.get_leaderboard_position(), place)
+            self.assertEqual(entry.get_position(), place)
+        self.assertEqual(ordered[0].user.username, 'player4')
+
+
+class FenwickRankServiceTests(SimpleTestCase):
+    """Дерево мест в памяти совпадает с полным пересчётом при любых изменениях очков"""
+
+    def test_positions_match_brute_force(self):
+        service = RankService()
+        service._reset({}, 0, 0)
+        service._built_at = time_module.monotonic()
+        points_by_id = {}
+        rnd = random.Random(7)
+
+        for step in range(600):
+            profile_id = rnd.randint(1, 60)
+            if rnd.random() < 0.1:
+                points = None
+            elif step % 97 == 0:
+                # Редкие выбросы расширяют диапазон корзин
+                points = rnd.choice([-5000, 10 ** 9, 3 * 10 ** 6])
+            else:
+                points = rnd.randint(0, 300)
+            service._set(profile_id, points)
+            if points is None:
+                points_by_id.pop(profile_id, None)
+            else:
+                points_by_id[profile_id] = points
+
+            ordered = sorted(points_by_id, key=lambda pid: (-points_by_id[pid], pid))
+            for place, pid in enumerate(ordered, 1):
+                self.assertEqual(service.position(points_by_id[pid], pid), place)
+            self.assertEqual(
+                service.position(150),
+                1 + sum(1 for value in points_by_id.values() if value > 150)
+            )
+
+
+class FakeRedis:
+    """Минимальный Redis в памяти: строки и сортированные множества"""
+
+    def __init__(self):
+        self.values = {}
+        self.zsets = {}
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    def exists(self, key):
+        return int(key in self.values or key in self.zsets)
+
+    def delete(self, key):
+        self.values.pop(key, None)
+        self.zsets.pop(key, None)
+
+    def rename(self, src, dst):
+        self.zsets[dst] = self.zsets.pop(src)
+
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def zrem(self, key, member):
+        self.zsets.get(key, {}).pop(member, None)
+
+    def zrank(self, key, member):
+        zset = self.zsets.get(key, {})
+        if member not in zset:
+            return None
+        return sorted(zset, key=lambda m: (zset[m], m)).index(member)
+
+    def zcount(self, key, low, high):
+        limit = float(high.lstrip('('))
+        return sum(1 for score in self.zsets.get(key, {}).values() if score < limit)
+
+    def pipeline(self):
+        return FakeRedisPipeline(self)
+
+
+class FakeRedisPipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+class RedisRankServiceTests(TestCase):
+    """Места из сортированного множества Redis, общего для процессов"""
+
+    def setUp(self):
+        self.service = RedisRankService('redis://fake')
+        self.redis = self.service._client = FakeRedis()
+        self.profiles = []
+        for i, points in enumerate([30, 10, 30, 20]):
+            user = User.objects.create(username=f'racer{i}')
+            UserProfile.objects.filter(user=user).update(points=points)
+            self.profiles.append(UserProfile.objects.get(user=user))
+
+    def _expected(self):
+        return {
+            profile.id: place
+            for place, profile in enumerate(UserProfile.objects.order_by('-points', 'id'), 1)
+        }
+
+    def test_loads_on_first_read_and_orders_ties_by_id(self):
+        for profile in self.profiles:
+            self.assertEqual(self.service.position(profile.points, profile.id), self._expected()[profile.id])
+        self.assertEqual(self.service.position(25), 3)
+
+    def test_update_after_commit(self):
+        self.service.rebuild()
+        with mock.patch('ai_assistant.rank_service.rank_service', self.service):
+            with self.captureOnCommitCallbacks(execute=True):
+                profile = self.profiles[1]
+                profile.points = 35
+                profile.save()
+                self.assertEqual(self.service.position(profile.points, profile.id), 4)
+        self.assertEqual(self.service.position(profile.points, profile.id), 1)
+
+        with mock.patch('ai_assistant.rank_service.rank_service', self.service):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.profiles[0].user.delete()
+        for profile in self.profiles[1:]:
+            self.assertEqual(self.service.position(0, profile.id), self._expected()[profile.id])
+
+    def test_falls_back_to_count_while_another_process_loads(self):
+        self.redis.set('leaderboard:ranks:lock', 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.service.position(30, self.profiles[2].id), 2)
+        self.assertFalse(self.redis.exists('leaderboard:ranks'))
+
+
+class LeaderboardPageTests(TestCase):
+    """Keyset-пагинация общего рейтинга и рейтинга по предмету"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='viewer', password='pass')
+        self.client.login(username='viewer', password='pass')
+        teacher = Teacher.objects.create(first_name='Иван', last_name='Петров')
+        self.subject = Subject.objects.create(name='Физика', teacher=teacher)
+        for i, points in enumerate([50, 40, 40, 40, 30, 20, 20, 10]):
+            user = User.objects.create(username=f'leader{i}')
+            UserProfile.objects.filter(user=user).update(points=points)
+            SubjectScore.objects.create(
+                user_profile=UserProfile.objects.get(user=user), subject=self.subject, points=points
+            )
+        for profile in UserProfile.objects.all():
+            LeaderboardEntry.refresh_for_profile(profile)
+
+    def _walk(self, subject):
+        """Пройти все страницы по курсору: список (место, id профиля)"""
+        seen = []
+        params = {'subject': subject}
+        with mock.patch.object(views, 'LEADERBOARD_PAGE_SIZE', 3):
+            while True:
+                response = self.client.get(reverse('leaderboard'), params)
+                seen.extend((leader['place'], leader['profile'].id) for leader in response.context['leaders'])
+                if response.context['next_cursor'] is None:
+                    return seen
+                params['after'] = response.context['next_cursor']
+
+    def _places(self, subject, cursor=None):
+        params = {'subject': subject}
+        if cursor is not None:
+            params['after'] = cursor
+        with mock.patch.object(views, 'LEADERBOARD_PAGE_SIZE', 3):
+            response = self.client.get(reverse('leaderboard'), params)
+        self.assertEqual(response.status_code, 200)
+        return [leader['place'] for leader in response.context['leaders']]
+
+    def test_overall_cursor_walks_all_places_in_order(self):
+        expected = list(
+            LeaderboardEntry.objects.filter(total_points__gt=0)
+            .order_by('-total_points', 'user_profile').values_list('user_profile', flat=True)
+        )
+        self.assertEqual(self._walk('all'), list(enumerate(expected, 1)))
+
+    def test_subject_cursor_walks_all_places_in_order(self):
+        expected = list(
+            SubjectScore.objects.filter(subject=self.subject)
+            .order_by('-points', 'id').values_list('user_profile', flat=True)
+        )
+        self.assertEqual(self._walk(self.subject.id), list(enumerate(expected, 1)))
+
+    def test_bad_cursor_shows_first_page(self):
+        for subject in ['all', self.subject.id]:
+            self.assertEqual(self._places(subject), [1, 2, 3])
+            for cursor in ['abc', '40', '40_99999999999999999999', '1_0']:
+                self.assertEqual(self._places(subject, cursor), [1, 2, 3])
+
+    def test_place_does_not_come_from_cursor(self):
+        first_id = SubjectScore.objects.order_by('-points', 'id').values_list('id', flat=True)[0]
+        # Старый формат курсора с местом от клиента больше не принимается
+        self.assertEqual(self._places(self.subject.id, '5_0_-100'), [1, 2, 3])
+        self.assertEqual(self._places(self.subject.id, f'50_{first_id}'), [2, 3, 4])
+
+
+class PostsFeedCursorTests(TestCase):
+    """Курсорная пагинация ленты постов"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='pass')
+        self.client.login(username='reader', password='pass')
+        for i in range(views.POSTS_PAGE_SIZE + 5):
+            Post.objects.create(author=self.user, content=f'Пост {i}')
+
+    def test_cursor_round_trip(self):
+        first = self.client.get(reverse('posts_feed'))
+        first_ids = [post.id for post in first.context['posts']]
+        self.assertEqual(len(first_ids), views.POSTS_PAGE_SIZE)
+        self.assertIsNotNone(first.context['next_cursor'])
+
+        second = self.client.get(reverse('posts_feed'), {'before': first.context['next_cursor']})
+        second_ids = [post.id for post in second.context['posts']]
+        self.assertEqual(len(second_ids), 5)
+        self.assertIsNone(second.context['next_cursor'])
+        self.assertEqual(
+            first_ids + second_ids,
+            list(Post.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        )
+
+    def test_bad_cursor_shows_first_page(self):
+        first_ids = [post.id for post in self.client.get(reverse('posts_feed')).context['posts']]
+        for cursor in ['99999999999999999999_1', '1_99999999999999999999', 'abc', '1_2_3', '-5_x']:
+            response = self.client.get(reverse('posts_feed'), {'before': cursor})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([post.id for post in response.context['posts']], first_ids)
@@ -0,0 +1,132 @@
+"""
+Маршрутизатор офлайн-тем для быстрых ответов AI-ассистента.
+
+Темы (ключевые слова -> готовый ответ) загружаются из JSON-файла и
+компилируются в автомат Ахо-Корасик, поэтому вопрос проверяется за один
+проход независимо от количества тем и ключевых слов. Ключевое слово
+засчитывается, только если оно начинается с начала слова в вопросе, а после
+основы идёт одно из известных окончаний: "живопись" не совпадает с "живой".
+"""
+import json
+from collections import deque
+from pathlib import Path
+
+
+DEFAULT_TOPICS_FILE = Path(__file__).resolve().parent / 'data' / 'fallback_topics.json'
+
+# Окончания, отбрасываемые при нормализации ключевых слов (самые длинные первыми)
+_ENDINGS = (
+    'ами', 'ями', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими',
+    'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ый', 'ий', 'ой', 'ом', 'ем',
+    'ах', 'ях', 'ов', 'ев', 'ам', 'ям', 'ую', 'юю',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+)
+_ENDING_SET = frozenset(_ENDINGS)
+_MIN_STEM_LENGTH = 4
+
+
+def normalize_text(text):
+    """Нормализация текста вопроса перед поиском"""
+    return (text or '').lower().replace('ё', 'е')
+
+
+def stem_word(word):
+    """Простейший стемминг: отбрасывает окончание, если остаётся достаточно длинная основа"""
+    for ending in _ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= _MIN_STEM_LENGTH:
+            return word[:-len(ending)]
+    return word
+
+
+def normalize_keyword(keyword):
+    """Нормализация ключевого слова: основа каждого слова фразы"""
+    return ' '.join(stem_word(word) for word in normalize_text(keyword).split())
+
+
+class KeywordRouter:
+    """Автомат Ахо-Корасик: ключевое слово -> тема с наивысшим приоритетом"""
+
+    def __init__(self, topics):
+        self.topics = list(topics)
+
+        # Бор: переходы, суффиксные ссылки и ключевые слова, оканчивающиеся в узле (длина, тема)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+
+        for index, topic in enumerate(self.topics):
+            for keyword in topic.get('keywords', []):
+                self._add(normalize_keyword(keyword), index)
+
+        self._build()
+
+    def _add(self, keyword, topic_index):
+        if not keyword:
+            return
+        node = 0
+        for ch in keyword:
+            next_node = self._goto[node].get(ch)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][ch] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = next_node
+        self._out[node].append((len(keyword), topic_index))
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+
+                # Ключевые слова, которые являются суффиксами текущего, тоже оканчиваются здесь
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def match(self, text):
+        """Тема с наивысшим приоритетом, ключевое слово которой встречается в тексте"""
+        best = None
+        node = 0
+        goto, fail, out = self._goto, self._fail, self._out
+        text = normalize_text(text)
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+
+            for length, found in out[node]:
+                if (best is None or found < best) and self._is_whole_word(text, i - length + 1, i + 1):
+                    best = found
+            if best == 0:
+                break
+
+        return self.topics[best] if best is not None else None
+
+    @staticmethod
+    def _is_whole_word(text, start, end):
+        """Совпадение начинается с начала слова и продолжается только окончанием"""
+        if start > 0 and text[start - 1].isalnum():
+            return False
+        word_end = end
+        while word_end < len(text) and text[word_end].isalnum():
+            word_end += 1
+        return word_end == end or text[end:word_end] in _ENDING_SET
+
+    def answer(self, text):
+        """Готовый ответ для текста или None"""
+        topic = self.match(text)
+        return topic['answer'] if topic else None
+
+    @classmethod
+    def from_file(cls, path=None):
+        """Загрузить темы из JSON-файла"""
+        with open(path or DEFAULT_TOPICS_FILE, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data.get('topics', []))
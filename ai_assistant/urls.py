@@ -17,6 +17,7 @@ urlpatterns = [
     path('posts/create/', views.create_post, name='create_post'),
     path('posts/<int:post_id>/like/', views.like_post, name='like_post'),
     path('posts/<int:post_id>/comment/', views.add_comment, name='add_comment'),
+    path('posts/<int:post_id>/comments/', views.post_comments, name='post_comments'),
     path('polls/<int:option_id>/vote/', views.vote_poll, name='vote_poll'),
     path('tasks/<int:task_id>/toggle/', views.toggle_task_completion, name='toggle_task_completion'),
     path('tasks/stats/', views.get_task_stats, name='get_task_stats'),
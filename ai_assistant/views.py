@@ -6,15 +6,23 @@ from django.db import models
 from .models import KnowledgeCard, AIConversation, StudyProgress, SubjectScore, StudentNote, PointsAdjustment
 from .forms import QuickNoteForm
 from .auth_views import register
+from .arithmetic import evaluate_expression
 from schedule.models import ClassSchedule, Subject, Student, StudentGroup
+from schedule import timetable
 from datetime import date, timedelta
 import random
-import ast
-import operator
 import re
 from .models import UserProfile
 
 
+LEADERBOARD_PAGE_SIZE = 50
+LEADERBOARD_CACHE_TTL = 60  # секунды
+KNOWLEDGE_CARDS_PAGE_SIZE = 24
+POSTS_PAGE_SIZE = 20
+COMMENTS_PAGE_SIZE = 50
+STATS_CACHE_TTL = 30  # секунды, для эндпоинтов, которые опрашивает клиент
+
+
 def update_subject_score(user_profile, subject_name, points_change, correct_change=0, wrong_change=0):
     """Обновляет статистику по предмету"""
     try:
@@ -66,11 +74,7 @@ def dashboard(request):
     # Расписание на сегодня
     today = date.today()
     day_of_week = today.weekday() + 1  # Конвертация в формат модели (1-7)
-    today_schedules = ClassSchedule.objects.filter(
-        group=student.group,
-        day_of_week=day_of_week,
-        is_active=True
-    ).order_by('start_time')
+    today_schedules = timetable.get_group_day(student.group_id, day_of_week)
     
     # Ближайшая пара
     next_class = None
@@ -245,96 +249,75 @@ def schedule_view(request):
 
     note_form = ScheduleNoteForm()
     
-    # Получаем расписание на неделю
-    week_data = []
+    # Получаем расписание на неделю: несколько общих запросов, разбор по дням в Python
+    from .models import NoteCompletion, TaskCompletion
 
-    group_ids = list(ClassSchedule.objects.filter(group=student.group, is_active=True).values_list('id', flat=True))
-    personal_ids = list(PersonalScheduleItem.objects.filter(user=request.user, is_active=True).values_list('id', flat=True))
+    group_week = timetable.get_group_week(student.group_id)
+    group_schedules = [s for day in range(1, 8) for s in group_week[day]]
+    personal_schedules = list(
+        PersonalScheduleItem.objects.filter(user=request.user, is_active=True)
+        .order_by('day_of_week', 'start_time')
+    )
+
+    group_ids = [s.id for s in group_schedules]
+    personal_ids = [it.id for it in personal_schedules]
 
     notes_by_group = {}
-    if group_ids:
-        notes = ScheduleNote.objects.filter(user=request.user, class_schedule_id__in=group_ids).order_by('-created_at')
-        
+    notes_by_personal = {}
+    if group_ids or personal_ids:
+        # Заметки вместе со статусом выполнения одним запросом
+        notes = ScheduleNote.objects.filter(
+            models.Q(class_schedule_id__in=group_ids) | models.Q(personal_item_id__in=personal_ids),
+            user=request.user
+        ).annotate(
+            is_completed=models.Exists(
+                NoteCompletion.objects.filter(
+                    user=request.user,
+                    schedule_note=models.OuterRef('pk'),
+                    is_completed=True
+                )
+            )
+        ).order_by('-created_at')
+
         for n in notes:
-            # Проверяем, выполнена ли заметка
-            from .models import NoteCompletion
-            is_completed = NoteCompletion.objects.filter(
-                user=request.user,
-                schedule_note=n,
-                is_completed=True
-            ).exists()
-            
-            # Добавляем заметку с статусом выполнения
             note_data = {
                 'id': n.id,
                 'title': n.title,
                 'description': n.description,
                 'created_at': n.created_at,
-                'is_completed': is_completed
+                'is_completed': n.is_completed
             }
-            notes_by_group.setdefault(n.class_schedule_id, []).append(note_data)
+            if n.class_schedule_id:
+                notes_by_group.setdefault(n.class_schedule_id, []).append(note_data)
+            if n.personal_item_id:
+                notes_by_personal.setdefault(n.personal_item_id, []).append(note_data)
 
-    notes_by_personal = {}
+    completed_item_ids = set()
     if personal_ids:
-        for n in ScheduleNote.objects.filter(user=request.user, personal_item_id__in=personal_ids).order_by('-created_at'):
-            # Проверяем, выполнена ли заметка
-            from .models import NoteCompletion
-            is_completed = NoteCompletion.objects.filter(
+        completed_item_ids = set(
+            TaskCompletion.objects.filter(
                 user=request.user,
-                schedule_note=n,
+                schedule_item_id__in=personal_ids,
                 is_completed=True
-            ).exists()
-            
-            # Добавляем заметку с статусом выполнения
-            note_data = {
-                'id': n.id,
-                'title': n.title,
-                'description': n.description,
-                'created_at': n.created_at,
-                'is_completed': is_completed
-            }
-            notes_by_personal.setdefault(n.personal_item_id, []).append(note_data)
-
-    for day in range(1, 8):
-        group_schedules = ClassSchedule.objects.filter(
-            group=student.group,
-            day_of_week=day,
-            is_active=True
-        ).order_by('start_time')
+            ).values_list('schedule_item_id', flat=True)
+        )
 
-        personal_schedules = PersonalScheduleItem.objects.filter(
-            user=request.user,
-            day_of_week=day,
-            is_active=True,
-        ).order_by('start_time')
-
-        group_rows = []
-        for s in group_schedules:
-            group_rows.append({
-                'obj': s, 
-                'notes': notes_by_group.get(s.id, [])
-            })
+    week_data = [
+        {'day': day, 'group_schedules': [], 'personal_schedules': []}
+        for day in range(1, 8)
+    ]
 
-        personal_rows = []
-        for it in personal_schedules:
-            # Проверяем, выполнена ли задача
-            from .models import TaskCompletion
-            is_completed = TaskCompletion.objects.filter(
-                user=request.user,
-                schedule_item=it,
-                is_completed=True
-            ).exists()
-            
-            personal_rows.append({
-                'obj': it, 
-                'notes': notes_by_personal.get(it.id, []),
-                'is_completed': is_completed
-            })
+    for s in group_schedules:
+        week_data[s.day_of_week - 1]['group_schedules'].append({
+            'obj': s, 
+            'notes': notes_by_group.get(s.id, [])
+        })
 
-        week_data.append({
-            'day': day,
-            'group_schedules': group_rows,
-            'personal_schedules': personal_rows,
+    for it in personal_schedules:
+        week_data[it.day_of_week - 1]['personal_schedules'].append({
+            'obj': it, 
+            'notes': notes_by_personal.get(it.id, []),
+            'is_completed': it.id in completed_item_ids
         })
     
     context = {
@@ -353,23 +336,35 @@ def knowledge_cards(request):
     subject_id = request.GET.get('subject')
     difficulty = request.GET.get('difficulty')
     
-    cards = KnowledgeCard.objects.filter(is_active=True)
+    from django.core.paginator import Paginator
+
+    cards = KnowledgeCard.objects.filter(is_active=True).select_related('subject').order_by('subject__name', 'title', 'id')
     
     if subject_id:
         cards = cards.filter(subject_id=subject_id)
     if difficulty:
         cards = cards.filter(difficulty_level=difficulty)
     
-    # Получаем прогресс для каждой карточки
-    for card in cards:
-        try:
-            progress = StudyProgress.objects.get(user=request.user, knowledge_card=card)
-            card.user_progress = progress.mastery_level
-        except StudyProgress.DoesNotExist:
-            card.user_progress = 1
+    page_obj = Paginator(cards, KNOWLEDGE_CARDS_PAGE_SIZE).get_page(request.GET.get('page'))
+    page_cards = list(page_obj.object_list)
+
+    # Прогресс по карточкам страницы одним запросом
+    progress_map = dict(
+        StudyProgress.objects.filter(
+            user=request.user,
+            knowledge_card_id__in=[card.id for card in page_cards]
+        ).values_list('knowledge_card_id', 'mastery_level')
+    )
+    for card in page_cards:
+        card.user_progress = progress_map.get(card.id, 1)
     
     context = {
-        'cards': cards,
+        'cards': page_cards,
+        'page_obj': page_obj,
+        'is_paginated': page_obj.has_other_pages(),
+        'progress_summary': StudyProgress.get_summary(request.user),
+        'current_subject': subject_id or '',
+        'current_difficulty': difficulty or '',
         'subjects': Subject.objects.all(),
     }
     
@@ -533,33 +528,129 @@ def profile_view(request, username):
 
 @login_required
 def posts_feed(request):
-    """Лента постов"""
+    """Лента постов с keyset-пагинацией.
+
+    Курсор имеет вид "микросекунды_id" последнего поста предыдущей страницы.
+    Количество комментариев считается подзапросом (лайки хранятся счётчиком
+    в самом посте), комментарии подгружаются отдельно при раскрытии поста.
+    """
+    from datetime import datetime, timezone as dt_timezone
+    from django.db.models.functions import Coalesce
     from .models import Post, PostLike, Comment
-    
-    posts = Post.objects.filter(is_active=True).select_related('author', 'author__profile').prefetch_related('likes', 'comments', 'comments__author', 'comments__author__profile', 'poll_options')
-    
-    # Добавляем информацию о лайках и комментариях
+
+    epoch = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+    def count_subquery(model):
+        return Coalesce(
+            models.Subquery(
+                model.objects.filter(post=models.OuterRef('pk'))
+                .order_by()
+                .values('post')
+                .annotate(n=models.Count('id'))
+                .values('n')
+            ),
+            0
+        )
+
+    posts = Post.objects.filter(is_active=True).select_related(
+        'author', 'author__profile'
+    ).prefetch_related('poll_options').annotate(
+        comments_count=count_subquery(Comment),
+        is_liked=models.Exists(
+            PostLike.objects.filter(post=models.OuterRef('pk'), user=request.user)
+        ),
+    ).order_by('-created_at', '-id')
+
+    cursor = request.GET.get('before')
+    if cursor:
+        try:
+            micros, last_id = (int(part) for part in cursor.split('_'))
+            last_created = epoch + timedelta(microseconds=micros)
+            if not 0 < last_id < 2 ** 63:
+                raise ValueError(cursor)
+            posts = posts.filter(
+                models.Q(created_at__lt=last_created) |
+                models.Q(created_at=last_created, id__lt=last_id)
+            )
+        except (ValueError, OverflowError):
+            # Подделанный или устаревший курсор - показываем первую страницу
+            cursor = None
+
+    posts = list(posts[:POSTS_PAGE_SIZE + 1])
+    has_next = len(posts) > POSTS_PAGE_SIZE
+    posts = posts[:POSTS_PAGE_SIZE]
+
+    # Добавляем подсчет голосов для опросов
     for post in posts:
-        post.is_liked = post.is_liked_by(request.user)
-        post.likes_count = post.get_likes_count()
-        post.comments_count = post.get_comments_count()
-        # Добавляем подсчет голосов для опросов
         if post.post_type == 'poll':
-            post.total_votes = sum(option.votes_count for option in post.poll_options.all())
+            options = post.poll_options.all()
+            post.total_votes = sum(option.votes_count for option in options)
             # Добавляем проценты для каждого варианта
-            for option in post.poll_options.all():
+            for option in options:
                 if post.total_votes > 0:
                     option.percentage = round((option.votes_count / post.total_votes) * 100, 0)
                 else:
                     option.percentage = 0
-    
+
+    next_cursor = None
+    if has_next:
+        last = posts[-1]
+        micros = (last.created_at - epoch) // timedelta(microseconds=1)
+        next_cursor = f"{micros}_{last.id}"
+
     context = {
         'posts': posts,
+        'next_cursor': next_cursor,
+        'is_first_page': not cursor,
     }
     
     return render(request, 'ai_assistant/posts_feed.html', context)
 
 
+@login_required
+def post_comments(request, post_id):
+    """Комментарии к посту (подгружаются при раскрытии)"""
+    from django.urls import reverse
+    from .models import Post, Comment
+
+    if not Post.objects.filter(id=post_id, is_active=True).exists():
+        return JsonResponse({
+            'success': False,
+            'message': 'Пост не найден'
+        })
+
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author', 'author__profile'
+    ).order_by('created_at', 'id')
+
+    after = request.GET.get('after')
+    if after and after.isdigit():
+        comments = comments.filter(id__gt=int(after))
+
+    comments = list(comments[:COMMENTS_PAGE_SIZE + 1])
+    has_next = len(comments) > COMMENTS_PAGE_SIZE
+    comments = comments[:COMMENTS_PAGE_SIZE]
+
+    data = []
+    for comment in comments:
+        profile = getattr(comment.author, 'profile', None)
+        data.append({
+            'id': comment.id,
+            'author': comment.author.username,
+            'author_name': comment.author.get_full_name() or comment.author.username,
+            'author_url': reverse('profile_view', args=[comment.author.username]),
+            'avatar': profile.avatar.url if profile and profile.avatar else '',
+            'content': comment.content,
+            'created_at': timezone.localtime(comment.created_at).strftime('%d.%m.%Y %H:%M'),
+        })
+
+    return JsonResponse({
+        'success': True,
+        'comments': data,
+        'next_cursor': comments[-1].id if has_next else None,
+    })
+
+
 @login_required
 def create_post(request):
     """Создание поста"""
@@ -697,33 +788,35 @@ def get_task_stats(request):
     """Получение статистики выполнения задач"""
     from .models import TaskCompletion, NoteCompletion
     from schedule.models import PersonalScheduleItem, ScheduleNote
+    from django.core.cache import cache
     
     try:
-        # Общее количество задач (только персональные)
-        total_tasks = PersonalScheduleItem.objects.filter(user=request.user, is_active=True).count()
-        
-        # Выполненные персональные задачи
-        completed_tasks = TaskCompletion.objects.filter(
-            user=request.user, 
-            is_completed=True,
-            schedule_item__is_active=True
-        ).count()
-        
-        # Задачи на сегодня
-        from datetime import date
         today_weekday = date.today().isoweekday()
-        today_tasks = PersonalScheduleItem.objects.filter(
-            user=request.user, 
-            day_of_week=today_weekday,
-            is_active=True
-        ).count()
+        cache_key = TaskCompletion.stats_cache_key(request.user.id)
+        counts = cache.get(cache_key)
+        if counts is not None and counts.get('weekday') != today_weekday:
+            counts = None
+        
+        if counts is None:
+            # Все счётчики одним запросом с условной агрегацией
+            done = models.Q(taskcompletion__user=request.user, taskcompletion__is_completed=True)
+            today = models.Q(day_of_week=today_weekday)
+            counts = PersonalScheduleItem.objects.filter(
+                user=request.user,
+                is_active=True
+            ).aggregate(
+                total_tasks=models.Count('id', distinct=True),
+                completed_tasks=models.Count('taskcompletion', filter=done, distinct=True),
+                today_tasks=models.Count('id', filter=today, distinct=True),
+                today_completed=models.Count('taskcompletion', filter=done & today, distinct=True),
+            )
+            counts['weekday'] = today_weekday
+            cache.set(cache_key, counts, STATS_CACHE_TTL)
         
-        today_completed = TaskCompletion.objects.filter(
-            user=request.user,
-            is_completed=True,
-            schedule_item__day_of_week=today_weekday,
-            schedule_item__is_active=True
-        ).count()
+        total_tasks = counts['total_tasks']
+        completed_tasks = counts['completed_tasks']
+        today_tasks = counts['today_tasks']
+        today_completed = counts['today_completed']
         
         completion_rate = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
         
@@ -819,26 +912,35 @@ def toggle_note_completion(request, note_id):
 @login_required
 def like_post(request, post_id):
     """Лайк/анлайк поста"""
+    from django.db import transaction
     from .models import Post, PostLike
     
     try:
-        post = Post.objects.get(id=post_id, is_active=True)
-        like, created = PostLike.objects.get_or_create(
-            user=request.user,
-            post=post
-        )
-        
-        if not created:
-            # Если лайк уже был, удаляем его (анлайк)
-            like.delete()
-            is_liked = False
-        else:
-            is_liked = True
+        with transaction.atomic():
+            post = Post.objects.get(id=post_id, is_active=True)
+            like, created = PostLike.objects.get_or_create(
+                user=request.user,
+                post=post
+            )
+            
+            if not created:
+                # Если лайк уже был, удаляем его (анлайк)
+                deleted, _ = PostLike.objects.filter(pk=like.pk).delete()
+                delta = -deleted
+                is_liked = False
+            else:
+                delta = 1
+                is_liked = True
+            
+            # Счётчик меняется на стороне базы, без гонки чтение-запись
+            if delta:
+                Post.objects.filter(pk=post.pk).update(likes_count=models.F('likes_count') + delta)
+            likes_count = Post.objects.filter(pk=post.pk).values_list('likes_count', flat=True).first()
         
         return JsonResponse({
             'success': True,
             'is_liked': is_liked,
-            'likes_count': post.get_likes_count()
+            'likes_count': likes_count
         })
         
     except Post.DoesNotExist:
@@ -890,59 +992,65 @@ def add_comment(request, post_id):
 @login_required
 def vote_poll(request, option_id):
     """Голосование в опросе"""
+    from django.db import transaction
     from .models import PollOption, PollVote
     
     try:
-        option = PollOption.objects.get(id=option_id)
-        
-        # Проверяем, не голосовал ли пользователь уже за этот вариант
-        existing_vote = PollVote.objects.filter(
-            user=request.user,
-            option=option
-        ).first()
-        
-        if existing_vote:
-            return JsonResponse({
-                'success': False,
-                'message': 'Вы уже голосовали за этот вариант'
-            })
-        
-        # Проверяем, не голосовал ли пользователь в этом опросе вообще
-        user_poll_vote = PollVote.objects.filter(
-            user=request.user,
-            option__post=option.post
-        ).first()
-        
-        if user_poll_vote:
-            # Перемещаем голос на новый вариант
-            old_option = user_poll_vote.option
-            old_option.votes_count -= 1
-            old_option.save()
+        with transaction.atomic():
+            post_id = PollOption.objects.values_list('post_id', flat=True).get(id=option_id)
             
-            # Обновляем существующий голос
-            user_poll_vote.option = option
-            user_poll_vote.save()
-        else:
-            # Создаем новый голос
-            PollVote.objects.create(
-                user=request.user,
-                option=option
+            # Блокируем варианты опроса: голоса за один опрос применяются по очереди
+            options = list(
+                PollOption.objects.select_for_update()
+                .filter(post_id=post_id)
+                .order_by('id')
             )
-        
-        option.votes_count += 1
-        option.save()
+            
+            # Проверяем, голосовал ли пользователь в этом опросе
+            user_poll_vote = PollVote.objects.filter(
+                user=request.user,
+                option__post_id=post_id
+            ).first()
+            
+            if user_poll_vote and user_poll_vote.option_id == option_id:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Вы уже голосовали за этот вариант'
+                })
+            
+            changes = {option_id: 1}
+            if user_poll_vote:
+                # Перемещаем голос на новый вариант
+                changes[user_poll_vote.option_id] = -1
+                user_poll_vote.option_id = option_id
+                user_poll_vote.save(update_fields=['option'])
+            else:
+                # Создаем новый голос
+                PollVote.objects.create(
+                    user=request.user,
+                    option_id=option_id
+                )
+            
+            for changed_id, delta in changes.items():
+                PollOption.objects.filter(pk=changed_id).update(
+                    votes_count=models.F('votes_count') + delta
+                )
+            
+            # Строки заблокированы, поэтому новые значения известны без повторного чтения
+            for opt in options:
+                opt.votes_count += changes.get(opt.id, 0)
         
         # Получаем обновленные данные опроса
         poll_data = []
-        total_votes = sum(opt.votes_count for opt in option.post.poll_options.all())
+        total_votes = sum(opt.votes_count for opt in options)
         
-        for opt in option.post.poll_options.all():
+        for opt in options:
             poll_data.append({
                 'id': opt.id,
                 'text': opt.text,
                 'votes': opt.votes_count,
                 'percentage': round((opt.votes_count / total_votes * 100), 1) if total_votes > 0 else 0,
-                'is_voted': PollVote.objects.filter(user=request.user, option=opt).exists()
+                'is_voted': opt.id == option_id
             })
         
         return JsonResponse({
@@ -977,39 +1085,6 @@ def games_math(request):
 
     profile, _ = UserProfile.objects.get_or_create(user=request.user)
 
-    def _safe_eval_arithmetic(expr):
-        expr = (expr or '').strip()
-        if not expr:
-            raise ValueError('empty')
-        if not re.fullmatch(r"[0-9\s\+\-\*\/\(\)\.]+", expr):
-            raise ValueError('bad_chars')
-
-        node = ast.parse(expr, mode='eval')
-        ops = {
-            ast.Add: operator.add,
-            ast.Sub: operator.sub,
-            ast.Mult: operator.mul,
-            ast.Div: operator.truediv,
-        }
-
-        def _eval(n):
-            if isinstance(n, ast.Expression):
-                return _eval(n.body)
-            if isinstance(n, ast.Constant) and isinstance(n.value, (int, float)):
-                return n.value
-            if isinstance(n, ast.Num):
-                return n.n
-            if isinstance(n, ast.UnaryOp) and isinstance(n.op, (ast.UAdd, ast.USub)):
-                val = _eval(n.operand)
-                return val if isinstance(n.op, ast.UAdd) else -val
-            if isinstance(n, ast.BinOp) and type(n.op) in ops:
-                left = _eval(n.left)
-                right = _eval(n.right)
-                return ops[type(n.op)](left, right)
-            raise ValueError('unsupported')
-
-        return _eval(node)
-
     def _generate_example(level):
         if level == 'easy':
             a = random.randint(1, 20)
@@ -1056,9 +1131,7 @@ def games_math(request):
                 numerator = denom * quotient
                 expr = f"(({a} + {b}) * {c} - {d}) / {denom} + {numerator} / {denom}"
 
-        answer = _safe_eval_arithmetic(expr)
-        if isinstance(answer, float) and answer.is_integer():
-            answer = int(answer)
+        answer = evaluate_expression(expr)
         return expr, answer
 
     level = request.GET.get('level') or request.POST.get('level') or 'easy'
@@ -1932,27 +2005,24 @@ def task_tracker(request):
                 return JsonResponse({'success': False, 'error': str(e)})
     
     # GET запрос - отображение трекера
-    categories = TaskCategory.objects.filter(is_active=True)
-    tasks = TaskTracker.objects.filter(user=request.user).order_by('-created_at')
+    categories = list(TaskCategory.objects.filter(is_active=True))
+    tasks = TaskTracker.objects.filter(user=request.user).select_related('category').order_by('-created_at')
     
-    # Статистика по категориям
-    category_stats = {}
-    total_tasks = tasks.count()
-    completed_tasks = tasks.filter(is_completed=True).count()
+    # Статистика по категориям (один сгруппированный запрос, кэшируется)
+    stats = TaskTracker.get_stats(request.user)
+    total_tasks = sum(row['total'] for row in stats.values())
+    completed_tasks = sum(row['completed'] for row in stats.values())
     
+    category_stats = {}
     for category in categories:
-        cat_tasks = tasks.filter(category=category)
-        cat_total = cat_tasks.count()
-        cat_completed = cat_tasks.filter(is_completed=True).count()
-        
-        if cat_total > 0:
+        row = stats.get(category.id)
+        if row:
             category_stats[category.id] = {
                 'category': category,
-                'total': cat_total,
-                'completed': cat_completed,
-                'percentage': int((cat_completed / cat_total) * 100),
-                'points': cat_tasks.filter(is_completed=True).aggregate(
-                    total_points=models.Sum('points'))['total_points'] or 0
+                'total': row['total'],
+                'completed': row['completed'],
+                'percentage': int((row['completed'] / row['total']) * 100),
+                'points': row['points']
             }
     
     # Рассчитываем максимальные значения для графиков
@@ -1976,103 +2046,156 @@ def task_tracker(request):
     return render(request, 'ai_assistant/task_tracker.html', context)
 
 
+def _leaderboard_page(rows, points_field, cursor=None):
+    """Страница рейтинга с keyset-пагинацией по (очки, id).
+
+    Курсор имеет вид "очки_id" последней строки предыдущей страницы; место
+    первой строки считается на сервере одним COUNT по тому же индексу.
+    Возвращает (строки, место перед первой строкой, следующий курсор).
+    """
+    place = 0
+    if cursor:
+        try:
+            last_points, last_id = (int(part) for part in cursor.split('_'))
+            if not (0 < last_id < 2 ** 63 and abs(last_points) < 2 ** 63):
+                raise ValueError(cursor)
+        except ValueError:
+            # Подделанный или устаревший курсор - показываем первую страницу
+            cursor = None
+        else:
+            place = rows.filter(
+                models.Q(**{f'{points_field}__gt': last_points}) |
+                models.Q(**{points_field: last_points, 'pk__lte': last_id})
+            ).count()
+            rows = rows.filter(
+                models.Q(**{f'{points_field}__lt': last_points}) |
+                models.Q(**{points_field: last_points, 'pk__gt': last_id})
+            )
+
+    rows = list(rows.order_by(f'-{points_field}', 'pk')[:LEADERBOARD_PAGE_SIZE + 1])
+    has_next = len(rows) > LEADERBOARD_PAGE_SIZE
+    rows = rows[:LEADERBOARD_PAGE_SIZE]
+
+    next_cursor = None
+    if has_next:
+        last = rows[-1]
+        next_cursor = f"{getattr(last, points_field)}_{last.pk}"
+
+    return rows, place, next_cursor
+
+
+def _subject_leaders_page(subject, cursor=None):
+    """Страница рейтинга по предмету с keyset-пагинацией.
+
+    Курсор - "очки_id" последней строки предыдущей страницы (см. _leaderboard_page).
+    Первая страница кэшируется и сбрасывается при изменении SubjectScore.
+    """
+    from django.core.cache import cache
+
+    cache_key = SubjectScore.top_cache_key(subject.id)
+    if not cursor:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    scores = SubjectScore.objects.filter(
+        subject=subject,
+        points__gt=0
+    ).select_related('user_profile__user')
+    scores, place, next_cursor = _leaderboard_page(scores, 'points', cursor)
+
+    leaders = []
+    for i, score in enumerate(scores, place + 1):
+        leaders.append({
+            'profile': score.user_profile,
+            'points': score.points,
+            'correct_answers': score.correct_answers,
+            'wrong_answers': score.wrong_answers,
+            'accuracy': score.get_accuracy_percentage(),
+            'rank': score.user_profile.get_rank(),
+            'place': i,
+        })
+
+    if not place:
+        cache.set(cache_key, (leaders, next_cursor), LEADERBOARD_CACHE_TTL)
+
+    return leaders, next_cursor
+
+
 @login_required
 def leaderboard(request):
     """Список лидеров с фильтрацией по предметам"""
+    from .models import LeaderboardEntry
+
     subject_filter = request.GET.get('subject', 'all')
     
-    # Получаем всех пользователей с их профилями
-    users_with_profiles = UserProfile.objects.select_related('user').all()
-    
     # Получаем все предметы
     subjects = Subject.objects.all()
+
+    user_position = None
+    user_points = 0
+    
+    next_cursor = None
     
     # Если выбран конкретный предмет
     if subject_filter != 'all':
         try:
             subject = Subject.objects.get(id=subject_filter)
             title = f"🏆 Рейтинг по предмету: {subject.name}"
+
+            leaders, next_cursor = _subject_leaders_page(subject, request.GET.get('after'))
+
+            # Позиция текущего пользователя
+            user_score = SubjectScore.objects.filter(
+                user_profile__user=request.user,
+                subject=subject,
+                points__gt=0
+            ).first()
+            if user_score:
+                user_position = SubjectScore.objects.filter(
+                    models.Q(points__gt=user_score.points) |
+                    models.Q(points=user_score.points, id__lt=user_score.id),
+                    subject=subject
+                ).count() + 1
+                user_points = user_score.points
             
-            # Фильтруем по предмету
-            leaders = []
-            for profile in users_with_profiles:
-                subject_score = profile.subject_scores.filter(subject=subject).first()
-                if subject_score and subject_score.points > 0:
-                    leaders.append({
-                        'profile': profile,
-                        'points': subject_score.points,
-                        'correct_answers': subject_score.correct_answers,
-                        'wrong_answers': subject_score.wrong_answers,
-                        'accuracy': subject_score.get_accuracy_percentage(),
-                        'rank': profile.get_rank()
-                    })
-            
-            # Сортируем по очкам
-            leaders.sort(key=lambda x: x['points'], reverse=True)
-            
-        except Subject.DoesNotExist:
+        except (Subject.DoesNotExist, ValueError):
             leaders = []
             title = "🏆 Список лидеров"
     else:
-        # Общий рейтинг - учитываем все очки включая шахматы
+        # Общий рейтинг - из денормализованной таблицы, keyset-пагинация без OFFSET
         title = "🏆 Общий рейтинг"
-        
+
+        entries = LeaderboardEntry.objects.filter(
+            total_points__gt=0
+        ).select_related('user_profile__user', 'rank')
+        entries, place, next_cursor = _leaderboard_page(
+            entries, 'total_points', request.GET.get('after')
+        )
+
         leaders = []
-        for profile in users_with_profiles:
-            # Базовые очки профиля
-            total_points = profile.points
-            
-            # Добавляем шахматные очки
-            chess_points = 0
-            chess_wins = 0
-            chess_games = 0
-            try:
-                from .models import ChessStats
-                chess_stats = ChessStats.objects.filter(user=profile.user).first()
-                if chess_stats:
-                    chess_points = chess_stats.chess_points
-                    chess_wins = chess_stats.wins
-                    chess_games = chess_stats.games_played
-                    total_points += chess_points
-            except:
-                pass
-            
-            if total_points > 0:
-                # Считаем общую статистику ответов
-                total_correct = sum(score.correct_answers for score in profile.subject_scores.all())
-                total_wrong = sum(score.wrong_answers for score in profile.subject_scores.all())
-                total_accuracy = 0
-                if (total_correct + total_wrong) > 0:
-                    total_accuracy = int((total_correct / (total_correct + total_wrong)) * 100)
-                
-                leaders.append({
-                    'profile': profile,
-                    'points': total_points,
-                    'correct_answers': total_correct,
-                    'wrong_answers': total_wrong,
-                    'accuracy': total_accuracy,
-                    'rank': profile.get_rank(),
-                    'chess_points': chess_points,
-                    'chess_wins': chess_wins,
-                    'chess_games': chess_games
-                })
-        
-        # Сортируем по общим очкам
-        leaders.sort(key=lambda x: x['points'], reverse=True)
-    
-    # Добавляем место в рейтинге
-    for i, leader in enumerate(leaders, 1):
-        leader['place'] = i
-    
-    # Получаем позицию текущего пользователя
-    user_position = None
-    user_points = 0
-    if request.user.is_authenticated:
-        for leader in leaders:
-            if leader['profile'].user == request.user:
-                user_position = leader['place']
-                user_points = leader['points']
-                break
+        for i, entry in enumerate(entries, place + 1):
+            leaders.append({
+                'profile': entry.user_profile,
+                'points': entry.total_points,
+                'correct_answers': entry.correct_answers,
+                'wrong_answers': entry.wrong_answers,
+                'accuracy': entry.accuracy,
+                'rank': entry.rank,
+                'chess_points': entry.chess_points,
+                'chess_wins': entry.chess_wins,
+                'chess_games': entry.chess_games,
+                'place': i,
+            })
+
+        # Позиция текущего пользователя
+        user_entry = LeaderboardEntry.objects.filter(
+            user_profile__user=request.user,
+            total_points__gt=0
+        ).first()
+        if user_entry:
+            user_position = user_entry.get_position()
+            user_points = user_entry.total_points
     
     context = {
         'leaders': leaders,
@@ -2081,6 +2204,7 @@ def leaderboard(request):
         'title': title,
         'user_position': user_position,
         'user_points': user_points,
+        'next_cursor': next_cursor,
     }
     
     return render(request, 'ai_assistant/leaderboard.html', context)
@@ -2375,25 +2499,39 @@ def chess_stats(request):
     
     stats, created = ChessStats.objects.get_or_create(user=request.user)
     
+    from django.core.cache import cache
+    
     # Получаем все партии
     games = ChessGame.objects.filter(user=request.user).order_by('-started_at')
     
-    # Статистика по сложностям
-    difficulty_stats = {}
-    for difficulty in ['easy', 'medium', 'hard']:
-        diff_games = games.filter(bot_difficulty=difficulty)
-        difficulty_stats[difficulty] = {
-            'games': diff_games.count(),
-            'wins': diff_games.filter(
-                models.Q(result='white_win', user_color='white') |
-                models.Q(result='black_win', user_color='black')
-            ).count(),
-            'draws': diff_games.filter(result='draw').count(),
-            'losses': diff_games.filter(
-                models.Q(result='white_win', user_color='black') |
-                models.Q(result='black_win', user_color='white')
-            ).count(),
+    # Статистика по сложностям одним запросом с условной агрегацией
+    cache_key = ChessGame.stats_cache_key(request.user.id)
+    difficulty_stats = cache.get(cache_key)
+    if difficulty_stats is None:
+        win = (models.Q(result='white_win', user_color='white') |
+               models.Q(result='black_win', user_color='black'))
+        loss = (models.Q(result='white_win', user_color='black') |
+                models.Q(result='black_win', user_color='white'))
+        rows = {
+            row['bot_difficulty']: row
+            for row in games.values('bot_difficulty').annotate(
+                games=models.Count('id'),
+                wins=models.Count('id', filter=win),
+                draws=models.Count('id', filter=models.Q(result='draw')),
+                losses=models.Count('id', filter=loss),
+            ).order_by()
         }
+        
+        difficulty_stats = {}
+        for difficulty in ['easy', 'medium', 'hard']:
+            row = rows.get(difficulty, {})
+            difficulty_stats[difficulty] = {
+                'games': row.get('games', 0),
+                'wins': row.get('wins', 0),
+                'draws': row.get('draws', 0),
+                'losses': row.get('losses', 0),
+            }
+        cache.set(cache_key, difficulty_stats, STATS_CACHE_TTL)
     
     context = {
         'stats': stats,
@@ -1,7 +1,8 @@
 from django.contrib import admin
 from .models import (
     Notification, TelegramMessage, NotificationTemplate,
-    NotificationSettings, SentNotification, LateNotification
+    NotificationSettings, SentNotification, LateNotification, NotificationDailyStat,
+    NotificationOutbox
 )
 
 
@@ -31,6 +32,7 @@ class NotificationSettingsAdmin(admin.ModelAdmin):
 class SentNotificationAdmin(admin.ModelAdmin):
     """Отправленные уведомления"""
     list_display = ['student', 'schedule', 'notification_type', 'sent_at']
+    list_select_related = ['student__user', 'schedule__subject', 'schedule__group']
     list_filter = ['notification_type', 'sent_at', 'schedule__group']
     search_fields = ['student__user__username', 'student__user__first_name', 'schedule__subject__name']
     date_hierarchy = 'sent_at'
@@ -43,6 +45,21 @@ class SentNotificationAdmin(admin.ModelAdmin):
         return False
 
 
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    """Очередь уведомлений"""
+    list_display = ['student', 'schedule', 'notification_type', 'date', 'status', 'attempts', 'sent_at']
+    list_select_related = ['student__user', 'schedule__subject', 'schedule__group']
+    list_filter = ['status', 'notification_type', 'date']
+    search_fields = ['student__user__username', 'chat_id']
+    date_hierarchy = 'date'
+    readonly_fields = ['student', 'schedule', 'notification_type', 'date', 'chat_id', 'message_text',
+                       'attempts', 'next_attempt_at', 'created_at', 'claimed_at', 'sent_at', 'error_message']
+    
+    def has_add_permission(self, request):
+        return False
+
+
 @admin.register(LateNotification)
 class LateNotificationAdmin(admin.ModelAdmin):
     """Опоздания студентов"""
@@ -86,6 +103,20 @@ class TelegramMessageAdmin(admin.ModelAdmin):
         return False
 
 
+@admin.register(NotificationDailyStat)
+class NotificationDailyStatAdmin(admin.ModelAdmin):
+    """Дневная статистика сжатых журналов"""
+    list_display = ['date', 'source', 'notification_type', 'total', 'failed']
+    list_filter = ['source', 'notification_type']
+    date_hierarchy = 'date'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(NotificationTemplate)
 class NotificationTemplateAdmin(admin.ModelAdmin):
     """Шаблоны уведомлений"""
@@ -0,0 +1,123 @@
+"""
+Очередь вопросов из Telegram к AI-ассистенту.
+
+Обработчик сообщения только ставит вопрос в очередь и сразу освобождается.
+Ответы готовят несколько рабочих корутин, вызывая AIAssistant в отдельном
+пуле потоков, так что медленный провайдер не занимает обработчики бота.
+Одинаковые вопросы, заданные одновременно, считаются один раз. Пока ответ
+готовится, чату показывается индикатор набора текста. Число ожидающих
+вопросов на один чат ограничено.
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from telegram.constants import ChatAction
+
+
+logger = logging.getLogger(__name__)
+
+TYPING_INTERVAL = 4  # секунды, индикатор в Telegram гаснет через ~5 секунд
+MAX_MESSAGE_LENGTH = 4096  # ограничение Telegram на длину сообщения
+
+
+class AnswerQueue:
+    """Очередь вопросов к AI с дедупликацией и ограничением на чат"""
+
+    def __init__(self, answer_func, normalize_func=None, workers=4, queue_size=100,
+                 per_chat_limit=1, timeout=60):
+        self.answer_func = answer_func
+        self.normalize_func = normalize_func or (lambda text: text.strip().lower())
+        self.workers = workers
+        self.per_chat_limit = per_chat_limit
+        self.timeout = timeout
+
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bot-ai')
+        self._in_flight = {}
+        self._pending_by_chat = {}
+        self._tasks = []
+        # Цикл событий хранит на задачи только слабые ссылки - держим доставки сами
+        self._deliveries = set()
+
+    def start(self):
+        """Запустить рабочие корутины в текущем цикле событий"""
+        for _ in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    async def stop(self):
+        tasks = self._tasks + list(self._deliveries)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._deliveries.clear()
+        self._executor.shutdown(wait=False)
+
+    async def submit(self, bot, chat_id, question):
+        """Принять вопрос; возвращает текст отказа или None, если вопрос принят"""
+        if self._pending_by_chat.get(chat_id, 0) >= self.per_chat_limit:
+            return "⏳ Я ещё отвечаю на ваш предыдущий вопрос, подождите немного."
+
+        key = self.normalize_func(question)
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            try:
+                self._queue.put_nowait((key, question, future))
+            except asyncio.QueueFull:
+                return "😔 Сейчас слишком много вопросов. Попробуйте через минуту."
+            self._in_flight[key] = future
+
+        self._pending_by_chat[chat_id] = self._pending_by_chat.get(chat_id, 0) + 1
+        delivery = asyncio.create_task(self._deliver(bot, chat_id, future))
+        self._deliveries.add(delivery)
+        delivery.add_done_callback(self._deliveries.discard)
+        return None
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            key, question, future = await self._queue.get()
+            try:
+                answer = await asyncio.wait_for(
+                    loop.run_in_executor(self._executor, self.answer_func, question),
+                    self.timeout
+                )
+                future.set_result(answer)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                self._in_flight.pop(key, None)
+                self._queue.task_done()
+
+    async def _deliver(self, bot, chat_id, future):
+        """Показывать набор текста, пока готовится ответ, затем отправить его"""
+        try:
+            while not future.done():
+                try:
+                    await bot.send_chat_action(chat_id=chat_id, action=ChatAction.TYPING)
+                except Exception as e:
+                    logger.warning("Telegram typing error: %s", e)
+                await asyncio.wait({future}, timeout=TYPING_INTERVAL)
+
+            try:
+                text = future.result()
+            except asyncio.TimeoutError:
+                text = "⌛ Не успел подготовить ответ. Попробуйте переформулировать вопрос."
+            except Exception as e:
+                logger.error("AI answer error: %s", e)
+                text = "😔 Не удалось получить ответ. Попробуйте позже."
+
+            await bot.send_message(chat_id=chat_id, text=str(text)[:MAX_MESSAGE_LENGTH])
+        except Exception as e:
+            logger.error("Telegram send error: %s", e)
+        finally:
+            count = self._pending_by_chat.get(chat_id, 1) - 1
+            if count > 0:
+                self._pending_by_chat[chat_id] = count
+            else:
+                self._pending_by_chat.pop(chat_id, None)
@@ -1,15 +1,113 @@
-import telegram
-from telegram.ext import Updater, CommandHandler, MessageHandler, Filters
+"""
+Telegram-бот StudySense на asyncio (python-telegram-bot 22).
+
+Обновления обрабатываются параллельно, но не больше TELEGRAM_BOT_CONCURRENCY
+одновременно. Запросы к базе выполняются в отдельном ограниченном пуле
+потоков через sync_to_async, чтобы не блокировать цикл событий. Вопросы к
+AI-ассистенту обрабатываются через очередь (см. answer_queue). Бот работает
+через long polling или, если задан TELEGRAM_WEBHOOK_URL, через вебхук.
+
+Запуск: python manage.py runbot
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from telegram import Update
+from telegram.ext import Application, CommandHandler, MessageHandler, filters
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import close_old_connections
+from schedule import timetable
 from schedule.models import Student
+from .answer_queue import AnswerQueue
+
+
+def db_sync_to_async(func):
+    """Выполнить функцию с ORM в пуле потоков бота"""
+    @wraps(func)
+    def run(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(run, thread_sensitive=False)
+
+
+@db_sync_to_async
+def _connect_student(username, chat_id):
+    """Привязка chat_id к студенту; возвращает текст ответа"""
+    try:
+        user = User.objects.get(username=username)
+        student = Student.objects.select_related('group').get(user=user)
+    except User.DoesNotExist:
+        return "❌ Пользователь с таким логином не найден"
+    except Student.DoesNotExist:
+        return "❌ Студент не найден в системе"
+
+    # Привязываем chat_id
+    student.telegram_chat_id = str(chat_id)
+    student.save(update_fields=['telegram_chat_id'])
+
+    return f"✅ Аккаунт успешно привязан!\n\n" \
+           f"👤 Студент: {user.get_full_name()}\n" \
+           f"👥 Группа: {student.group}\n\n" \
+           f"Теперь вы будете получать уведомления о парах!"
+
+
+@db_sync_to_async
+def _today_schedule_text(chat_id):
+    """Текст расписания на сегодня (None, если аккаунт не привязан)"""
+    from datetime import date
+
+    student = Student.objects.filter(telegram_chat_id=str(chat_id)).only('id', 'group_id').first()
+    if not student:
+        return None
+
+    today = date.today()
+    day_of_week = today.weekday() + 1  # Конвертация в формат модели
+    schedules = timetable.get_group_day(student.group_id, day_of_week)
+
+    if not schedules:
+        return "📅 На сегодня пар нет. Отдыхайте! 😊"
+
+    schedule_text = f"📅 Расписание на сегодня ({today.strftime('%d.%m.%Y')}):\n\n"
+
+    for schedule in schedules:
+        schedule_text += f"🕐 {schedule.start_time} - {schedule.end_time}\n" \
+                         f"📚 {schedule.subject.name}\n" \
+                         f"👨‍🏫 {schedule.subject.teacher.get_full_name()}\n" \
+                         f"📍 {schedule.room}\n\n"
 
+    return schedule_text
+
+
+def _answer_question(question):
+    """Ответ AI-ассистента (выполняется в пуле потоков очереди)"""
+    from ai_assistant.ai_service import ai_assistant
+
+    close_old_connections()
+    try:
+        return ai_assistant.generate_response(question)
+    finally:
+        close_old_connections()
 
-def start(update, context):
+
+def _question_key(question):
+    """Ключ для объединения одинаковых вопросов"""
+    from ai_assistant.answer_cache import normalize_question
+
+    return normalize_question(question) or question.strip().lower()
+
+
+async def start(update, context):
     """Обработчик команды /start"""
     user = update.effective_user
     chat_id = update.effective_chat.id
-    
+
     # Приветственное сообщение
     welcome_text = f"👋 Привет, {user.first_name}!\n\n" \
                   f"Я ваш персональный ассистент для учебы.\n\n" \
@@ -19,51 +117,26 @@ def start(update, context):
                   f"• Показывать расписание\n\n" \
                   f"🔐 Для привязки аккаунта введите:\n" \
                   f"/connect ваш_логин"
-    
-    context.bot.send_message(chat_id=chat_id, text=welcome_text)
+
+    await context.bot.send_message(chat_id=chat_id, text=welcome_text)
 
 
-def connect(update, context):
+async def connect(update, context):
     """Привязка Telegram аккаунта к студенческому"""
     chat_id = update.effective_chat.id
-    
+
     if len(context.args) != 1:
-        context.bot.send_message(
+        await context.bot.send_message(
             chat_id=chat_id,
             text="❌ Неверный формат. Используйте: /connect ваш_логин"
         )
         return
-    
-    username = context.args[0]
-    
-    try:
-        user = User.objects.get(username=username)
-        student = Student.objects.get(user=user)
-        
-        # Привязываем chat_id
-        student.telegram_chat_id = str(chat_id)
-        student.save()
-        
-        context.bot.send_message(
-            chat_id=chat_id,
-            text=f"✅ Аккаунт успешно привязан!\n\n"
-                 f"👤 Студент: {user.get_full_name()}\n"
-                 f"👥 Группа: {student.group}\n\n"
-                 f"Теперь вы будете получать уведомления о парах!"
-        )
-    except User.DoesNotExist:
-        context.bot.send_message(
-            chat_id=chat_id,
-            text="❌ Пользователь с таким логином не найден"
-        )
-    except Student.DoesNotExist:
-        context.bot.send_message(
-            chat_id=chat_id,
-            text="❌ Студент не найден в системе"
-        )
 
+    text = await _connect_student(context.args[0], chat_id)
+    await context.bot.send_message(chat_id=chat_id, text=text)
 
-def help_command(update, context):
+
+async def help_command(update, context):
     """Показать справку"""
     help_text = "📖 Справка по командам:\n\n" \
                "/start - Начать работу с ботом\n" \
@@ -71,85 +144,107 @@ def help_command(update, context):
                "/schedule - Показать расписание на сегодня\n" \
                "/help - Показать эту справку\n\n" \
                "❓ Задайте любой вопрос по учебе, и AI-ассистент поможет!"
-    
-    context.bot.send_message(chat_id=update.effective_chat.id, text=help_text)
+
+    await context.bot.send_message(chat_id=update.effective_chat.id, text=help_text)
 
 
-def schedule_today(update, context):
+async def schedule_today(update, context):
     """Показать расписание на сегодня"""
     chat_id = update.effective_chat.id
-    
-    try:
-        student = Student.objects.get(telegram_chat_id=str(chat_id))
-        from datetime import date
-        today = date.today()
-        day_of_week = today.weekday() + 1  # Конвертация в формат модели
-        
-        schedules = ClassSchedule.objects.filter(
-            group=student.group,
-            day_of_week=day_of_week,
-            is_active=True
-        ).order_by('start_time')
-        
-        if not schedules:
-            context.bot.send_message(
-                chat_id=chat_id,
-                text="📅 На сегодня пар нет. Отдыхайте! 😊"
-            )
-            return
-        
-        schedule_text = f"📅 Расписание на сегодня ({today.strftime('%d.%m.%Y')}):\n\n"
-        
-        for schedule in schedules:
-            schedule_text += f"🕐 {schedule.start_time} - {schedule.end_time}\n" \
-                           f"📚 {schedule.subject.name}\n" \
-                           f"👨‍🏫 {schedule.subject.teacher.get_full_name()}\n" \
-                           f"📍 {schedule.room}\n\n"
-        
-        context.bot.send_message(chat_id=chat_id, text=schedule_text)
-        
-    except Student.DoesNotExist:
-        context.bot.send_message(
-            chat_id=chat_id,
-            text="❌ Сначала привяжите аккаунт командой /connect логин"
-        )
+
+    text = await _today_schedule_text(chat_id)
+    if text is None:
+        text = "❌ Сначала привяжите аккаунт командой /connect логин"
+
+    await context.bot.send_message(chat_id=chat_id, text=text)
 
 
-def handle_message(update, context):
+async def handle_message(update, context):
     """Обработчик текстовых сообщений для AI-ассистента"""
+    # Фильтр TEXT пропускает и отредактированные сообщения, у них update.message - None
+    message = update.effective_message
+    if message is None or not message.text:
+        return
     chat_id = update.effective_chat.id
-    user_message = update.message.text
-    
-    # Здесь можно добавить интеграцию с AI-ассистентом
-    context.bot.send_message(
-        chat_id=chat_id,
-        text="🤖 AI-ассистент находится в разработке. Скоро я смогу отвечать на ваши вопросы!"
+    user_message = message.text
+
+    # Ответ придёт отдельным сообщением, когда его подготовит очередь
+    rejection = await context.bot_data['answer_queue'].submit(context.bot, chat_id, user_message)
+    if rejection:
+        await context.bot.send_message(chat_id=chat_id, text=rejection)
+
+
+async def _post_init(application):
+    """Пул потоков для запросов к базе и очередь вопросов к AI"""
+    workers = getattr(settings, 'TELEGRAM_BOT_DB_WORKERS', 8)
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bot-db')
     )
 
+    answer_queue = AnswerQueue(
+        _answer_question,
+        normalize_func=_question_key,
+        workers=getattr(settings, 'TELEGRAM_AI_WORKERS', 4),
+        queue_size=getattr(settings, 'TELEGRAM_AI_QUEUE_SIZE', 100),
+        per_chat_limit=getattr(settings, 'TELEGRAM_AI_PER_CHAT', 1),
+        timeout=getattr(settings, 'TELEGRAM_AI_TIMEOUT', 60),
+    )
+    answer_queue.start()
+    application.bot_data['answer_queue'] = answer_queue
+
+
+async def _post_shutdown(application):
+    answer_queue = application.bot_data.get('answer_queue')
+    if answer_queue:
+        await answer_queue.stop()
+
 
 def setup_bot():
-    """Настройка и запуск бота"""
+    """Настройка бота"""
     if not settings.TELEGRAM_BOT_TOKEN or settings.TELEGRAM_BOT_TOKEN == 'YOUR_BOT_TOKEN_HERE':
         print("⚠️ TELEGRAM_BOT_TOKEN не настроен. Бот не будет запущен.")
         return None
-    
-    updater = Updater(token=settings.TELEGRAM_BOT_TOKEN, use_context=True)
-    dispatcher = updater.dispatcher
-    
+
+    api_url = getattr(settings, 'TELEGRAM_API_URL', 'https://api.telegram.org').rstrip('/')
+    application = (
+        Application.builder()
+        .token(settings.TELEGRAM_BOT_TOKEN)
+        .base_url(f"{api_url}/bot")
+        .concurrent_updates(getattr(settings, 'TELEGRAM_BOT_CONCURRENCY', 32))
+        .post_init(_post_init)
+        .post_shutdown(_post_shutdown)
+        .build()
+    )
+
     # Добавление обработчиков команд
-    dispatcher.add_handler(CommandHandler('start', start))
-    dispatcher.add_handler(CommandHandler('connect', connect))
-    dispatcher.add_handler(CommandHandler('help', help_command))
-    dispatcher.add_handler(CommandHandler('schedule', schedule_today))
-    
+    application.add_handler(CommandHandler('start', start))
+    application.add_handler(CommandHandler('connect', connect))
+    application.add_handler(CommandHandler('help', help_command))
+    application.add_handler(CommandHandler('schedule', schedule_today))
+
     # Обработчик текстовых сообщений
-    dispatcher.add_handler(MessageHandler(Filters.text & ~Filters.command, handle_message))
-    
-    return updater
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+
+    return application
 
 
-if __name__ == '__main__':
-    updater = setup_bot()
-    if updater:
-        updater.start_polling()
-        updater.idle()
+def run_bot():
+    """Запуск бота: вебхук, если задан TELEGRAM_WEBHOOK_URL, иначе long polling"""
+    application = setup_bot()
+    if not application:
+        return
+
+    webhook_url = getattr(settings, 'TELEGRAM_WEBHOOK_URL', '')
+    if webhook_url:
+        path = getattr(settings, 'TELEGRAM_WEBHOOK_PATH', 'telegram')
+        application.run_webhook(
+            listen=getattr(settings, 'TELEGRAM_WEBHOOK_LISTEN', '0.0.0.0'),
+            port=getattr(settings, 'TELEGRAM_WEBHOOK_PORT', 8443),
+            url_path=path,
+            webhook_url=f"{webhook_url.rstrip('/')}/{path}",
+            secret_token=getattr(settings, 'TELEGRAM_WEBHOOK_SECRET', '') or None,
+            allowed_updates=Update.ALL_TYPES,
+        )
+    else:
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
+
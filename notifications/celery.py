@@ -5,19 +5,24 @@ app = 'notifications'
 
 # Настройка периодических задач
 CELERYBEAT_SCHEDULE = {
-    # Проверка начала пар каждую минуту
-    'check-class-start': {
-        'task': 'notifications.tasks.send_class_start_notifications',
-        'schedule': crontab(minute='*'),  # Каждую минуту
+    # Планирование уведомлений о парах каждые 15 минут
+    'plan-class-notifications': {
+        'task': 'notifications.tasks.plan_class_notifications',
+        'schedule': crontab(minute='*/15'),  # Каждые 15 минут
     },
-    # Проверка конца пар каждую минуту  
-    'check-class-end': {
-        'task': 'notifications.tasks.send_class_end_notifications',
-        'schedule': crontab(minute='*'),  # Каждую минуту
+    # Страховочный разбор очереди уведомлений, если задача разбора потерялась
+    'drain-notification-outbox': {
+        'task': 'notifications.tasks.drain_notification_outbox',
+        'schedule': crontab(minute='*/10'),  # Каждые 10 минут
     },
-    # Проверка опозданий каждые 5 минут
-    'check-late-students': {
-        'task': 'notifications.tasks.check_late_students',
-        'schedule': crontab(minute='*/5'),  # Каждые 5 минут
+    # Вечерняя сводка на завтра
+    'send-daily-digests': {
+        'task': 'notifications.tasks.send_daily_digests',
+        'schedule': crontab(hour=20, minute=0),  # Каждый вечер в 20:00
+    },
+    # Сжатие старых журналов отправки в дневную статистику
+    'compact-notification-logs': {
+        'task': 'notifications.tasks.compact_notification_logs',
+        'schedule': crontab(hour=3, minute=30),  # Каждую ночь в 03:30
     },
 }
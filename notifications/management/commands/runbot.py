@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from notifications.bot import run_bot
+
+
+class Command(BaseCommand):
+    help = 'Запускает Telegram-бота (long polling или вебхук)'
+
+    def handle(self, *args, **options):
+        run_bot()
@@ -0,0 +1,48 @@
+# Generated by Django 6.0.2 on 2026-10-19 17:37
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_late_date(apps, schema_editor):
+    """Дата занятия по времени опоздания; повторные записи за день удаляются"""
+    LateNotification = apps.get_model('notifications', 'LateNotification')
+
+    seen = set()
+    duplicates = []
+    for late in LateNotification.objects.order_by('id'):
+        late.late_date = timezone.localdate(late.late_at)
+        key = (late.student_id, late.schedule_id, late.late_date)
+        if key in seen:
+            duplicates.append(late.id)
+            continue
+        seen.add(key)
+        late.save(update_fields=['late_date'])
+
+    LateNotification.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_notificationsettings_sentnotification_and_more'),
+        ('schedule', '0004_schedulenote'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='latenotification',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='latenotification',
+            name='late_date',
+            field=models.DateField(default=django.utils.timezone.localdate, verbose_name='Дата занятия'),
+        ),
+        migrations.RunPython(fill_late_date, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='latenotification',
+            constraint=models.UniqueConstraint(fields=('student', 'schedule', 'late_date'), name='unique_late_per_class_day'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 6.0.2 on 2026-10-19 17:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_latenotification_late_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('source', models.CharField(choices=[('sent_notification', 'Уведомления о парах'), ('telegram_message', 'Сообщения Telegram')], max_length=20, verbose_name='Журнал')),
+                ('notification_type', models.CharField(blank=True, max_length=20, verbose_name='Тип уведомления')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Всего')),
+                ('failed', models.PositiveIntegerField(default=0, verbose_name='Не доставлено')),
+            ],
+            options={
+                'verbose_name': 'Статистика уведомлений за день',
+                'verbose_name_plural': 'Статистика уведомлений по дням',
+                'ordering': ['-date', 'source', 'notification_type'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='sentnotification',
+            index=models.Index(fields=['student', '-sent_at'], name='sentnotif_student_sent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sentnotification',
+            index=models.Index(fields=['sent_at'], name='sentnotif_sent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='telegrammessage',
+            index=models.Index(fields=['chat_id', '-created_at'], name='tgmessage_chat_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='telegrammessage',
+            index=models.Index(fields=['created_at'], name='tgmessage_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='notificationdailystat',
+            constraint=models.UniqueConstraint(fields=('date', 'source', 'notification_type'), name='unique_notification_daily_stat'),
+        ),
+    ]
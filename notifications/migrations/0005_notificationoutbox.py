@@ -0,0 +1,39 @@
+# Generated by Django 6.0.2 on 2026-10-19 17:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_notification_log_retention'),
+        ('schedule', '0004_schedulenote'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_type', models.CharField(choices=[('class_start', 'Начало пары'), ('class_end', 'Конец пары'), ('late_student', 'Опоздание студента')], max_length=20, verbose_name='Тип уведомления')),
+                ('date', models.DateField(verbose_name='Дата занятия')),
+                ('chat_id', models.CharField(max_length=50)),
+                ('message_text', models.TextField(verbose_name='Текст сообщения')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает отправки'), ('sending', 'Отправляется'), ('sent', 'Отправлено'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Статус')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Отправлено')),
+                ('error_message', models.TextField(blank=True)),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='schedule.classschedule', verbose_name='Расписание')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='schedule.student', verbose_name='Студент')),
+            ],
+            options={
+                'verbose_name': 'Уведомление в очереди',
+                'verbose_name_plural': 'Очередь уведомлений',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'id'], name='outbox_status_idx')],
+                'constraints': [models.UniqueConstraint(fields=('student', 'schedule', 'notification_type', 'date'), name='unique_outbox_per_class_day')],
+            },
+        ),
+    ]
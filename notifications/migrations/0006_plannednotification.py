@@ -0,0 +1,32 @@
+# Generated by Django 6.0.2 on 2026-10-19 17:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_notificationoutbox'),
+        ('schedule', '0004_schedulenote'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlannedNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_type', models.CharField(choices=[('class_start', 'Начало пары'), ('class_end', 'Конец пары'), ('late_student', 'Опоздание студента')], max_length=20, verbose_name='Тип уведомления')),
+                ('date', models.DateField(verbose_name='Дата занятия')),
+                ('class_time', models.TimeField(verbose_name='Время по расписанию')),
+                ('planned_at', models.DateTimeField(auto_now_add=True)),
+                ('dispatched_at', models.DateTimeField(blank=True, null=True, verbose_name='Отправлено')),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='schedule.classschedule', verbose_name='Расписание')),
+            ],
+            options={
+                'verbose_name': 'Запланированное уведомление',
+                'verbose_name_plural': 'Запланированные уведомления',
+                'constraints': [models.UniqueConstraint(fields=('schedule', 'notification_type', 'date', 'class_time'), name='unique_planned_notification')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 6.0.2 on 2026-10-19 18:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0007_outbox_retry'),
+        ('schedule', '0004_schedulenote'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notificationoutbox',
+            name='notification_type',
+            field=models.CharField(choices=[('class_start', 'Начало пары'), ('class_end', 'Конец пары'), ('late_student', 'Опоздание студента'), ('daily_digest', 'Сводка на завтра')], max_length=20, verbose_name='Тип уведомления'),
+        ),
+        migrations.AlterField(
+            model_name='notificationoutbox',
+            name='schedule',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='schedule.classschedule', verbose_name='Расписание'),
+        ),
+        migrations.AlterField(
+            model_name='plannednotification',
+            name='notification_type',
+            field=models.CharField(choices=[('class_start', 'Начало пары'), ('class_end', 'Конец пары'), ('late_student', 'Опоздание студента'), ('daily_digest', 'Сводка на завтра')], max_length=20, verbose_name='Тип уведомления'),
+        ),
+        migrations.AlterField(
+            model_name='sentnotification',
+            name='notification_type',
+            field=models.CharField(choices=[('class_start', 'Начало пары'), ('class_end', 'Конец пары'), ('late_student', 'Опоздание студента'), ('daily_digest', 'Сводка на завтра')], max_length=20, verbose_name='Тип уведомления'),
+        ),
+        migrations.AlterField(
+            model_name='sentnotification',
+            name='schedule',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='schedule.classschedule', verbose_name='Расписание'),
+        ),
+        migrations.AddConstraint(
+            model_name='notificationoutbox',
+            constraint=models.UniqueConstraint(condition=models.Q(('schedule__isnull', True)), fields=('student', 'notification_type', 'date'), name='unique_outbox_per_day'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from schedule.models import Student, ClassSchedule, StudentGroup
 
 
@@ -29,6 +30,12 @@ class TelegramMessage(models.Model):
     sent_at = models.DateTimeField(null=True, blank=True)
     error_message = models.TextField(blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['chat_id', '-created_at'], name='tgmessage_chat_created_idx'),
+            models.Index(fields=['created_at'], name='tgmessage_created_idx'),
+        ]
+
     def __str__(self):
         return f"Message to {self.chat_id} - {'Sent' if self.is_sent else 'Pending'}"
 
@@ -71,10 +78,13 @@ class SentNotification(models.Model):
         ('class_start', 'Начало пары'),
         ('class_end', 'Конец пары'),
         ('late_student', 'Опоздание студента'),
+        ('daily_digest', 'Сводка на завтра'),
     ]
     
     student = models.ForeignKey(Student, on_delete=models.CASCADE, verbose_name="Студент")
-    schedule = models.ForeignKey(ClassSchedule, on_delete=models.CASCADE, verbose_name="Расписание")
+    schedule = models.ForeignKey(
+        ClassSchedule, on_delete=models.CASCADE, null=True, blank=True, verbose_name="Расписание"
+    )
     notification_type = models.CharField(
         max_length=20, 
         choices=NOTIFICATION_TYPES,
@@ -87,23 +97,137 @@ class SentNotification(models.Model):
         verbose_name = "Отправленное уведомление"
         verbose_name_plural = "Отправленные уведомления"
         ordering = ['-sent_at']
+        indexes = [
+            models.Index(fields=['student', '-sent_at'], name='sentnotif_student_sent_idx'),
+            models.Index(fields=['sent_at'], name='sentnotif_sent_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.user.get_full_name()} - {self.get_notification_type_display()}"
 
 
+class PlannedNotification(models.Model):
+    """Запланированное событие пары: одна ETA-задача и одна отправка на событие"""
+    schedule = models.ForeignKey(ClassSchedule, on_delete=models.CASCADE, verbose_name="Расписание")
+    notification_type = models.CharField(
+        max_length=20,
+        choices=SentNotification.NOTIFICATION_TYPES,
+        verbose_name="Тип уведомления"
+    )
+    date = models.DateField(verbose_name="Дата занятия")
+    class_time = models.TimeField(verbose_name="Время по расписанию")
+    planned_at = models.DateTimeField(auto_now_add=True)
+    dispatched_at = models.DateTimeField(null=True, blank=True, verbose_name="Отправлено")
+    
+    class Meta:
+        verbose_name = "Запланированное уведомление"
+        verbose_name_plural = "Запланированные уведомления"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['schedule', 'notification_type', 'date', 'class_time'],
+                name='unique_planned_notification'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.schedule_id} - {self.get_notification_type_display()} {self.date} {self.class_time}"
+
+
+class NotificationOutbox(models.Model):
+    """Очередь уведомлений на отправку: не больше одного уведомления на студента, пару, тип и день.
+
+    Уведомления без пары (сводка на завтра) уникальны по студенту, типу и дню.
+    """
+    STATUSES = [
+        ('pending', 'Ожидает отправки'),
+        ('sending', 'Отправляется'),
+        ('sent', 'Отправлено'),
+        ('failed', 'Ошибка'),
+    ]
+    
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, verbose_name="Студент")
+    schedule = models.ForeignKey(
+        ClassSchedule, on_delete=models.CASCADE, null=True, blank=True, verbose_name="Расписание"
+    )
+    notification_type = models.CharField(
+        max_length=20,
+        choices=SentNotification.NOTIFICATION_TYPES,
+        verbose_name="Тип уведомления"
+    )
+    date = models.DateField(verbose_name="Дата занятия")
+    chat_id = models.CharField(max_length=50)
+    message_text = models.TextField(verbose_name="Текст сообщения")
+    status = models.CharField(max_length=10, choices=STATUSES, default='pending', verbose_name="Статус")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Попыток отправки")
+    next_attempt_at = models.DateTimeField(null=True, blank=True, verbose_name="Следующая попытка")
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="Отправлено")
+    error_message = models.TextField(blank=True)
+    
+    class Meta:
+        verbose_name = "Уведомление в очереди"
+        verbose_name_plural = "Очередь уведомлений"
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['student', 'schedule', 'notification_type', 'date'],
+                name='unique_outbox_per_class_day'
+            ),
+            models.UniqueConstraint(
+                fields=['student', 'notification_type', 'date'],
+                condition=models.Q(schedule__isnull=True),
+                name='unique_outbox_per_day'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'id'], name='outbox_status_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.student_id} - {self.get_notification_type_display()} {self.date} ({self.status})"
+
+
 class LateNotification(models.Model):
     """Уведомления об опозданиях"""
     student = models.ForeignKey(Student, on_delete=models.CASCADE, verbose_name="Студент")
     schedule = models.ForeignKey(ClassSchedule, on_delete=models.CASCADE, verbose_name="Расписание")
     late_at = models.DateTimeField(auto_now_add=True, verbose_name="Время опоздания")
+    late_date = models.DateField(default=timezone.localdate, verbose_name="Дата занятия")
     notified = models.BooleanField(default=False, verbose_name="Уведомлено")
     
     class Meta:
         verbose_name = "Опоздание"
         verbose_name_plural = "Опоздания"
         ordering = ['-late_at']
-        unique_together = ['student', 'schedule', 'late_at']
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'schedule', 'late_date'], name='unique_late_per_class_day'),
+        ]
     
     def __str__(self):
         return f"{self.student.user.get_full_name()} опоздал на {self.schedule.subject.name}"
+
+
+class NotificationDailyStat(models.Model):
+    """Дневные счётчики уведомлений и сообщений, оставшиеся после сжатия журналов"""
+    SOURCES = [
+        ('sent_notification', 'Уведомления о парах'),
+        ('telegram_message', 'Сообщения Telegram'),
+    ]
+    
+    date = models.DateField(verbose_name="Дата")
+    source = models.CharField(max_length=20, choices=SOURCES, verbose_name="Журнал")
+    notification_type = models.CharField(max_length=20, blank=True, verbose_name="Тип уведомления")
+    total = models.PositiveIntegerField(default=0, verbose_name="Всего")
+    failed = models.PositiveIntegerField(default=0, verbose_name="Не доставлено")
+    
+    class Meta:
+        verbose_name = "Статистика уведомлений за день"
+        verbose_name_plural = "Статистика уведомлений по дням"
+        ordering = ['-date', 'source', 'notification_type']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'source', 'notification_type'], name='unique_notification_daily_stat'),
+        ]
+    
+    def __str__(self):
+        return f"{self.date} - {self.get_source_display()} {self.notification_type}: {self.total}"
@@ -1,174 +1,352 @@
-import telegram
+import logging
+
 from celery import shared_task
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta, datetime, time as datetime_time
+from functools import partial
+from schedule import timetable
 from schedule.models import ClassSchedule, Student
-from .models import Notification, TelegramMessage, NotificationSettings, SentNotification, LateNotification
+from .models import (
+    Notification, TelegramMessage, NotificationSettings, SentNotification, LateNotification,
+    NotificationDailyStat, NotificationOutbox, PlannedNotification
+)
+from .telegram_delivery import get_delivery
 
 
-@shared_task
-def send_class_start_notifications():
-    """Отправка уведомлений о начале пар"""
-    now = timezone.now()
-    current_day = now.weekday() + 1  # Конвертация в формат модели (1-7)
-    current_time = now.time()
-    
-    # Получаем настройки уведомлений
+logger = logging.getLogger(__name__)
+
+# Уведомления о парах планируются заранее ETA-задачами: планировщик раз в
+# NOTIFICATION_PLAN_INTERVAL минут ставит в очередь все моменты начала, конца
+# и проверки опозданий, попадающие в ближайшие NOTIFICATION_PLAN_HORIZON минут.
+PLAN_INTERVAL = getattr(settings, 'NOTIFICATION_PLAN_INTERVAL', 15)  # минуты
+PLAN_HORIZON = getattr(settings, 'NOTIFICATION_PLAN_HORIZON', 30)  # минуты
+# Событие, не отправленное через столько минут после своего момента, ставится в очередь снова
+PLAN_REQUEUE_AFTER = getattr(settings, 'NOTIFICATION_PLAN_REQUEUE_AFTER', 5)  # минуты
+
+# Размер пачки при сохранении уведомлений и постановке задач доставки
+BATCH_SIZE = getattr(settings, 'NOTIFICATION_BATCH_SIZE', 50)
+
+# Через сколько минут забранное, но не отмеченное уведомление снова считается ожидающим
+OUTBOX_CLAIM_TIMEOUT = getattr(settings, 'NOTIFICATION_OUTBOX_CLAIM_TIMEOUT', 10)
+
+# Неудачная отправка повторяется с задержкой OUTBOX_RETRY_DELAY * 2^(попытка - 1) секунд
+OUTBOX_MAX_ATTEMPTS = getattr(settings, 'NOTIFICATION_OUTBOX_MAX_ATTEMPTS', 5)
+OUTBOX_RETRY_DELAY = getattr(settings, 'NOTIFICATION_OUTBOX_RETRY_DELAY', 60)
+
+# Сколько студентов обрабатывается за раз при рассылке вечерних сводок
+DIGEST_CHUNK_SIZE = getattr(settings, 'NOTIFICATION_DIGEST_CHUNK_SIZE', 500)
+
+# Журналы отправки хранятся LOG_RETENTION_DAYS дней, затем сворачиваются в дневные счётчики
+LOG_RETENTION_DAYS = getattr(settings, 'NOTIFICATION_LOG_RETENTION_DAYS', 30)
+LOG_DELETE_BATCH_SIZE = 1000
+
+
+def _get_notification_settings():
+    """Включены ли уведомления и порог опоздания в минутах"""
     try:
         settings_obj = NotificationSettings.objects.first()
         if not settings_obj or not settings_obj.enable_notifications:
-            return "Уведомления отключены"
-        
-        notification_before = settings_obj.notification_before_minutes
-        late_threshold = settings_obj.late_threshold_minutes
+            return False, None
+        return True, settings_obj.late_threshold_minutes
     except:
-        notification_before = 10  # Значение по умолчанию
-        late_threshold = 5
-    
-    # Найти все пары, которые начинаются сейчас
-    schedules = ClassSchedule.objects.filter(
-        day_of_week=current_day,
-        start_time=current_time,
-        is_active=True
+        return True, 5  # Значение по умолчанию
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _group_recipients(schedule):
+    """Студенты группы с привязанным Telegram одним запросом"""
+    return list(
+        Student.objects.filter(group_id=schedule.group_id, telegram_chat_id__isnull=False)
+        .exclude(telegram_chat_id='')
+        .select_related('user')
     )
+
+
+def _fan_out(schedule, notification_type, day, messages):
+    """Постановка уведомлений в очередь отправки (NotificationOutbox).
+
+    messages - список пар (студент, текст сообщения); schedule - None для
+    уведомлений без пары. Уведомление, которое уже есть в очереди для того же
+    студента, пары, типа и дня, пропускается уникальным ограничением, поэтому
+    повторный запуск ничего не дублирует.
+    """
+    if not messages:
+        return 0
     
-    for schedule in schedules:
-        students = Student.objects.filter(group=schedule.group)
+    NotificationOutbox.objects.bulk_create([
+        NotificationOutbox(
+            student=student,
+            schedule=schedule,
+            notification_type=notification_type,
+            date=day,
+            chat_id=student.telegram_chat_id,
+            message_text=message
+        )
+        for student, message in messages
+    ], batch_size=BATCH_SIZE, ignore_conflicts=True)
+    
+    # Внутри транзакции очередь разбирается только после её фиксации
+    transaction.on_commit(drain_notification_outbox.delay)
+    
+    return len(messages)
+
+
+def _notify_class_start(schedule, day):
+    """Уведомления студентам группы о начале пары"""
+    # Общая часть сообщения формируется один раз на пару
+    header = "🔔 НАЧАЛО ПАРЫ!\n\n👤 Студент: "
+    body = f"\n📚 Предмет: {schedule.subject.name}\n" \
+           f"👨‍🏫 Преподаватель: {schedule.subject.teacher.get_full_name()}\n" \
+           f"🕐 Время: {schedule.start_time} - {schedule.end_time}\n" \
+           f"📍 Аудитория: {schedule.room}\n" \
+           f"👥 Группа: {schedule.group.name}\n\n" \
+           f"⏰ Пара началась! Не опаздывайте!"
+    
+    messages = [
+        (student, header + student.user.get_full_name() + body)
+        for student in _group_recipients(schedule)
+    ]
+    return _fan_out(schedule, 'class_start', day, messages)
+
+
+def _notify_class_end(schedule, day):
+    """Уведомления студентам группы о конце пары"""
+    message = f"🔔 КОНЕЦ ПАРЫ!\n\n" \
+             f"📚 Предмет: {schedule.subject.name}\n" \
+             f"👨‍🏫 Преподаватель: {schedule.subject.teacher.get_full_name()}\n" \
+             f"🕐 Время: {schedule.start_time} - {schedule.end_time}\n" \
+             f"📍 Аудитория: {schedule.room}\n\n" \
+             f"✅ Пара завершена! Отдыхайте!"
+    
+    messages = [(student, message) for student in _group_recipients(schedule)]
+    return _fan_out(schedule, 'class_end', day, messages)
+
+
+def _notify_late_students(schedule, now, late_threshold):
+    """Уведомления об опоздании на пару"""
+    day = now.date()
+    header = "⚠️ ОПОЗДАНИЕ!\n\n👤 Студент: "
+    body = f"\n📚 Предмет: {schedule.subject.name}\n" \
+           f"👨‍🏫 Преподаватель: {schedule.subject.teacher.get_full_name()}\n" \
+           f"🕐 Начало пары: {schedule.start_time}\n" \
+           f"📍 Аудитория: {schedule.room}\n" \
+           f"👥 Группа: {schedule.group.name}\n\n" \
+           f"⏰ Студент опоздал на {late_threshold} минут!"
+    
+    with transaction.atomic():
+        # Блокировка пары не даёт параллельным запускам уведомить студентов дважды
+        ClassSchedule.objects.select_for_update().filter(pk=schedule.pk).first()
         
-        for student in students:
-            if student.telegram_chat_id:
-                # Формируем сообщение о начале пары
-                message = f"🔔 НАЧАЛО ПАРЫ!\n\n" \
-                         f"👤 Студент: {student.user.get_full_name()}\n" \
-                         f"📚 Предмет: {schedule.subject.name}\n" \
-                         f"👨‍🏫 Преподаватель: {schedule.subject.teacher.get_full_name()}\n" \
-                         f"🕐 Время: {schedule.start_time} - {schedule.end_time}\n" \
-                         f"📍 Аудитория: {schedule.room}\n" \
-                         f"👥 Группа: {schedule.group.name}\n\n" \
-                         f"⏰ Пара началась! Не опаздывайте!"
-                
-                send_telegram_message.delay(student.telegram_chat_id, message)
+        # Студенты, по которым уже есть запись об опоздании за этот день
+        notified = set(
+            LateNotification.objects.filter(schedule=schedule, late_date=day)
+            .values_list('student_id', flat=True)
+        )
+        pending = [student for student in _group_recipients(schedule) if student.id not in notified]
+        
+        LateNotification.objects.bulk_create([
+            LateNotification(student=student, schedule=schedule, late_date=day, notified=True)
+            for student in pending
+        ], batch_size=BATCH_SIZE)
+        
+        messages = [(student, header + student.user.get_full_name() + body) for student in pending]
+        return _fan_out(schedule, 'late_student', day, messages)
+
+
+def _minute_range(moment):
+    """Границы минуты, в которую попадает moment (время пар хранится с секундами)"""
+    start = moment.replace(second=0, microsecond=0)
+    end = start + timedelta(minutes=1)
+    if end.date() != start.date():
+        return start.time(), datetime_time.max
+    return start.time(), end.time()
+
+
+def _class_instants(schedule, day, late_threshold):
+    """Моменты уведомлений по паре в указанный день: (тип, время по расписанию, момент отправки)"""
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, schedule.start_time), tz)
+    end = timezone.make_aware(datetime.combine(day, schedule.end_time), tz)
+    
+    instants = [
+        ('class_start', schedule.start_time, start),
+        ('class_end', schedule.end_time, end),
+    ]
+    if late_threshold is not None:
+        instants.append(('late_student', schedule.start_time, start + timedelta(minutes=late_threshold)))
+    return instants
+
+
+def _enqueue_dispatch(kind, schedule_id, day, class_time, eta):
+    """Поставить ETA-задачу отправки; при недоступном брокере событие подхватит следующий запуск планировщика"""
+    try:
+        dispatch_class_notification.apply_async(
+            args=[kind, schedule_id, day.isoformat(), class_time.isoformat()],
+            eta=eta
+        )
+    except Exception as e:
+        logger.error("Notification enqueue error (%s, %s): %s", kind, schedule_id, e)
+
+
+@shared_task
+def plan_class_notifications():
+    """Постановка ETA-задач на ближайшие моменты начала, конца пар и проверки опозданий"""
+    enabled, late_threshold = _get_notification_settings()
+    if not enabled:
+        return "Уведомления отключены"
+    
+    now = timezone.localtime()
+    # Захватываем и прошедший интервал, чтобы не потерять моменты при задержке beat
+    window_start = now - timedelta(minutes=PLAN_INTERVAL)
+    window_end = now + timedelta(minutes=PLAN_HORIZON)
+    
+    requeue_before = now - timedelta(minutes=PLAN_REQUEUE_AFTER)
+    
+    planned = 0
+    days = sorted({window_start.date(), now.date(), window_end.date()})
+    for day in days:
+        for schedule in timetable.get_day(day.isoweekday()):
+            for kind, class_time, moment in _class_instants(schedule, day, late_threshold):
+                if not (window_start <= moment < window_end):
+                    continue
                 
-                # Сохраняем уведомление
-                SentNotification.objects.create(
-                    student=student,
-                    schedule=schedule,
-                    notification_type='class_start',
-                    message_text=message
+                # Одна задача на каждое событие пары, даже если окна планировщика
+                # пересекаются или он запущен в нескольких процессах
+                event, created = PlannedNotification.objects.get_or_create(
+                    schedule_id=schedule.id,
+                    notification_type=kind,
+                    date=day,
+                    class_time=class_time
                 )
+                if not created and (event.dispatched_at or moment >= requeue_before):
+                    continue
+                
+                # Задача ставится только после фиксации записи, иначе воркер может взять её
+                # раньше и не найти событие. Не отправленное вовремя событие (задача
+                # потерялась в брокере) ставится снова: отправку забирает только одна задача.
+                transaction.on_commit(partial(
+                    _enqueue_dispatch, kind, schedule.id, day, class_time, max(moment, now)
+                ))
+                planned += 1
+    
+    return f"Запланировано уведомлений: {planned}"
+
+
+@shared_task
+def dispatch_class_notification(kind, schedule_id, day, class_time):
+    """Отправка уведомлений по одной паре в запланированный момент"""
+    enabled, late_threshold = _get_notification_settings()
+    if not enabled:
+        return "Уведомления отключены"
+    
+    day = datetime.strptime(day, '%Y-%m-%d').date()
+    class_time = datetime_time.fromisoformat(class_time)
+    time_field = 'end_time' if kind == 'class_end' else 'start_time'
+    
+    # Пара могла быть перенесена или отключена после планирования
+    schedule = timetable.find(schedule_id, day.isoweekday())
+    if not schedule or getattr(schedule, time_field) != class_time:
+        return "Пара изменена, уведомление пропущено"
+    
+    with transaction.atomic():
+        # Задача могла опередить планировщик или прийти из ручного запуска - тогда
+        # событие создаётся здесь же; при гонке вставка дождётся записи планировщика
+        PlannedNotification.objects.get_or_create(
+            schedule_id=schedule_id,
+            notification_type=kind,
+            date=day,
+            class_time=class_time
+        )
+        
+        # Событие забирается одним UPDATE: повторная доставка ETA-задачи его уже не найдёт.
+        # При ошибке рассылки транзакция откатывается и событие можно отправить снова.
+        claimed = PlannedNotification.objects.filter(
+            schedule_id=schedule_id,
+            notification_type=kind,
+            date=day,
+            class_time=class_time,
+            dispatched_at__isnull=True
+        ).update(dispatched_at=timezone.now())
+        if not claimed:
+            return "Уведомления уже отправлены"
+        
+        if kind == 'class_start':
+            _notify_class_start(schedule, day)
+        elif kind == 'class_end':
+            _notify_class_end(schedule, day)
+        elif kind == 'late_student':
+            _notify_late_students(schedule, timezone.localtime(), late_threshold)
+    
+    return f"Отправлены уведомления ({kind}) по паре {schedule_id}"
+
+
+@shared_task
+def send_class_start_notifications():
+    """Отправка уведомлений о начале пар в текущую минуту (ручной запуск, без планировщика)"""
+    enabled, late_threshold = _get_notification_settings()
+    if not enabled:
+        return "Уведомления отключены"
+    
+    now = timezone.localtime()
+    minute_start, minute_end = _minute_range(now)
+    
+    # Найти все пары, которые начинаются в эту минуту
+    schedules = [
+        schedule for schedule in timetable.get_day(now.isoweekday())
+        if minute_start <= schedule.start_time < minute_end
+    ]
+    
+    for schedule in schedules:
+        _notify_class_start(schedule, now.date())
     
-    return f"Отправлено уведомлений о начале пар: {schedules.count()}"
+    return f"Отправлено уведомлений о начале пар: {len(schedules)}"
 
 
 @shared_task
 def send_class_end_notifications():
-    """Отправка уведомлений о конце пар"""
-    now = timezone.now()
-    current_day = now.weekday() + 1
-    current_time = now.time()
-    
-    # Найти все пары, которые заканчиваются сейчас
-    schedules = ClassSchedule.objects.filter(
-        day_of_week=current_day,
-        end_time=current_time,
-        is_active=True
-    )
+    """Отправка уведомлений о конце пар в текущую минуту (ручной запуск, без планировщика)"""
+    now = timezone.localtime()
+    minute_start, minute_end = _minute_range(now)
+    
+    # Найти все пары, которые заканчиваются в эту минуту
+    schedules = [
+        schedule for schedule in timetable.get_day(now.isoweekday())
+        if minute_start <= schedule.end_time < minute_end
+    ]
     
     for schedule in schedules:
-        students = Student.objects.filter(group=schedule.group)
-        
-        for student in students:
-            if student.telegram_chat_id:
-                message = f"🔔 КОНЕЦ ПАРЫ!\n\n" \
-                         f"📚 Предмет: {schedule.subject.name}\n" \
-                         f"👨‍🏫 Преподаватель: {schedule.subject.teacher.get_full_name()}\n" \
-                         f"🕐 Время: {schedule.start_time} - {schedule.end_time}\n" \
-                         f"📍 Аудитория: {schedule.room}\n\n" \
-                         f"✅ Пара завершена! Отдыхайте!"
-                
-                send_telegram_message.delay(student.telegram_chat_id, message)
-                
-                # Сохраняем уведомление
-                SentNotification.objects.create(
-                    student=student,
-                    schedule=schedule,
-                    notification_type='class_end',
-                    message_text=message
-                )
+        _notify_class_end(schedule, now.date())
     
-    return f"Отправлено уведомлений о конце пар: {schedules.count()}"
+    return f"Отправлено уведомлений о конце пар: {len(schedules)}"
 
 
 @shared_task
 def check_late_students():
-    """Проверка опоздавших студентов"""
-    now = timezone.now()
-    current_day = now.weekday() + 1
-    
-    # Получаем настройки
-    try:
-        settings_obj = NotificationSettings.objects.first()
-        if not settings_obj or not settings_obj.enable_notifications:
-            return "Уведомления отключены"
-        
-        late_threshold = settings_obj.late_threshold_minutes
-    except:
-        late_threshold = 5  # Значение по умолчанию
+    """Проверка опоздавших студентов (ручной запуск, без планировщика)"""
+    enabled, late_threshold = _get_notification_settings()
+    if not enabled:
+        return "Уведомления отключены"
     
+    now = timezone.localtime()
     # Время, когда нужно проверять опоздания (начало пары + порог)
-    check_time = (now - timedelta(minutes=late_threshold)).time()
+    minute_start, minute_end = _minute_range(now - timedelta(minutes=late_threshold))
     
     # Найти пары, которые начались порог минут назад
-    schedules = ClassSchedule.objects.filter(
-        day_of_week=current_day,
-        start_time=check_time,
-        is_active=True
-    )
+    schedules = [
+        schedule for schedule in timetable.get_day(now.isoweekday())
+        if minute_start <= schedule.start_time < minute_end
+    ]
     
     for schedule in schedules:
-        students = Student.objects.filter(group=schedule.group)
-        
-        for student in students:
-            # Проверяем, не было ли уже уведомление об опоздании
-            existing_late = LateNotification.objects.filter(
-                student=student,
-                schedule=schedule,
-                late_at__date=now.date()
-            ).exists()
-            
-            if not existing_late and student.telegram_chat_id:
-                # Создаем запись об опоздании
-                late_notification = LateNotification.objects.create(
-                    student=student,
-                    schedule=schedule
-                )
-                
-                # Формируем сообщение об опоздании
-                message = f"⚠️ ОПОЗДАНИЕ!\n\n" \
-                         f"👤 Студент: {student.user.get_full_name()}\n" \
-                         f"📚 Предмет: {schedule.subject.name}\n" \
-                         f"👨‍🏫 Преподаватель: {schedule.subject.teacher.get_full_name()}\n" \
-                         f"🕐 Начало пары: {schedule.start_time}\n" \
-                         f"📍 Аудитория: {schedule.room}\n" \
-                         f"👥 Группа: {schedule.group.name}\n\n" \
-                         f"⏰ Студент опоздал на {late_threshold} минут!"
-                
-                send_telegram_message.delay(student.telegram_chat_id, message)
-                
-                # Отмечаем как уведомленное
-                late_notification.notified = True
-                late_notification.save()
-                
-                # Сохраняем уведомление
-                SentNotification.objects.create(
-                    student=student,
-                    schedule=schedule,
-                    notification_type='late_student',
-                    message_text=message
-                )
+        _notify_late_students(schedule, now, late_threshold)
     
-    return f"Проверено опозданий для {schedules.count()} пар"
+    return f"Проверено опозданий для {len(schedules)} пар"
 
 
 @shared_task
@@ -177,30 +355,115 @@ def send_class_reminder():
     return send_class_start_notifications()
 
 
+def _delivery_record(chat_id, message_text, ok, error):
+    """Запись о результате отправки (сохраняется пачкой)"""
+    return TelegramMessage(
+        chat_id=chat_id,
+        message_text=message_text,
+        is_sent=ok,
+        sent_at=timezone.now() if ok else None,
+        error_message=error
+    )
+
+
 @shared_task
 def send_telegram_message(chat_id, message_text):
     """Отправка сообщения в Telegram"""
-    try:
-        bot = telegram.Bot(token=settings.TELEGRAM_BOT_TOKEN)
-        bot.send_message(chat_id=chat_id, text=message_text)
-        
-        # Сохранить успешную отправку
-        TelegramMessage.objects.create(
-            chat_id=chat_id,
-            message_text=message_text,
-            is_sent=True,
-            sent_at=timezone.now()
+    ok, error = get_delivery().send(chat_id, message_text)
+    _delivery_record(chat_id, message_text, ok, error).save()
+    return ok
+
+
+@shared_task
+def send_telegram_batch(messages):
+    """Доставка пачки сообщений: список пар [chat_id, текст]"""
+    delivery = get_delivery()
+    records = []
+    
+    for chat_id, message_text in messages:
+        ok, error = delivery.send(chat_id, message_text)
+        records.append(_delivery_record(chat_id, message_text, ok, error))
+    
+    # Статусы доставки сохраняются одним запросом на пачку
+    TelegramMessage.objects.bulk_create(records)
+    return sum(1 for record in records if record.is_sent)
+
+
+def _claim_outbox_batch():
+    """Забрать пачку ожидающих уведомлений; параллельные разборщики получают разные строки"""
+    from django.db.models import Q
+    
+    now = timezone.now()
+    stale = now - timedelta(minutes=OUTBOX_CLAIM_TIMEOUT)
+    with transaction.atomic():
+        rows = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status='pending', next_attempt_at__isnull=True) |
+                Q(status='pending', next_attempt_at__lte=now) |
+                Q(status='sending', claimed_at__lt=stale)
+            )
+            .only('id', 'student_id', 'schedule_id', 'notification_type', 'chat_id', 'message_text', 'attempts')
+            .order_by('id')[:BATCH_SIZE]
         )
-        return True
-    except Exception as e:
-        # Сохранить ошибку
-        TelegramMessage.objects.create(
-            chat_id=chat_id,
-            message_text=message_text,
-            is_sent=False,
-            error_message=str(e)
+        NotificationOutbox.objects.filter(id__in=[row.id for row in rows]).update(
+            status='sending', claimed_at=now
         )
-        return False
+    return rows
+
+
+@shared_task
+def drain_notification_outbox():
+    """Отправка уведомлений из очереди пачками, каждое не больше одного раза"""
+    delivery = get_delivery()
+    sent = 0
+    retry_at = None
+    
+    while True:
+        rows = _claim_outbox_batch()
+        if not rows:
+            break
+        
+        records = []
+        for row in rows:
+            ok, error = delivery.send(row.chat_id, row.message_text)
+            row.attempts += 1
+            row.error_message = error
+            if ok:
+                row.status = 'sent'
+                row.sent_at = timezone.now()
+            elif row.attempts < OUTBOX_MAX_ATTEMPTS:
+                # Ошибка пережила повторы клиента - откладываем уведомление, а не теряем его
+                row.status = 'pending'
+                row.next_attempt_at = timezone.now() + timedelta(
+                    seconds=OUTBOX_RETRY_DELAY * 2 ** (row.attempts - 1)
+                )
+                retry_at = min(retry_at or row.next_attempt_at, row.next_attempt_at)
+            else:
+                row.status = 'failed'
+            records.append(_delivery_record(row.chat_id, row.message_text, ok, error))
+        
+        delivered = [row for row in rows if row.status == 'sent']
+        with transaction.atomic():
+            NotificationOutbox.objects.bulk_update(
+                rows, ['status', 'attempts', 'next_attempt_at', 'sent_at', 'error_message']
+            )
+            SentNotification.objects.bulk_create([
+                SentNotification(
+                    student_id=row.student_id,
+                    schedule_id=row.schedule_id,
+                    notification_type=row.notification_type,
+                    message_text=row.message_text
+                )
+                for row in delivered
+            ])
+            TelegramMessage.objects.bulk_create(records)
+        sent += len(delivered)
+    
+    if retry_at:
+        drain_notification_outbox.apply_async(eta=retry_at)
+    
+    return f"Отправлено уведомлений: {sent}"
 
 
 @shared_task
@@ -208,3 +471,181 @@ def check_schedule_changes():
     """Проверка изменений в расписании и отправка уведомлений"""
     # Здесь можно добавить логику для отслеживания изменений
     pass
+
+
+def _digest_text(student, day, classes, personal_items, notes, tasks):
+    """Текст сводки на следующий день для одного студента"""
+    lines = [f"🌙 Ваш план на завтра ({day.strftime('%d.%m.%Y')}), {student.user.first_name or student.user.username}:"]
+    
+    if classes:
+        lines.append("\n📚 Пары:")
+        for schedule in classes:
+            lines.append(f"🕐 {schedule.start_time.strftime('%H:%M')}-{schedule.end_time.strftime('%H:%M')} "
+                         f"{schedule.subject.name} ({schedule.room})")
+    
+    if personal_items:
+        lines.append("\n🗓 Личные дела:")
+        for item in personal_items:
+            place = f" ({item.room})" if item.room else ""
+            lines.append(f"🕐 {item.start_time.strftime('%H:%M')}-{item.end_time.strftime('%H:%M')} {item.title}{place}")
+    
+    deadlines = sorted(
+        [(note.deadline, note.title) for note in notes] + [(task.deadline, task.title) for task in tasks]
+    )
+    if deadlines:
+        lines.append("\n⏰ Дедлайны:")
+        for deadline, title in deadlines:
+            lines.append(f"• {timezone.localtime(deadline).strftime('%d.%m %H:%M')} - {title}")
+    
+    return "\n".join(lines)
+
+
+def _send_digest_chunk(students, day, deadline_until):
+    """Сводки для пачки студентов: по одному запросу на каждый вид данных"""
+    from collections import defaultdict
+    from ai_assistant.models import StudentNote, TaskTracker
+    from schedule.models import PersonalScheduleItem
+    
+    user_ids = [student.user_id for student in students]
+    now = timezone.now()
+    
+    personal_by_user = defaultdict(list)
+    for item in PersonalScheduleItem.objects.filter(
+        user_id__in=user_ids, day_of_week=day.isoweekday(), is_active=True
+    ).order_by('start_time'):
+        personal_by_user[item.user_id].append(item)
+    
+    notes_by_user = defaultdict(list)
+    for note in StudentNote.objects.filter(
+        user_id__in=user_ids, is_completed=False, deadline__gt=now, deadline__lt=deadline_until
+    ).only('id', 'user_id', 'title', 'deadline'):
+        notes_by_user[note.user_id].append(note)
+    
+    tasks_by_user = defaultdict(list)
+    for task in TaskTracker.objects.filter(
+        user_id__in=user_ids, is_completed=False, deadline__gt=now, deadline__lt=deadline_until
+    ).only('id', 'user_id', 'title', 'deadline'):
+        tasks_by_user[task.user_id].append(task)
+    
+    messages = []
+    for student in students:
+        classes = timetable.get_group_day(student.group_id, day.isoweekday())
+        personal_items = personal_by_user[student.user_id]
+        notes = notes_by_user[student.user_id]
+        tasks = tasks_by_user[student.user_id]
+        if not (classes or personal_items or notes or tasks):
+            continue
+        messages.append((student, _digest_text(student, day, classes, personal_items, notes, tasks)))
+    
+    # Сводка ставится в очередь отправки: уникальная строка на студента и день
+    # не даёт повторному или параллельному запуску отправить её дважды
+    return _fan_out(None, 'daily_digest', day, messages)
+
+
+@shared_task
+def send_daily_digests():
+    """Сводка на завтра каждому студенту одним сообщением: пары, личные дела и дедлайны"""
+    enabled, _ = _get_notification_settings()
+    if not enabled:
+        return "Уведомления отключены"
+    
+    day = timezone.localdate() + timedelta(days=1)
+    
+    # Дедлайны до конца завтрашнего дня
+    deadline_until = timezone.make_aware(datetime.combine(day + timedelta(days=1), datetime_time.min))
+    
+    students = (
+        Student.objects.filter(telegram_chat_id__isnull=False)
+        .exclude(telegram_chat_id='')
+        .select_related('user')
+        .only('id', 'user_id', 'group_id', 'telegram_chat_id',
+              'user__username', 'user__first_name')
+        .order_by('id')
+    )
+    
+    sent = 0
+    chunk = []
+    for student in students.iterator(chunk_size=DIGEST_CHUNK_SIZE):
+        chunk.append(student)
+        if len(chunk) >= DIGEST_CHUNK_SIZE:
+            sent += _send_digest_chunk(chunk, day, deadline_until)
+            chunk = []
+    if chunk:
+        sent += _send_digest_chunk(chunk, day, deadline_until)
+    
+    return f"Сводок в очереди отправки: {sent}"
+
+
+def _compact_log(model, date_field, source, cutoff, type_field=None, failed=None):
+    """Свернуть записи журнала старше cutoff в дневные счётчики и удалить их.
+
+    Каждый день обрабатывается в своей транзакции: счётчики увеличиваются
+    и записи удаляются вместе, поэтому повторный запуск ничего не задвоит.
+    """
+    from django.db.models import Count, F, Value
+    from django.db.models.functions import TruncDate
+    
+    old = model.objects.filter(**{f"{date_field}__lt": cutoff})
+    days = (
+        old.annotate(day=TruncDate(date_field))
+        .values_list('day', flat=True)
+        .distinct()
+        .order_by('day')
+    )
+    
+    compacted = 0
+    for day in list(days):
+        day_start = timezone.make_aware(datetime.combine(day, datetime_time.min))
+        day_end = min(day_start + timedelta(days=1), cutoff)
+        rows = old.filter(**{f"{date_field}__gte": day_start, f"{date_field}__lt": day_end})
+        
+        with transaction.atomic():
+            totals = {'total': Count('id')}
+            if failed is not None:
+                totals['failed'] = Count('id', filter=failed)
+            counters = (
+                rows.values(kind=F(type_field) if type_field else Value(''))
+                .annotate(**totals)
+                .order_by()
+            )
+            for row in counters:
+                stat, _ = NotificationDailyStat.objects.select_for_update().get_or_create(
+                    date=day, source=source, notification_type=row['kind']
+                )
+                NotificationDailyStat.objects.filter(pk=stat.pk).update(
+                    total=F('total') + row['total'],
+                    failed=F('failed') + row.get('failed', 0)
+                )
+            
+            while True:
+                ids = list(rows.values_list('id', flat=True)[:LOG_DELETE_BATCH_SIZE])
+                if not ids:
+                    break
+                compacted += model.objects.filter(id__in=ids).delete()[0]
+    
+    return compacted
+
+
+@shared_task
+def compact_notification_logs():
+    """Сжатие журналов уведомлений старше NOTIFICATION_LOG_RETENTION_DAYS в дневную статистику"""
+    from django.db.models import Q
+    
+    # Граница по началу суток, чтобы сворачивать только целые дни
+    cutoff_day = timezone.localdate() - timedelta(days=LOG_RETENTION_DAYS)
+    cutoff = timezone.make_aware(datetime.combine(cutoff_day, datetime_time.min))
+    
+    notifications = _compact_log(
+        SentNotification, 'sent_at', 'sent_notification', cutoff,
+        type_field='notification_type'
+    )
+    messages = _compact_log(
+        TelegramMessage, 'created_at', 'telegram_message', cutoff,
+        failed=Q(is_sent=False)
+    )
+    
+    # Обработанные записи очереди и планировщика нужны только для защиты от повторов в тот же день
+    NotificationOutbox.objects.filter(date__lt=cutoff_day, status__in=['sent', 'failed']).delete()
+    PlannedNotification.objects.filter(date__lt=cutoff_day).delete()
+    
+    return f"Сжато уведомлений: {notifications}, сообщений: {messages}"
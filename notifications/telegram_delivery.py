@@ -0,0 +1,190 @@
+"""
+Доставка сообщений в Telegram через Bot API.
+
+Один клиент на процесс с общим пулом HTTP-соединений. Отправка ограничена
+двумя ведрами токенов: общим (лимит Telegram около 30 сообщений в секунду)
+и отдельным для каждого чата (не чаще одного сообщения в секунду). Ведра
+живут в памяти процесса, поэтому общий лимит дополнительно проверяется
+счётчиком в кэше Django (SharedRateLimiter): с Redis-кэшем все воркеры
+Celery вместе не превышают TELEGRAM_GLOBAL_RATE. На ответ
+429 клиент ждёт retry_after из ответа, на 5xx и сетевые ошибки повторяет
+запрос с экспоненциальной задержкой. Адрес API задаётся настройкой
+TELEGRAM_API_URL, поэтому клиент можно направить на локальный фейковый сервер.
+"""
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше capacity подряд"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self):
+        """Забрать токен; возвращает, сколько секунд нужно подождать до его появления"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        """Дождаться токена"""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class SharedRateLimiter:
+    """Не больше rate событий в секунду на все процессы: счётчик секундного окна в кэше Django.
+
+    С кэшем в памяти процесса (LocMemCache) лимит действует на каждый процесс
+    отдельно, поэтому при нескольких воркерах нужен общий кэш (CACHE_REDIS_URL).
+    """
+
+    def __init__(self, rate, prefix='telegram:rate'):
+        self.rate = max(1, int(rate))
+        self.prefix = prefix
+
+    def acquire(self):
+        """Дождаться свободного места в текущем секундном окне"""
+        from django.core.cache import cache
+
+        while True:
+            now = time.time()
+            window = int(now)
+            key = f"{self.prefix}:{window}"
+            cache.add(key, 0, 5)
+            try:
+                count = cache.incr(key)
+            except ValueError:
+                # Ключ успел истечь между add и incr - пробуем снова
+                continue
+            if count <= self.rate:
+                return
+            time.sleep(window + 1 - now)
+
+
+class TelegramDelivery:
+    """Клиент отправки сообщений с ограничением частоты и повторами"""
+
+    def __init__(self, token, api_url='https://api.telegram.org', global_rate=25,
+                 chat_rate=1, max_retries=3, backoff=1.0, timeout=10, pool_size=10,
+                 max_chats=10000, shared_limiter=None):
+        self.url = f"{api_url.rstrip('/')}/bot{token}/sendMessage"
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.chat_rate = chat_rate
+        self.max_chats = max_chats
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._global_bucket = TokenBucket(global_rate)
+        self._shared_limiter = shared_limiter
+        self._chat_buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _chat_bucket(self, chat_id):
+        with self._lock:
+            bucket = self._chat_buckets.get(chat_id)
+            if bucket is None:
+                bucket = TokenBucket(self.chat_rate, 1)
+                self._chat_buckets[chat_id] = bucket
+                if len(self._chat_buckets) > self.max_chats:
+                    self._chat_buckets.popitem(last=False)
+            else:
+                self._chat_buckets.move_to_end(chat_id)
+            return bucket
+
+    def _retry_delay(self, attempt):
+        return self.backoff * (2 ** attempt) * (1 + random.random() / 2)
+
+    def send(self, chat_id, text):
+        """Отправить сообщение; возвращает (успех, текст ошибки)"""
+        chat_id = str(chat_id)
+        error = ''
+
+        for attempt in range(self.max_retries + 1):
+            self._chat_bucket(chat_id).acquire()
+            self._global_bucket.acquire()
+            if self._shared_limiter:
+                self._shared_limiter.acquire()
+
+            try:
+                response = self.session.post(
+                    self.url,
+                    json={'chat_id': chat_id, 'text': text},
+                    timeout=self.timeout,
+                )
+            except requests.RequestException as e:
+                error = str(e)
+                delay = self._retry_delay(attempt)
+            else:
+                if response.status_code == 200:
+                    return True, ''
+
+                try:
+                    data = response.json()
+                except ValueError:
+                    data = {}
+                error = data.get('description') or f"HTTP {response.status_code}"
+
+                if response.status_code == 429:
+                    # Telegram сообщает, сколько секунд нужно подождать
+                    delay = (data.get('parameters') or {}).get('retry_after') or self._retry_delay(attempt)
+                elif response.status_code >= 500:
+                    delay = self._retry_delay(attempt)
+                else:
+                    # Ошибки запроса (чат не найден, бот заблокирован) не повторяем
+                    return False, error
+
+            if attempt < self.max_retries:
+                time.sleep(delay)
+
+        return False, error
+
+    def close(self):
+        self.session.close()
+
+
+_delivery = None
+_delivery_lock = threading.Lock()
+
+
+def get_delivery():
+    """Общий клиент доставки для процесса"""
+    global _delivery
+    if _delivery is None:
+        from django.conf import settings
+
+        with _delivery_lock:
+            if _delivery is None:
+                global_rate = getattr(settings, 'TELEGRAM_GLOBAL_RATE', 25)
+                _delivery = TelegramDelivery(
+                    token=settings.TELEGRAM_BOT_TOKEN,
+                    api_url=getattr(settings, 'TELEGRAM_API_URL', 'https://api.telegram.org'),
+                    global_rate=global_rate,
+                    chat_rate=getattr(settings, 'TELEGRAM_CHAT_RATE', 1),
+                    max_retries=getattr(settings, 'TELEGRAM_MAX_RETRIES', 3),
+                    shared_limiter=SharedRateLimiter(global_rate),
+                )
+    return _delivery
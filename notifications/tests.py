@@ -1,3 +1,515 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+from datetime import date, datetime, time, timedelta
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from telegram import Chat, Message, Update, User as TelegramUser
+from telegram.ext import MessageHandler, filters
+
+from schedule.models import ClassSchedule, Student, StudentGroup, Subject, Teacher
+
+from . import bot, tasks
+from .answer_queue import AnswerQueue
+from .models import (
+    NotificationOutbox, NotificationSettings, PlannedNotification, SentNotification, TelegramMessage
+)
+from .telegram_delivery import SharedRateLimiter, TelegramDelivery, TokenBucket
+
+
+class FakeTelegramHandler(BaseHTTPRequestHandler):
+    """Фейковый Bot API: отвечает по очереди заданными кодами"""
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length))
+        self.server.requests.append(payload)
+
+        status = self.server.responses.pop(0) if self.server.responses else 200
+        if status == 200:
+            body = {'ok': True, 'result': {'message_id': len(self.server.requests)}}
+        elif status == 429:
+            body = {'ok': False, 'description': 'Too Many Requests', 'parameters': {'retry_after': 0}}
+        else:
+            body = {'ok': False, 'description': f'Error {status}'}
+
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeTelegramServerMixin:
+    """Локальный фейковый сервер Telegram и клиент доставки к нему"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeTelegramHandler)
+        self.server.requests = []
+        self.server.responses = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.delivery = TelegramDelivery(
+            token='TEST',
+            api_url=f'http://127.0.0.1:{self.server.server_port}',
+            global_rate=1000,
+            chat_rate=1000,
+            backoff=0,
+        )
+
+    def tearDown(self):
+        self.delivery.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TelegramDeliveryTests(FakeTelegramServerMixin, TestCase):
+    """Доставка через локальный фейковый сервер Telegram"""
+
+    def test_retries_on_rate_limit_and_server_error(self):
+        self.server.responses = [429, 502, 200]
+        self.assertEqual(self.delivery.send(42, 'Привет'), (True, ''))
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(self.server.requests[-1], {'chat_id': '42', 'text': 'Привет'})
+
+    def test_client_error_is_not_retried(self):
+        self.server.responses = [403]
+        ok, error = self.delivery.send(42, 'Привет')
+        self.assertFalse(ok)
+        self.assertEqual(error, 'Error 403')
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_batch_task_writes_statuses_in_one_query(self):
+        self.server.responses = [200, 400, 200]
+        with mock.patch.object(tasks, 'get_delivery', return_value=self.delivery):
+            with self.assertNumQueries(1):
+                sent = tasks.send_telegram_batch([['1', 'a'], ['2', 'b'], ['3', 'c']])
+
+        self.assertEqual(sent, 2)
+        self.assertEqual(TelegramMessage.objects.filter(is_sent=True).count(), 2)
+        self.assertEqual(TelegramMessage.objects.get(chat_id='2').error_message, 'Error 400')
+
+
+class NotificationOutboxTests(FakeTelegramServerMixin, TestCase):
+    """Очередь уведомлений: одна отправка на ключ и повтор после сбоя"""
+
+    def setUp(self):
+        super().setUp()
+        group = StudentGroup.objects.create(name='ИВТ-1', course=1)
+        teacher = Teacher.objects.create(first_name='Иван', last_name='Иванов')
+        subject = Subject.objects.create(name='Матанализ', teacher=teacher)
+        self.schedule = ClassSchedule.objects.create(
+            subject=subject, group=group, day_of_week=1,
+            start_time=time(9), end_time=time(10, 30), room='101'
+        )
+        for i in range(3):
+            user = User.objects.create_user(f'student{i}', password='p')
+            Student.objects.create(user=user, group=group, telegram_chat_id=str(i + 1))
+        self.day = date(2026, 10, 19)
+
+        for patcher in (
+            mock.patch.object(tasks, 'get_delivery', return_value=self.delivery),
+            mock.patch.object(tasks.drain_notification_outbox, 'delay'),
+            mock.patch.object(tasks.drain_notification_outbox, 'apply_async'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_outbox_sends_each_notification_once(self):
+        # Повторный запуск (ретрай Celery, пересекающийся beat) не создаёт новых записей
+        tasks._notify_class_end(self.schedule, self.day)
+        tasks._notify_class_end(self.schedule, self.day)
+        tasks.drain_notification_outbox()
+        tasks.drain_notification_outbox()
+
+        self.assertEqual(NotificationOutbox.objects.filter(status='sent').count(), 3)
+        self.assertEqual(SentNotification.objects.count(), 3)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_failed_send_is_retried_later(self):
+        self.delivery.max_retries = 0
+        self.server.responses = [502, 200, 200]
+
+        tasks._notify_class_end(self.schedule, self.day)
+        tasks.drain_notification_outbox()
+
+        failed = NotificationOutbox.objects.get(attempts=1, status='pending')
+        self.assertGreater(failed.next_attempt_at, timezone.now())
+        self.assertEqual(SentNotification.objects.count(), 2)
+        tasks.drain_notification_outbox.apply_async.assert_called_once()
+
+        # До срока повтора уведомление не забирается
+        tasks.drain_notification_outbox()
+        self.assertEqual(len(self.server.requests), 3)
+
+        NotificationOutbox.objects.filter(pk=failed.pk).update(
+            next_attempt_at=timezone.now() - timedelta(seconds=1)
+        )
+        tasks.drain_notification_outbox()
+
+        failed.refresh_from_db()
+        self.assertEqual((failed.status, failed.attempts), ('sent', 2))
+        self.assertEqual(SentNotification.objects.count(), 3)
+
+    def test_gives_up_after_max_attempts(self):
+        self.delivery.max_retries = 0
+        self.server.responses = [502] * 3
+
+        with mock.patch.object(tasks, 'OUTBOX_MAX_ATTEMPTS', 1):
+            tasks._notify_class_end(self.schedule, self.day)
+            tasks.drain_notification_outbox()
+
+        self.assertEqual(NotificationOutbox.objects.filter(status='failed').count(), 3)
+        self.assertEqual(SentNotification.objects.count(), 0)
+
+
+class ClassNotificationPlannerTests(TestCase):
+    """Планирование событий пар: одна задача на событие, переотправка потерянных"""
+
+    def setUp(self):
+        cache.clear()
+        NotificationSettings.objects.create(enable_notifications=True, late_threshold_minutes=5)
+        group = StudentGroup.objects.create(name='ИВТ-2', course=1)
+        teacher = Teacher.objects.create(first_name='Пётр', last_name='Петров')
+        subject = Subject.objects.create(name='Физика', teacher=teacher)
+        self.schedule = ClassSchedule.objects.create(
+            subject=subject, group=group, day_of_week=1,
+            start_time=time(9), end_time=time(10, 30), room='201'
+        )
+        self.day = date(2026, 10, 19)  # понедельник
+
+        self.apply_async = mock.patch.object(tasks.dispatch_class_notification, 'apply_async').start()
+        self.notify_start = mock.patch.object(tasks, '_notify_class_start').start()
+        mock.patch.object(tasks, '_notify_late_students').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def _at(self, hour, minute):
+        moment = timezone.make_aware(datetime.combine(self.day, time(hour, minute)))
+        return mock.patch('django.utils.timezone.now', return_value=moment)
+
+    def _plan(self, hour, minute):
+        with self._at(hour, minute), self.captureOnCommitCallbacks(execute=True) as callbacks:
+            tasks.plan_class_notifications()
+        return callbacks
+
+    def _enqueued(self):
+        return [call.kwargs['args'][0] for call in self.apply_async.call_args_list]
+
+    def test_event_inside_window_is_enqueued_after_commit(self):
+        with self._at(9, 3), self.captureOnCommitCallbacks(execute=False) as callbacks:
+            tasks.plan_class_notifications()
+            self.apply_async.assert_not_called()
+        self.assertEqual(len(callbacks), 2)
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(self._enqueued(), ['class_start', 'late_student'])
+        start_call = self.apply_async.call_args_list[0]
+        # Момент начала уже прошёл - задача ставится на текущее время
+        self.assertEqual(
+            start_call.kwargs['eta'], timezone.make_aware(datetime.combine(self.day, time(9, 3)))
+        )
+        self.assertEqual(PlannedNotification.objects.filter(dispatched_at__isnull=True).count(), 2)
+
+        with self._at(9, 3):
+            args = start_call.kwargs['args']
+            tasks.dispatch_class_notification(*args)
+            self.assertEqual(tasks.dispatch_class_notification(*args), "Уведомления уже отправлены")
+        self.notify_start.assert_called_once()
+
+    def test_repeated_run_does_not_enqueue_again(self):
+        self._plan(9, 3)
+        self._plan(9, 4)
+        self.assertEqual(self._enqueued(), ['class_start', 'late_student'])
+
+    def test_lost_task_is_enqueued_again(self):
+        self._plan(8, 50)
+        self.assertEqual(self._enqueued(), ['class_start', 'late_student'])
+
+        # Задача о начале пары потерялась: через PLAN_REQUEUE_AFTER минут она ставится снова
+        self._plan(9, 10)
+        self.assertEqual(self._enqueued(), ['class_start', 'late_student', 'class_start'])
+
+        with self._at(9, 10):
+            tasks.dispatch_class_notification(*self.apply_async.call_args_list[-1].kwargs['args'])
+        self._plan(9, 12)
+        self.assertEqual(
+            self._enqueued(), ['class_start', 'late_student', 'class_start', 'late_student']
+        )
+        self.notify_start.assert_called_once()
+
+    def test_task_without_planned_row_still_sends(self):
+        with self._at(9, 0):
+            tasks.dispatch_class_notification('class_start', self.schedule.id, '2026-10-19', '09:00:00')
+            tasks.dispatch_class_notification('class_start', self.schedule.id, '2026-10-19', '09:00:00')
+        self.notify_start.assert_called_once()
+        self.assertTrue(PlannedNotification.objects.get(notification_type='class_start').dispatched_at)
+
+
+class DailyDigestTests(FakeTelegramServerMixin, TestCase):
+    """Вечерняя сводка: одна на студента и день даже при повторных запусках"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        NotificationSettings.objects.create(enable_notifications=True)
+        group = StudentGroup.objects.create(name='ИВТ-4', course=1)
+        teacher = Teacher.objects.create(first_name='Олег', last_name='Сидоров')
+        subject = Subject.objects.create(name='Химия', teacher=teacher)
+        self.today = date(2026, 10, 19)  # сводка на вторник
+        ClassSchedule.objects.create(
+            subject=subject, group=group, day_of_week=2,
+            start_time=time(9), end_time=time(10, 30), room='105'
+        )
+        for i in range(2):
+            user = User.objects.create_user(f'digest{i}', password='p', first_name=f'Студент{i}')
+            Student.objects.create(user=user, group=group, telegram_chat_id=str(100 + i))
+
+        for patcher in (
+            mock.patch.object(tasks, 'get_delivery', return_value=self.delivery),
+            mock.patch.object(tasks.drain_notification_outbox, 'delay'),
+            mock.patch('django.utils.timezone.localdate', return_value=self.today),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_repeated_run_sends_each_digest_once(self):
+        tasks.send_daily_digests()
+        tasks.send_daily_digests()
+        tasks.drain_notification_outbox()
+
+        rows = NotificationOutbox.objects.filter(notification_type='daily_digest')
+        self.assertEqual(rows.count(), 2)
+        self.assertEqual({row.date for row in rows}, {self.today + timedelta(days=1)})
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertIn('Химия', self.server.requests[0]['text'])
+        self.assertEqual(SentNotification.objects.filter(notification_type='daily_digest').count(), 2)
+
+    def test_failed_run_does_not_block_rerun(self):
+        with mock.patch.object(tasks, '_digest_text', side_effect=RuntimeError('сбой')):
+            with self.assertRaises(RuntimeError):
+                tasks.send_daily_digests()
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+        tasks.send_daily_digests()
+        self.assertEqual(NotificationOutbox.objects.filter(notification_type='daily_digest').count(), 2)
+
+
+class TokenBucketTests(TestCase):
+
+    def test_reserve_reports_wait_after_burst(self):
+        bucket = TokenBucket(rate=10, capacity=2)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertGreater(bucket.reserve(), 0)
+
+
+class SharedRateLimiterTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_waits_for_next_window_when_rate_is_used_up(self):
+        limiter = SharedRateLimiter(rate=2, prefix='test:rate')
+        sleeps = []
+        clock = [1000.25]
+
+        def sleep(delay):
+            sleeps.append(delay)
+            clock[0] += delay
+
+        with mock.patch('notifications.telegram_delivery.time.time', lambda: clock[0]), \
+                mock.patch('notifications.telegram_delivery.time.sleep', sleep):
+            limiter.acquire()
+            limiter.acquire()
+            self.assertEqual(sleeps, [])
+            limiter.acquire()
+
+        self.assertEqual(sleeps, [0.75])
+
+
+class FakeBot:
+    """Бот, который запоминает отправленные сообщения"""
+
+    def __init__(self):
+        self.messages = []
+        self.actions = 0
+
+    async def send_chat_action(self, chat_id, action):
+        self.actions += 1
+
+    async def send_message(self, chat_id, text):
+        self.messages.append((chat_id, text))
+
+
+class AnswerQueueTests(SimpleTestCase):
+    """Очередь вопросов к AI в боте"""
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.calls = []
+        self.addCleanup(self.release.set)
+
+    def _answer(self, question):
+        self.calls.append(question)
+        self.release.wait(5)
+        return f'Ответ: {question}'
+
+    async def _wait_messages(self, bot, count):
+        for _ in range(200):
+            if len(bot.messages) >= count:
+                return
+            await asyncio.sleep(0.01)
+        self.fail(f'Ожидалось {count} сообщений, получено {bot.messages}')
+
+    async def test_identical_questions_are_answered_once(self):
+        queue = AnswerQueue(self._answer, workers=2)
+        queue.start()
+        bot = FakeBot()
+
+        self.assertIsNone(await queue.submit(bot, 1, 'Что такое атом?'))
+        self.assertIsNone(await queue.submit(bot, 2, '  что такое атом?'))
+        self.release.set()
+        await self._wait_messages(bot, 2)
+        await queue.stop()
+
+        self.assertEqual(self.calls, ['Что такое атом?'])
+        self.assertEqual(sorted(bot.messages), [(1, 'Ответ: Что такое атом?'), (2, 'Ответ: Что такое атом?')])
+        self.assertGreater(bot.actions, 0)
+
+    async def test_second_question_from_same_chat_is_rejected(self):
+        queue = AnswerQueue(self._answer, per_chat_limit=1)
+        queue.start()
+        bot = FakeBot()
+
+        self.assertIsNone(await queue.submit(bot, 1, 'первый вопрос'))
+        rejection = await queue.submit(bot, 1, 'второй вопрос')
+        self.release.set()
+        await self._wait_messages(bot, 1)
+        await queue.stop()
+
+        self.assertIn('предыдущий вопрос', rejection)
+        self.assertEqual(self.calls, ['первый вопрос'])
+
+    async def test_full_queue_rejects_question(self):
+        queue = AnswerQueue(self._answer, workers=1, queue_size=1)
+        queue.start()
+        bot = FakeBot()
+
+        self.assertIsNone(await queue.submit(bot, 1, 'первый'))
+        await asyncio.sleep(0.05)  # первый вопрос забран рабочей корутиной
+        self.assertIsNone(await queue.submit(bot, 2, 'второй'))
+        rejection = await queue.submit(bot, 3, 'третий')
+        self.release.set()
+        await self._wait_messages(bot, 2)
+        await queue.stop()
+
+        self.assertIn('слишком много вопросов', rejection)
+        self.assertNotIn('третий', self.calls)
+
+    async def test_slow_answer_times_out(self):
+        queue = AnswerQueue(self._answer, timeout=0.1)
+        queue.start()
+        bot = FakeBot()
+
+        self.assertIsNone(await queue.submit(bot, 1, 'долгий вопрос'))
+        await self._wait_messages(bot, 1)
+        await queue.stop()
+
+        self.assertEqual(bot.messages, [(1, '⌛ Не успел подготовить ответ. Попробуйте переформулировать вопрос.')])
+
+    async def test_pending_deliveries_are_kept_and_cancelled_on_stop(self):
+        queue = AnswerQueue(self._answer)
+        queue.start()
+        bot = FakeBot()
+
+        self.assertIsNone(await queue.submit(bot, 1, 'вопрос'))
+        self.assertEqual(len(queue._deliveries), 1)
+        delivery = next(iter(queue._deliveries))
+        await queue.stop()
+
+        self.assertTrue(delivery.cancelled())
+        self.assertEqual(queue._deliveries, set())
+
+    async def test_finished_delivery_is_forgotten(self):
+        queue = AnswerQueue(self._answer)
+        queue.start()
+        bot = FakeBot()
+
+        self.assertIsNone(await queue.submit(bot, 1, 'вопрос'))
+        self.release.set()
+        await self._wait_messages(bot, 1)
+        await asyncio.sleep(0)
+        self.assertEqual(queue._deliveries, set())
+        await queue.stop()
+
+
+class BotHandlerTests(SimpleTestCase):
+    """Обработчики бота с поддельным Telegram"""
+
+    def setUp(self):
+        self.fake_bot = FakeBot()
+        self.queue = AnswerQueue(lambda question: f'Ответ: {question}', workers=1)
+        self.context = mock.Mock(bot=self.fake_bot, bot_data={'answer_queue': self.queue}, args=[])
+
+    def _update(self, text, edited=False):
+        message = Message(
+            message_id=1,
+            date=timezone.now(),
+            chat=Chat(id=42, type=Chat.PRIVATE),
+            from_user=TelegramUser(id=7, first_name='Иван', is_bot=False),
+            text=text,
+        )
+        if edited:
+            return Update(update_id=1, edited_message=message)
+        return Update(update_id=1, message=message)
+
+    async def _wait_messages(self, count):
+        for _ in range(200):
+            if len(self.fake_bot.messages) >= count:
+                return
+            await asyncio.sleep(0.01)
+        self.fail(f'Ожидалось {count} сообщений, получено {self.fake_bot.messages}')
+
+    async def test_question_is_answered(self):
+        self.queue.start()
+        await bot.handle_message(self._update('Что такое атом?'), self.context)
+        await self._wait_messages(1)
+        await self.queue.stop()
+
+        self.assertEqual(self.fake_bot.messages, [(42, 'Ответ: Что такое атом?')])
+
+    async def test_edited_message_is_handled(self):
+        update = self._update('Что такое молекула?', edited=True)
+        handler = MessageHandler(filters.TEXT & ~filters.COMMAND, bot.handle_message)
+        self.assertTrue(handler.check_update(update))
+        self.assertIsNone(update.message)
+
+        self.queue.start()
+        await bot.handle_message(update, self.context)
+        await self._wait_messages(1)
+        await self.queue.stop()
+
+        self.assertEqual(self.fake_bot.messages, [(42, 'Ответ: Что такое молекула?')])
+
+    async def test_rejection_is_sent_to_chat(self):
+        self.queue.per_chat_limit = 0
+        await bot.handle_message(self._update('Ещё вопрос'), self.context)
+
+        self.assertEqual(len(self.fake_bot.messages), 1)
+        self.assertIn('предыдущий вопрос', self.fake_bot.messages[0][1])
+
+    async def test_help_command(self):
+        await bot.help_command(self._update('/help'), self.context)
+
+        self.assertEqual(self.fake_bot.messages[0][0], 42)
+        self.assertIn('/connect', self.fake_bot.messages[0][1])
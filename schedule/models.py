@@ -1,6 +1,8 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 
 
 class StudentGroup(models.Model):
@@ -124,3 +126,18 @@ class Attendance(models.Model):
 
     class Meta:
         unique_together = ['student', 'schedule', 'date']
+
+
+@receiver(post_save, sender=ClassSchedule)
+@receiver(post_delete, sender=ClassSchedule)
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+@receiver(post_save, sender=Teacher)
+@receiver(post_delete, sender=Teacher)
+@receiver(post_save, sender=StudentGroup)
+@receiver(post_delete, sender=StudentGroup)
+def _invalidate_timetable(sender, **kwargs):
+    from .timetable import invalidate
+    # Версия меняется только после фиксации: иначе параллельное чтение успело бы
+    # сохранить старые пары уже под новой версией
+    transaction.on_commit(invalidate)
@@ -1,3 +1,79 @@
+from datetime import date, time
+
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from . import timetable
+from .models import ClassSchedule, StudentGroup, Subject, Teacher
+
+
+class TimetableCacheTests(TestCase):
+    """Кэш расписания: чтение без запросов и сброс после изменения пар"""
+
+    def setUp(self):
+        cache.clear()
+        self.group = StudentGroup.objects.create(name='ИВТ-3', course=1)
+        teacher = Teacher.objects.create(first_name='Анна', last_name='Смирнова')
+        self.subject = Subject.objects.create(name='История', teacher=teacher)
+        self.monday = ClassSchedule.objects.create(
+            subject=self.subject, group=self.group, day_of_week=1,
+            start_time=time(9), end_time=time(10, 30), room='301'
+        )
+        self.sunday = ClassSchedule.objects.create(
+            subject=self.subject, group=self.group, day_of_week=7,
+            start_time=time(12), end_time=time(13, 30), room='302'
+        )
+
+    def test_second_read_is_served_from_cache(self):
+        timetable.get_group_week(self.group.id)
+        timetable.get_day(1)
+        with self.assertNumQueries(0):
+            week = timetable.get_group_week(self.group.id)
+            day = timetable.get_day(1)
+            self.assertEqual(week[1][0].subject.teacher.last_name, 'Смирнова')
+            # Группа из снимка дня не требует запроса к базе
+            self.assertEqual(day[0].group.name, 'ИВТ-3')
+
+    def test_weekday_and_date_keys(self):
+        week = timetable.get_group_week(self.group.id)
+        self.assertEqual(sorted(week), list(range(1, 8)))
+        self.assertEqual(week[1], [self.monday])
+        self.assertEqual(week[7], [self.sunday])
+        self.assertEqual(timetable.get_group_day(self.group.id, 3), [])
+
+        # Дата сопоставляется дню недели через isoweekday: воскресенье - 7
+        sunday = date(2026, 10, 25)
+        self.assertEqual(timetable.get_day(sunday.isoweekday()), [self.sunday])
+        self.assertEqual(timetable.find(self.sunday.id, sunday.isoweekday()), self.sunday)
+        self.assertIsNone(timetable.find(self.sunday.id, 1))
+
+    def test_save_invalidates_after_commit(self):
+        self.assertEqual(timetable.get_day(1)[0].room, '301')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.monday.room = '401'
+            self.monday.save()
+            # До фиксации транзакции снимок не сбрасывается
+            self.assertEqual(timetable.get_day(1)[0].room, '301')
+
+        self.assertEqual(timetable.get_day(1)[0].room, '401')
+        self.assertEqual(timetable.get_group_day(self.group.id, 1)[0].room, '401')
+
+    def test_delete_and_deactivate_invalidate(self):
+        self.assertEqual(len(timetable.get_group_week(self.group.id)[7]), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sunday.delete()
+        self.assertEqual(timetable.get_group_week(self.group.id)[7], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.monday.is_active = False
+            self.monday.save()
+        self.assertEqual(timetable.get_day(1), [])
+
+    def test_related_subject_change_invalidates(self):
+        self.assertEqual(timetable.get_day(1)[0].subject.name, 'История')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.subject.name = 'Всемирная история'
+            self.subject.save()
+        self.assertEqual(timetable.get_day(1)[0].subject.name, 'Всемирная история')
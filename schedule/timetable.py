@@ -0,0 +1,72 @@
+"""
+Кэш расписания пар.
+
+Недельное расписание группы (и общее расписание на день для рассылки
+уведомлений) хранится в кэше Django вместе с предметом, преподавателем и
+группой, так что чтение не обращается к базе. При изменении пар, предметов,
+преподавателей или групп увеличивается общая версия, и все снимки
+перестраиваются при следующем чтении. TTL страхует процессы с локальным
+кэшем, до которых версия не доходит.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+
+VERSION_CACHE_KEY = 'timetable:version'
+CACHE_TTL = getattr(settings, 'TIMETABLE_CACHE_TTL', 300)  # секунды
+
+
+def _version():
+    cache.add(VERSION_CACHE_KEY, 1, None)
+    return cache.get(VERSION_CACHE_KEY, 1)
+
+
+def _load(key, **filters):
+    from .models import ClassSchedule
+
+    full_key = f"{key}:v{_version()}"
+    schedules = cache.get(full_key)
+    if schedules is None:
+        schedules = list(
+            ClassSchedule.objects.filter(is_active=True, **filters)
+            .select_related('subject__teacher', 'group')
+            .order_by('day_of_week', 'start_time', 'id')
+        )
+        cache.set(full_key, schedules, CACHE_TTL)
+    return schedules
+
+
+def get_group_week(group_id):
+    """Активные пары группы на неделю: {день недели (1-7): [пары по времени]}"""
+    week = {day: [] for day in range(1, 8)}
+    if group_id is None:
+        return week
+    for schedule in _load(f"timetable:group:{group_id}", group_id=group_id):
+        week[schedule.day_of_week].append(schedule)
+    return week
+
+
+def get_group_day(group_id, day_of_week):
+    """Активные пары группы в указанный день недели"""
+    return get_group_week(group_id)[day_of_week]
+
+
+def get_day(day_of_week):
+    """Активные пары всех групп в указанный день недели"""
+    return _load(f"timetable:day:{day_of_week}", day_of_week=day_of_week)
+
+
+def find(schedule_id, day_of_week):
+    """Пара из расписания дня по id (None, если её нет или она отключена)"""
+    for schedule in get_day(day_of_week):
+        if schedule.id == schedule_id:
+            return schedule
+    return None
+
+
+def invalidate():
+    """Сбросить все снимки расписания"""
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, 2, None)
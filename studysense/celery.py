@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.schedules import crontab
 from django.conf import settings
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'studysense.settings')
@@ -10,19 +11,26 @@ app.autodiscover_tasks()
 
 # Загружаем расписание периодических задач
 app.conf.beat_schedule = {
-    # Проверка начала пар каждую минуту
-    'check-class-start': {
-        'task': 'notifications.tasks.send_class_start_notifications',
-        'schedule': 60.0,  # Каждые 60 секунд
+    # Планирование уведомлений о начале/конце пар и опозданиях на ближайшие полчаса.
+    # Сами уведомления отправляются ETA-задачами точно в нужный момент.
+    'plan-class-notifications': {
+        'task': 'notifications.tasks.plan_class_notifications',
+        'schedule': 900.0,  # Каждые 900 секунд (15 минут, NOTIFICATION_PLAN_INTERVAL)
     },
-    # Проверка конца пар каждую минуту  
-    'check-class-end': {
-        'task': 'notifications.tasks.send_class_end_notifications',
-        'schedule': 60.0,  # Каждые 60 секунд
+    # Страховочный разбор очереди уведомлений. Обычно очередь разбирается задачей,
+    # поставленной после фиксации транзакции, и отложенной задачей для повторов.
+    'drain-notification-outbox': {
+        'task': 'notifications.tasks.drain_notification_outbox',
+        'schedule': 600.0,  # Каждые 10 минут
     },
-    # Проверка опозданий каждые 5 минут
-    'check-late-students': {
-        'task': 'notifications.tasks.check_late_students',
-        'schedule': 300.0,  # Каждые 300 секунд (5 минут)
+    # Сводка на завтра одним сообщением каждому студенту
+    'send-daily-digests': {
+        'task': 'notifications.tasks.send_daily_digests',
+        'schedule': crontab(hour=20, minute=0),  # Каждый вечер в 20:00
+    },
+    # Сжатие старых журналов отправки в дневную статистику
+    'compact-notification-logs': {
+        'task': 'notifications.tasks.compact_notification_logs',
+        'schedule': crontab(hour=3, minute=30),  # Каждую ночь в 03:30
     },
 }
@@ -120,6 +120,24 @@ USE_I18N = True
 USE_TZ = True
 
 
+# Cache
+# По умолчанию кэш в памяти процесса; для нескольких процессов укажите CACHE_REDIS_URL
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', '')
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
@@ -137,8 +155,39 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Europe/Moscow'
 
+# Кэш расписания пар по группам (сбрасывается при изменении расписания)
+TIMETABLE_CACHE_TTL = 300  # секунды
+
+# Планирование уведомлений о парах (ETA-задачи вместо ежеминутного опроса)
+NOTIFICATION_PLAN_INTERVAL = 15  # минуты между запусками планировщика
+NOTIFICATION_PLAN_HORIZON = 30  # на сколько минут вперёд ставить задачи
+NOTIFICATION_PLAN_REQUEUE_AFTER = 5  # через сколько минут после момента снова ставить неотправленное событие
+NOTIFICATION_BATCH_SIZE = 50  # сообщений в одной задаче доставки
+NOTIFICATION_OUTBOX_CLAIM_TIMEOUT = 10  # минуты, после которых зависшая отправка из очереди повторяется
+NOTIFICATION_OUTBOX_MAX_ATTEMPTS = 5  # попыток отправки уведомления из очереди
+NOTIFICATION_OUTBOX_RETRY_DELAY = 60  # секунды до первой повторной попытки, дальше вдвое больше
+NOTIFICATION_DIGEST_CHUNK_SIZE = 500  # студентов в одной пачке вечерней сводки
+NOTIFICATION_LOG_RETENTION_DAYS = 30  # дней хранения журналов отправки до сжатия в статистику
+
 # Telegram Bot Configuration
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '')
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org')  # можно указать локальный фейковый сервер
+TELEGRAM_GLOBAL_RATE = 25  # сообщений в секунду на бота (на все процессы только с CACHE_REDIS_URL)
+TELEGRAM_CHAT_RATE = 1  # сообщений в секунду в один чат
+TELEGRAM_MAX_RETRIES = 3  # повторов при 429 и ошибках сервера
+
+# Telegram-бот: параллельная обработка и режим вебхука
+TELEGRAM_BOT_CONCURRENCY = 32  # обновлений, обрабатываемых одновременно
+TELEGRAM_BOT_DB_WORKERS = 8  # потоков для запросов к базе из обработчиков
+TELEGRAM_AI_WORKERS = 4  # одновременных запросов к AI-ассистенту
+TELEGRAM_AI_QUEUE_SIZE = 100  # вопросов в очереди, сверх этого бот просит подождать
+TELEGRAM_AI_PER_CHAT = 1  # ожидающих ответа вопросов из одного чата
+TELEGRAM_AI_TIMEOUT = 60  # секунды на подготовку ответа
+TELEGRAM_WEBHOOK_URL = os.getenv('TELEGRAM_WEBHOOK_URL', '')  # пусто - long polling
+TELEGRAM_WEBHOOK_PATH = 'telegram'
+TELEGRAM_WEBHOOK_LISTEN = '0.0.0.0'
+TELEGRAM_WEBHOOK_PORT = int(os.getenv('TELEGRAM_WEBHOOK_PORT', '8443'))
+TELEGRAM_WEBHOOK_SECRET = os.getenv('TELEGRAM_WEBHOOK_SECRET', '')
 
 # OpenAI Configuration
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
@@ -153,6 +202,23 @@ DEEPSEEK_BASE_URL = 'https://api.deepseek.com'
 OLLAMA_ENABLED = True
 OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'qwen:0.5b')
 OLLAMA_HOST = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
+OLLAMA_MAX_CONCURRENCY = int(os.getenv('OLLAMA_MAX_CONCURRENCY', '2'))  # одновременных запросов к модели
+OLLAMA_QUEUE_SIZE = 32  # запросов в очереди, сверх этого - отказ
+OLLAMA_KEEP_ALIVE = os.getenv('OLLAMA_KEEP_ALIVE', '30m')  # сколько модель держится в памяти
+OLLAMA_KEEPALIVE_INTERVAL = 300  # период прогрева модели (секунды)
+
+# Кэш ответов AI-ассистента
+AI_ANSWER_CACHE_SIZE = int(os.getenv('AI_ANSWER_CACHE_SIZE', '1000'))
+AI_ANSWER_CACHE_TTL = int(os.getenv('AI_ANSWER_CACHE_TTL', str(24 * 60 * 60)))  # секунды
+AI_ANSWER_CACHE_THRESHOLD = 0.8  # минимальная похожесть вопросов (оценка Жаккара)
+
+# Параллельный опрос AI-провайдеров (OpenAI, DeepSeek, Ollama, Wikipedia)
+AI_PROVIDER_RACING = os.getenv('AI_PROVIDER_RACING', 'True') == 'True'
+AI_PROVIDER_DEADLINE = float(os.getenv('AI_PROVIDER_DEADLINE', '8'))  # секунды
+AI_PROVIDER_WORKERS = 8
+
+# Файл офлайн-тем для быстрых ответов (ключевые слова -> готовый ответ)
+AI_FALLBACK_TOPICS_FILE = BASE_DIR / 'ai_assistant' / 'data' / 'fallback_topics.json'
 
 # Login/Logout URLs
 LOGIN_URL = '/accounts/login/'